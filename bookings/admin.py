@@ -1,14 +1,70 @@
 """
-Admin for bookings - view all, update status.
+Admin for bookings - view all, update status - and their queued emails.
+
+Built for tables with millions of bookings (see config.changelist): rooms,
+hotels and categories are joined into the changelist query, counts are
+approximate, and status changes are bulk actions applied set-based by
+bookings.status rather than one Booking.save per row.
 """
-from django.contrib import admin
-from .models import Booking
+from django.contrib import admin, messages
+from django.utils import timezone
+from config.changelist import LargeTableAdmin
+from .exceptions import BookingConflict
+from .models import Booking, Notification
+from . import status
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
     list_display = ['id', 'room', 'guest_name', 'check_in', 'check_out', 'total_price', 'status', 'created_at']
+    list_select_related = ['room__hotel', 'room__category']
     list_filter = ['status', 'check_in']
+    date_hierarchy = 'check_in'
     search_fields = ['guest_name', 'guest_email', 'room__name']
-    list_editable = ['status']
-    readonly_fields = ['created_at', 'updated_at', 'total_price']
+    raw_id_fields = ['room', 'user']
+    readonly_fields = ['created_at', 'updated_at', 'total_price', 'hold_expires_at']
+    actions = ['confirm_bookings', 'cancel_bookings']
+
+    @admin.action(description='Confirm selected bookings')
+    def confirm_bookings(self, request, queryset):
+        try:
+            confirmed, conflicts = status.confirm(queryset)
+        except BookingConflict as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        self.message_user(request, f'Confirmed {len(confirmed)} booking(s).', messages.SUCCESS)
+        if conflicts:
+            self.message_user(
+                request,
+                f"{len(conflicts)} booking(s) overlap nights already sold and were left unchanged: "
+                f"{', '.join(f'#{pk}' for pk in conflicts[:20])}{' ...' if len(conflicts) > 20 else ''}",
+                messages.WARNING,
+            )
+
+    @admin.action(description='Cancel selected bookings')
+    def cancel_bookings(self, request, queryset):
+        cancelled = status.cancel(queryset)
+        self.message_user(request, f'Cancelled {len(cancelled)} booking(s).', messages.SUCCESS)
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    list_display = ['id', 'kind', 'recipient', 'booking', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['recipient']
+    raw_id_fields = ['booking']
+    readonly_fields = [
+        'booking', 'kind', 'recipient', 'key', 'status', 'attempts', 'next_attempt_at', 'last_error',
+        'created_at', 'sent_at',
+    ]
+    actions = ['retry_notifications']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Retry selected emails now')
+    def retry_notifications(self, request, queryset):
+        retried = queryset.exclude(status='sent').update(
+            status='queued', attempts=0, next_attempt_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f'Queued {retried} email(s) to be sent again.', messages.SUCCESS)
@@ -0,0 +1,18 @@
+"""
+Async versions of the read-only booking views, routed when settings.ASYNC_VIEWS
+is on (see rooms/async_views.py).
+"""
+from django.http import Http404
+from config.aio import arender
+from .models import Booking
+
+
+async def booking_confirmation(request, pk):
+    """Booking confirmation page with summary."""
+    booking = await Booking.objects.select_related(
+        'room', 'room__hotel', 'room__category'
+    ).filter(pk=pk).afirst()
+    if booking is None:
+        raise Http404('No booking found matching the query')
+    context = {'booking': booking}
+    return await arender(request, 'bookings/booking_confirmation.html', context)
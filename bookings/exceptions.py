@@ -0,0 +1,12 @@
+"""
+Exceptions raised by the booking engine.
+"""
+
+
+class BookingConflict(Exception):
+    """The requested nights are already sold for this room."""
+
+    default_message = 'This room is already booked for some of the selected dates.'
+
+    def __init__(self, message=None):
+        super().__init__(message or self.default_message)
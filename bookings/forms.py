@@ -5,7 +5,8 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import date
-from .models import Booking
+from .exceptions import BookingConflict
+from .models import Booking, RoomNight
 from rooms.models import Room
 
 
@@ -56,8 +57,87 @@ class BookingForm(forms.ModelForm):
                 raise ValidationError({'check_in': 'Check-in date cannot be in the past.'})
             if check_out <= check_in:
                 raise ValidationError({'check_out': 'Check-out must be after check-in.'})
+            if self.room and RoomNight.is_sold(self.room.pk, check_in, check_out):
+                raise ValidationError(BookingConflict.default_message)
         if self.room and num_guests and num_guests > self.room.max_guests:
             raise ValidationError({
                 'num_guests': f'Maximum {self.room.max_guests} guests allowed for this room.'
             })
         return cleaned
+
+
+class GroupBookingForm(forms.Form):
+    """
+    Contact details for a group reservation. The dates, party size and rooms
+    come from the chosen group search offer as hidden fields.
+    """
+    check_in = forms.DateField(widget=forms.HiddenInput)
+    check_out = forms.DateField(widget=forms.HiddenInput)
+    num_guests = forms.IntegerField(min_value=1, widget=forms.HiddenInput)
+    rooms = forms.CharField(widget=forms.HiddenInput)
+    guest_name = forms.CharField(max_length=200, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    guest_email = forms.EmailField(widget=forms.EmailInput(attrs={'class': 'form-control'}))
+    guest_phone = forms.CharField(max_length=20, widget=forms.TextInput(attrs={'class': 'form-control'}), required=False)
+    special_requests = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3})
+    )
+
+    def clean_rooms(self):
+        """Resolve the comma-separated room ids to bookable rooms of one hotel."""
+        try:
+            room_ids = [int(room_id) for room_id in self.cleaned_data['rooms'].split(',')]
+        except ValueError:
+            raise ValidationError('Invalid room selection.')
+        rooms = Room.objects.select_related('hotel', 'category').filter(is_available=True).in_bulk(room_ids)
+        if len(rooms) != len(set(room_ids)) or len(room_ids) != len(set(room_ids)):
+            raise ValidationError('Some of the selected rooms are no longer available.')
+        rooms = [rooms[room_id] for room_id in room_ids]
+        if len({room.hotel_id for room in rooms}) != 1:
+            raise ValidationError('All rooms of a group booking must be in the same hotel.')
+        return rooms
+
+    def clean(self):
+        cleaned = super().clean()
+        check_in = cleaned.get('check_in')
+        check_out = cleaned.get('check_out')
+        num_guests = cleaned.get('num_guests')
+        rooms = cleaned.get('rooms')
+        if check_in and check_out:
+            if check_in < date.today():
+                raise ValidationError('Check-in date cannot be in the past.')
+            if check_out <= check_in:
+                raise ValidationError('Check-out must be after check-in.')
+        if rooms and num_guests:
+            if num_guests > sum(room.max_guests for room in rooms):
+                raise ValidationError('The selected rooms do not sleep the whole party.')
+            if num_guests < len(rooms):
+                raise ValidationError('Every room needs at least one guest.')
+        return cleaned
+
+
+class BookingHistoryFilterForm(forms.Form):
+    """Booking history filters: status and the dates the bookings were made (all optional)."""
+    status = forms.ChoiceField(
+        choices=[('', 'All statuses')] + Booking.STATUS_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    booked_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='Booked from'
+    )
+    booked_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='Booked to'
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        booked_from = cleaned.get('booked_from')
+        booked_to = cleaned.get('booked_to')
+        if booked_from and booked_to and booked_to < booked_from:
+            raise ValidationError({'booked_to': 'The end date must not be before the start date.'})
+        return cleaned
@@ -0,0 +1,49 @@
+"""
+Group reservations: several rooms of one hotel booked together, all or nothing.
+"""
+from uuid import uuid4
+from django.db import transaction
+from rooms.models import Room
+from .exceptions import BookingConflict
+from .models import Booking, RoomNight
+
+
+def split_guests(rooms, num_guests):
+    """Guests per room, filling the largest rooms first (every room gets at least one)."""
+    counts = {room.pk: 1 for room in rooms}
+    remaining = num_guests - len(rooms)
+    for room in sorted(rooms, key=lambda room: -room.max_guests):
+        extra = min(max(remaining, 0), room.max_guests - 1)
+        counts[room.pk] += extra
+        remaining -= extra
+    return [counts[room.pk] for room in rooms]
+
+
+def book_group(rooms, check_in, check_out, num_guests, user=None, **details):
+    """
+    Create one booking per room in a single transaction and return them.
+    Rooms are locked in id order, so concurrent group bookings cannot
+    deadlock; if any room has a sold night the whole group is rolled back
+    with BookingConflict.
+    """
+    group_ref = uuid4()
+    bookings = []
+    with transaction.atomic():
+        room_ids = sorted(room.pk for room in rooms)
+        list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('pk'))
+        for room in rooms:
+            if RoomNight.is_sold(room.pk, check_in, check_out):
+                raise BookingConflict(f'{room.name} is already booked for some of the selected dates.')
+        for room, guests in zip(rooms, split_guests(rooms, num_guests)):
+            booking = Booking(
+                room=room,
+                user=user,
+                check_in=check_in,
+                check_out=check_out,
+                num_guests=guests,
+                group_ref=group_ref,
+                **details,
+            )
+            booking.save()
+            bookings.append(booking)
+    return bookings
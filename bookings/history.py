@@ -0,0 +1,72 @@
+"""
+Booking history pages, newest booking first.
+
+Pages are keyset pages on (created_at, id): the next page starts after the
+last booking shown, so page 1,000 costs the same index range scan as page 1
+and nothing is counted. The status and booked-date filters narrow the same
+range, on the (user, status, created_at, id) and (user, created_at, id)
+indexes.
+"""
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .models import Booking
+
+PAGE_SIZE = 10
+
+
+def bookings_for(user, status=None, booked_from=None, booked_to=None):
+    """The user's bookings in history order, optionally by status and booking date (inclusive)."""
+    bookings = Booking.objects.filter(user=user)
+    if status:
+        bookings = bookings.filter(status=status)
+    # Day bounds as datetimes, so the range applies to the indexed column itself
+    zone = timezone.get_current_timezone()
+    if booked_from:
+        bookings = bookings.filter(created_at__gte=datetime.combine(booked_from, time.min, zone))
+    if booked_to:
+        bookings = bookings.filter(created_at__lt=datetime.combine(booked_to + timedelta(days=1), time.min, zone))
+    return bookings.select_related('room', 'room__hotel', 'room__category').order_by('-created_at', '-id')
+
+
+def encode_cursor(booking):
+    """Opaque keyset cursor for the (created_at, id) position of a booking."""
+    raw = f"{booking.created_at.isoformat()}|{booking.pk}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, booking_id = raw.split('|')
+        created_at, booking_id = datetime.fromisoformat(created_at), int(booking_id)
+    except (TypeError, ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if timezone.is_naive(created_at):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return created_at, booking_id
+
+
+def after(bookings, cursor):
+    """The bookings listed after the cursor's position. Raises ValueError for a malformed cursor."""
+    created_at, booking_id = decode_cursor(cursor)
+    # created_at <= bounds the index range; the OR only breaks ties inside it
+    return bookings.filter(created_at__lte=created_at).filter(Q(created_at__lt=created_at) | Q(id__lt=booking_id))
+
+
+def paginate(bookings, cursor=None, page_size=PAGE_SIZE):
+    """
+    Keyset page of ``bookings`` (ordered by -created_at, -id) after ``cursor``.
+    Returns (bookings_on_page, next_cursor_or_None). Raises ValueError for a
+    malformed cursor.
+    """
+    if cursor:
+        bookings = after(bookings, cursor)
+    page = list(bookings[:page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1])
+    return page, None
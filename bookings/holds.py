@@ -0,0 +1,176 @@
+"""
+Booking holds: a booking made at checkout (booking_create and group
+bookings) is pending and holds its room's nights until hold_expires_at,
+settings.BOOKING_HOLD_MINUTES after it was made, while the guest finishes
+checkout. Pending bookings made otherwise (admin, imports) have no deadline
+and are never expired here. The held nights are RoomNight rows like sold ones,
+so searches and conflict checks skip them without looking at holds.
+Completing checkout confirms the hold; holds left past their deadline are
+expired by the sweeper (the expire_holds command), which releases their
+nights.
+
+The sweeper works in batches, each one short transaction of set-based
+statements: it locks up to ``batch_size`` overdue holds found on the partial
+(status = 'pending') deadline index, skipping holds locked by a checkout in
+progress (FOR UPDATE SKIP LOCKED where the database supports it), and
+releases them through bookings.status. No other Booking row is locked.
+
+Sweep counts are kept in the shared cache and reported by /metrics/ along
+with the outcome of recent holds (confirmed, expired, cancelled, pending).
+"""
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from . import status
+from .models import Booking
+
+PENDING = 'pending'
+EXPIRED = 'expired'
+BATCH_SIZE = 500
+# Holds placed within this window are counted by metrics()
+METRICS_WINDOW = timedelta(hours=24)
+SWEEP_COUNTERS = ('runs', 'batches', 'expired', 'ms')
+
+
+@dataclass
+class Sweep:
+    """What one expire() call did."""
+    expired: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self):
+        """Holds expired per second."""
+        return self.expired / self.seconds if self.seconds else 0.0
+
+
+def overdue(now=None):
+    """Pending holds past their deadline, oldest deadline first."""
+    return Booking.objects.filter(
+        status=PENDING, hold_expires_at__lte=now or timezone.now()
+    ).order_by('hold_expires_at', 'id')
+
+
+def expire(now=None, batch_size=BATCH_SIZE, max_batches=None):
+    """
+    Expire the holds overdue at ``now`` in batches of ``batch_size``,
+    releasing their nights, until none is left (or after ``max_batches``).
+    Returns a Sweep and adds it to the sweep counters.
+    """
+    now = now or timezone.now()
+    sweep = Sweep()
+    started = time.perf_counter()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    while max_batches is None or sweep.batches < max_batches:
+        with transaction.atomic():
+            stays = list(
+                overdue(now).select_for_update(skip_locked=skip_locked).values_list(*status.STAY_FIELDS)[:batch_size]
+            )
+            status.release(stays, EXPIRED)
+        sweep.batches += 1
+        sweep.expired += len(stays)
+        if len(stays) < batch_size:
+            break
+    sweep.seconds = time.perf_counter() - started
+    _record(sweep)
+    return sweep
+
+
+def complete(bookings):
+    """
+    Finish checkout: confirm the holds among ``bookings`` that have not run
+    out. Returns the ids confirmed; an expired hold is never confirmed, even
+    if the sweeper has not released it yet.
+    """
+    with transaction.atomic():
+        # Locks the holds, so the sweeper skips them while they are confirmed
+        ids = list(bookings.select_for_update().filter(
+            status=PENDING, hold_expires_at__gt=timezone.now()
+        ).order_by('pk').values_list('pk', flat=True))
+        confirmed, _ = status.confirm(Booking.objects.filter(pk__in=ids))
+    return confirmed
+
+
+def _counter_key(name):
+    return f'holds:sweep:{name}'
+
+
+def _record(sweep):
+    """Add a sweep to the cache counters (shared by the sweeper and web processes with CACHE_URL)."""
+    values = {'runs': 1, 'batches': sweep.batches, 'expired': sweep.expired, 'ms': round(sweep.seconds * 1000)}
+    for name, value in values.items():
+        cache.add(_counter_key(name), 0, None)
+        try:
+            cache.incr(_counter_key(name), value)
+        except ValueError:  # evicted between add and incr
+            cache.set(_counter_key(name), value, None)
+
+
+def placed(since):
+    """Holds placed since ``since`` (every booking made as a hold), by current status: (status, count) rows."""
+    return Booking.objects.filter(
+        created_at__gte=since, hold_expires_at__isnull=False
+    ).order_by().values_list('status').annotate(count=Count('id'))
+
+
+def outcomes(since):
+    """{status: count} of the holds placed since ``since``."""
+    counts = dict.fromkeys((PENDING, 'confirmed', 'cancelled', EXPIRED), 0)
+    counts.update(placed(since))
+    return counts
+
+
+def metrics():
+    """Hold outcomes over METRICS_WINDOW, overdue holds and sweep totals, as a plain dict."""
+    counts = outcomes(timezone.now() - METRICS_WINDOW)
+    decided = counts['confirmed'] + counts['cancelled'] + counts[EXPIRED]
+    sweeps = cache.get_many([_counter_key(name) for name in SWEEP_COUNTERS])
+    totals = {name: sweeps.get(_counter_key(name), 0) for name in SWEEP_COUNTERS}
+    return {
+        'window_hours': METRICS_WINDOW.total_seconds() / 3600,
+        'placed': counts,
+        'conversion': round(counts['confirmed'] / decided, 3) if decided else None,
+        'overdue': overdue().count(),
+        'sweeps': {
+            **totals,
+            'expired_per_second': round(totals['expired'] / (totals['ms'] / 1000), 1) if totals['ms'] else None,
+        },
+    }
+
+
+def prometheus():
+    """metrics() in the Prometheus text exposition format."""
+    data = metrics()
+    sweeps = data['sweeps']
+    lines = [
+        '# HELP hotel_holds_placed Holds placed in the metrics window, by current status',
+        '# TYPE hotel_holds_placed gauge',
+        *(f'hotel_holds_placed{{status="{name}"}} {count}' for name, count in data['placed'].items()),
+        '# HELP hotel_hold_conversion_ratio Confirmed share of the decided holds placed in the metrics window',
+        '# TYPE hotel_hold_conversion_ratio gauge',
+        f"hotel_hold_conversion_ratio {data['conversion'] if data['conversion'] is not None else 'NaN'}",
+        '# HELP hotel_holds_overdue Pending holds past their deadline, not swept yet',
+        '# TYPE hotel_holds_overdue gauge',
+        f"hotel_holds_overdue {data['overdue']}",
+    ]
+    for name, help_text in (
+        ('runs', 'Hold sweeper runs'),
+        ('batches', 'Hold sweeper batches'),
+        ('expired', 'Holds expired by the sweeper'),
+    ):
+        lines += [
+            f'# HELP hotel_hold_sweep_{name}_total {help_text}',
+            f'# TYPE hotel_hold_sweep_{name}_total counter',
+            f'hotel_hold_sweep_{name}_total {sweeps[name]}',
+        ]
+    lines += [
+        '# HELP hotel_hold_sweep_seconds_total Time spent sweeping holds',
+        '# TYPE hotel_hold_sweep_seconds_total counter',
+        f"hotel_hold_sweep_seconds_total {sweeps['ms'] / 1000}",
+    ]
+    return '\n'.join(lines) + '\n'
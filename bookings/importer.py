@@ -0,0 +1,295 @@
+"""
+Streaming bulk import of bookings from legacy PMS and channel manager exports.
+
+Rows are read one at a time from CSV or JSONL and handled in batches: the
+rooms a batch refers to are resolved with one query, each row is validated,
+prices come from one rooms.pricing.RateTable per batch, and the bookings and
+their RoomNight rows are written with bulk_create in one transaction per
+batch. bulk_create skips Booking.save and the booking signals, so nights,
+user summaries and occupancy-priced rates are updated here and cached
+searches are invalidated once per batch. The command records its progress
+(ImportProgress) in the same transaction, so a resumed import never writes a
+batch twice.
+
+Columns (CSV header or JSON keys, case-insensitive):
+    room_id, or hotel + room (hotel name and room name)
+    check_in, check_out      YYYY-MM-DD
+    num_guests               default 1
+    status                   pending / requested / confirmed / cancelled / expired,
+                             default confirmed (pending rows hold their nights until staff
+                             confirm or cancel them; they are not checkout holds and never expire)
+    guest_name, guest_email, guest_phone, special_requests   optional
+"""
+import csv
+import json
+import os
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rooms import pricing
+from rooms.models import Room
+from . import inventory, summary
+from .models import Booking, ImportProgress, RoomNight
+
+FORMATS = ('csv', 'jsonl')
+STATUSES = dict(Booking.STATUS_CHOICES)
+DEFAULT_STATUS = 'confirmed'
+AMBIGUOUS = object()
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the message goes to the rejects report."""
+
+
+class InvalidRow:
+    """Placeholder for a line that could not even be parsed."""
+
+    def __init__(self, reason, raw):
+        self.reason = reason
+        self.raw = raw
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_rows(path, fmt):
+    """Yield (row_number, row) for every record; row_number counts records from 1."""
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            for number, row in enumerate(csv.DictReader(handle), start=1):
+                yield number, {(key or '').strip().lower(): value for key, value in row.items()}
+        return
+    with open(path, encoding='utf-8-sig') as handle:
+        number = 0
+        for line in handle:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, InvalidRow(f'invalid JSON: {exc}', line.rstrip('\n'))
+                continue
+            if not isinstance(row, dict):
+                yield number, InvalidRow('expected a JSON object', line.rstrip('\n'))
+                continue
+            yield number, {str(key).strip().lower(): value for key, value in row.items()}
+
+
+def batched(rows, size):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def room_key(row):
+    """('id', pk) or ('name', hotel name, room name) identifying the row's room."""
+    room_id = _text(row, 'room_id')
+    if room_id:
+        try:
+            return ('id', int(room_id))
+        except ValueError:
+            raise RowError(f'room_id {room_id!r} is not a number')
+    hotel, room = _text(row, 'hotel'), _text(row, 'room')
+    if not (hotel and room):
+        raise RowError('needs room_id, or hotel and room')
+    return ('name', hotel, room)
+
+
+def resolve_rooms(keys):
+    """Map room keys to Room instances with two queries at most (unknown keys are left out)."""
+    rooms = {}
+    ids = {key[1] for key in keys if key[0] == 'id'}
+    if ids:
+        rooms.update((('id', room.pk), room) for room in Room.objects.filter(id__in=ids))
+    names = {key[1:] for key in keys if key[0] == 'name'}
+    if names:
+        matches = Room.objects.filter(
+            hotel__name__in={hotel for hotel, _ in names}, name__in={name for _, name in names}
+        ).annotate(hotel_name=F('hotel__name'))
+        for room in matches:
+            key = ('name', room.hotel_name, room.name)
+            if key[1:] in names:
+                rooms[key] = AMBIGUOUS if key in rooms else room
+    return rooms
+
+
+def _date(row, field):
+    value = _text(row, field)
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f'{field} {value!r} is not a YYYY-MM-DD date')
+
+
+def build_booking(row, room):
+    """Validate one row and return an unsaved, not yet priced Booking, or raise RowError."""
+    check_in, check_out = _date(row, 'check_in'), _date(row, 'check_out')
+    if check_out <= check_in:
+        raise RowError('check_out must be after check_in')
+    try:
+        num_guests = int(_text(row, 'num_guests') or 1)
+    except ValueError:
+        raise RowError(f"num_guests {_text(row, 'num_guests')!r} is not a number")
+    if not 1 <= num_guests <= room.max_guests:
+        raise RowError(f'num_guests must be between 1 and {room.max_guests} for this room')
+    status = _text(row, 'status').lower() or DEFAULT_STATUS
+    if status not in STATUSES:
+        raise RowError(f'unknown status {status!r}')
+    guest = {field: _text(row, field) for field in ('guest_name', 'guest_email', 'guest_phone')}
+    for field in ('guest_name', 'guest_email', 'guest_phone'):
+        max_length = Booking._meta.get_field(field).max_length
+        if len(guest[field]) > max_length:
+            raise RowError(f'{field} is longer than {max_length} characters')
+    if guest['guest_email']:
+        try:
+            validate_email(guest['guest_email'])
+        except ValidationError:
+            raise RowError(f"guest_email {guest['guest_email']!r} is not a valid address")
+    return Booking(
+        room=room,
+        check_in=check_in,
+        check_out=check_out,
+        num_guests=num_guests,
+        status=status,
+        special_requests=_text(row, 'special_requests'),
+        **guest,
+    )
+
+
+def import_batch(batch):
+    """
+    Validate and write one batch of (row_number, row) pairs.
+    Returns (imported_count, rejects) where rejects is a list of
+    (row_number, row, reason).
+    """
+    rejects = []
+    keyed = []
+    for number, row in batch:
+        if isinstance(row, InvalidRow):
+            rejects.append((number, row.raw, row.reason))
+            continue
+        try:
+            keyed.append((number, row, room_key(row)))
+        except RowError as exc:
+            rejects.append((number, row, str(exc)))
+
+    rooms = resolve_rooms({key for _, _, key in keyed})
+    bookings = []
+    claimed = set()
+    for number, row, key in keyed:
+        room = rooms.get(key)
+        try:
+            if room is None:
+                raise RowError('room not found')
+            if room is AMBIGUOUS:
+                raise RowError('several rooms match this hotel and room name')
+            booking = build_booking(row, room)
+            if booking.blocks_inventory:
+                nights = {(room.pk, day) for day in inventory.stay_dates(booking.check_in, booking.check_out)}
+                if nights & claimed:
+                    raise RowError('overlaps an earlier row for the same room')
+                claimed |= nights
+        except RowError as exc:
+            rejects.append((number, row, str(exc)))
+            continue
+        bookings.append((number, row, booking))
+
+    if bookings:
+        rates = pricing.RateTable(
+            [booking.room for _, _, booking in bookings],
+            min(booking.check_in for _, _, booking in bookings),
+            max(booking.check_out for _, _, booking in bookings),
+        )
+        for _, _, booking in bookings:
+            booking.total_price = rates.stay_price(booking.room, booking.check_in, booking.check_out)
+
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                _write([booking for _, _, booking in bookings])
+        except IntegrityError:
+            # Some stays overlap nights already sold in the database: find them
+            # row by row (rare for clean exports), then write the rest.
+            kept = []
+            for number, row, booking in bookings:
+                booking.pk = None
+                booking._state.adding = True
+                if booking.blocks_inventory and RoomNight.is_sold(booking.room_id, booking.check_in, booking.check_out):
+                    rejects.append((number, row, 'nights already booked'))
+                else:
+                    kept.append((number, row, booking))
+            bookings = kept
+            _write([booking for _, _, booking in bookings])
+        blocking = [booking for _, _, booking in bookings if booking.blocks_inventory]
+        if blocking:
+            inventory.bump_rooms()
+            pricing.sales_changed(
+                {booking.room.hotel_id for booking in blocking},
+                min(booking.check_in for booking in blocking),
+                max(booking.check_out for booking in blocking),
+            )
+        summary.apply_changes(added=[summary.row_of(booking) for _, _, booking in bookings])
+    rejects.sort(key=lambda reject: reject[0])
+    return len(bookings), rejects
+
+
+def _write(bookings):
+    Booking.objects.bulk_create(bookings)
+    RoomNight.objects.bulk_create([
+        RoomNight(room_id=booking.room_id, date=day, booking_id=booking.pk)
+        for booking in bookings if booking.blocks_inventory
+        for day in inventory.stay_dates(booking.check_in, booking.check_out)
+    ])
+
+
+# Progress: one ImportProgress row per input file counts the rows consumed by
+# committed batches, so a re-run skips straight past them.
+
+def load_progress(source, restart=False):
+    """The ImportProgress of an input file, created on first use (and reset with ``restart``)."""
+    progress, created = ImportProgress.objects.get_or_create(source=source)
+    if restart and not created:
+        progress.rows = progress.imported = progress.rejected = 0
+        progress.save()
+    return progress
+
+
+def record_progress(progress, last_row, imported, rejected):
+    """Count a batch in ``progress``; call it in the transaction that writes the batch."""
+    progress.rows = last_row
+    progress.imported += imported
+    progress.rejected += rejected
+    progress.save()
+
+
+def trim_rejects(path, last_row):
+    """
+    Drop the rejects reported for rows after ``last_row`` (those of a batch
+    that did not commit), before a resumed import reports them again.
+    """
+    if not os.path.exists(path):
+        return
+    tmp_path = f'{path}.tmp'
+    with open(path, newline='') as source, open(tmp_path, 'w', newline='') as target:
+        reader, writer = csv.reader(source), csv.writer(target)
+        for line in reader:
+            if reader.line_num == 1 or (line and line[0].isdigit() and int(line[0]) <= last_row):
+                writer.writerow(line)
+    os.replace(tmp_path, path)
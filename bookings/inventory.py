@@ -0,0 +1,229 @@
+"""
+Room-night inventory: keeps RoomNight rows in step with bookings so that
+availability search never has to scan the Booking table.
+"""
+import hashlib
+from datetime import timedelta
+from uuid import uuid4
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from rooms.models import Room
+from .exceptions import BookingConflict
+from .models import Booking, RoomNight
+
+
+def stay_dates(check_in, check_out):
+    """Yield every night of a stay (check-out day excluded)."""
+    day = check_in
+    while day < check_out:
+        yield day
+        day += timedelta(days=1)
+
+
+def sync_booking(booking):
+    """
+    Rewrite the nights held by one booking after it is created or changes status.
+    Returns the (room_id, night) pairs sold or released by the change.
+    Raises BookingConflict if another booking already holds one of the nights.
+    """
+    new_nights = set()
+    if booking.blocks_inventory and booking.check_in and booking.check_out:
+        new_nights = {(booking.room_id, day) for day in stay_dates(booking.check_in, booking.check_out)}
+    with transaction.atomic():
+        held = RoomNight.objects.filter(booking=booking)
+        old_nights = set(held.values_list('room_id', 'date'))
+        if old_nights == new_nights:
+            return set()
+        held.delete()
+        if new_nights:
+            try:
+                with transaction.atomic():
+                    RoomNight.objects.bulk_create(
+                        [RoomNight(room_id=room_id, date=day, booking=booking) for room_id, day in sorted(new_nights)]
+                    )
+            except IntegrityError:
+                raise BookingConflict()
+        changed = old_nights ^ new_nights
+        room_ids = {room_id for room_id, _ in changed}
+        if room_ids == {booking.room_id}:
+            categories = {booking.room_id: booking.room.category_id}
+        else:
+            categories = dict(Room.objects.filter(id__in=room_ids).values_list('id', 'category_id'))
+        replace_tokens([
+            *(_night_version_key(categories.get(room_id), day) for room_id, day in changed),
+            *(_room_version_key(room_id) for room_id in room_ids),
+        ])
+    return changed
+
+
+def release_booking(booking):
+    """Invalidate cached searches after a booking (and its nights) is deleted."""
+    if booking.blocks_inventory and booking.check_in and booking.check_out:
+        stays_changed([(booking.room_id, booking.check_in, booking.check_out)])
+
+
+def stays_changed(stays, categories=None):
+    """
+    Invalidate cached searches and calendars after the nights of some
+    (room_id, check_in, check_out) stays were sold or released in bulk.
+    ``categories`` maps room ids to category ids; missing ones are looked up.
+    """
+    stays = list(stays)
+    categories = dict(categories or {})
+    missing = {room_id for room_id, _, _ in stays} - categories.keys()
+    if missing:
+        categories.update(Room.objects.filter(id__in=missing).values_list('id', 'category_id'))
+    replace_tokens({
+        *(
+            _night_version_key(categories.get(room_id), day)
+            for room_id, check_in, check_out in stays
+            for day in stay_dates(check_in, check_out)
+        ),
+        *(_room_version_key(room_id) for room_id, _, _ in stays),
+    })
+
+
+def booked_room_ids(check_in, check_out):
+    """Subquery of room ids with at least one sold night in [check_in, check_out)."""
+    return RoomNight.objects.filter(
+        date__gte=check_in, date__lt=check_out
+    ).values('room_id')
+
+
+# Availability versions: cached search results are keyed on a digest of
+# random tokens, one per (category, night) plus one for the room catalogue;
+# calendars use one token per room. Replacing a token makes every result that
+# covers it miss, and an evicted token is simply re-issued, so stale results
+# can never be read back.
+#
+# Staleness bound: tokens live in the default cache, so a change is seen by
+# every process sharing it (CACHE_URL) as soon as its transaction commits. A
+# result can still be stale for at most AVAILABILITY_CACHE_TIMEOUT when the
+# token write is lost (a process killed right after the commit, a cache
+# outage), when the result was computed from a lagging read replica, or, with
+# a per-process cache, in every other process. A stale result never oversells:
+# booking checks the sold nights themselves.
+
+ROOMS_VERSION_KEY = 'availability:rooms'
+
+
+def _night_version_key(category_id, day):
+    return f'availability:night:{category_id}:{day.isoformat()}'
+
+
+def _room_version_key(room_id):
+    return f'availability:room:{room_id}'
+
+
+def replace_tokens(keys):
+    """
+    Give each version token a fresh value once the current transaction
+    commits. A failed cache write is logged, not raised: the change has
+    committed, and what it left cached expires with its timeout.
+    """
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: uuid4().hex for key in keys}, None), robust=True)
+
+
+def bump_rooms():
+    """Invalidate all cached searches (rooms added, removed, or re-categorized)."""
+    replace_tokens([ROOMS_VERSION_KEY])
+
+
+def availability_version(check_in, check_out, category_ids):
+    """Digest of the tokens a search over these nights and categories depends on."""
+    return token_digest([ROOMS_VERSION_KEY] + [
+        _night_version_key(category_id, day)
+        for category_id in sorted(category_ids)
+        for day in stay_dates(check_in, check_out)
+    ])
+
+
+def room_version(room_ids):
+    """Digest of the tokens a room's (or hotel's) calendar depends on: any booking change for those rooms."""
+    return token_digest([ROOMS_VERSION_KEY] + [_room_version_key(room_id) for room_id in sorted(room_ids)])
+
+
+def token_digest(keys):
+    """Digest of the current values of some version tokens (missing ones are issued)."""
+    tokens = cache.get_many(keys)
+    missing = [key for key in keys if key not in tokens]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid4().hex, None)
+        tokens.update(cache.get_many(missing))
+    digest = hashlib.sha1('|'.join(tokens.get(key, '') for key in keys).encode())
+    return digest.hexdigest()
+
+
+def rebuild(from_date=None, room_ids=None, batch_size=5000):
+    """
+    Recreate RoomNight rows from bookings. Optionally limited to nights on or
+    after ``from_date`` and to a set of rooms. Returns (nights_written,
+    conflicts): a blocking booking with a night already held by an older one
+    is a double booking, left without nights and reported in ``conflicts`` as
+    (booking_id, holder_booking_id) for staff to resolve.
+    """
+    nights = RoomNight.objects.all()
+    bookings = Booking.objects.filter(status__in=Booking.BLOCKING_STATUSES)
+    if from_date:
+        nights = nights.filter(date__gte=from_date)
+        bookings = bookings.filter(check_out__gt=from_date)
+    if room_ids:
+        nights = nights.filter(room_id__in=room_ids)
+        bookings = bookings.filter(room_id__in=room_ids)
+
+    written = 0
+    conflicts = []
+    batch = []
+    batch_nights = 0
+    with transaction.atomic():
+        nights.delete()
+        rows = bookings.order_by('id').values_list('id', 'room_id', 'check_in', 'check_out')
+        for booking_id, room_id, check_in, check_out in rows.iterator(chunk_size=batch_size):
+            if from_date and check_in < from_date:
+                check_in = from_date
+            batch.append((booking_id, [
+                RoomNight(room_id=room_id, date=day, booking_id=booking_id) for day in stay_dates(check_in, check_out)
+            ]))
+            batch_nights += len(batch[-1][1])
+            if batch_nights >= batch_size:
+                written += _insert_stays(batch, conflicts)
+                batch = []
+                batch_nights = 0
+        if batch:
+            written += _insert_stays(batch, conflicts)
+        bump_rooms()
+    return written, conflicts
+
+
+def _insert_stays(stays, conflicts):
+    """
+    Insert the nights of (booking_id, [RoomNight, ...]) stays, given oldest
+    booking first. A stay with a night held by another booking gets none of
+    its nights and is added to ``conflicts``. Returns the nights written.
+    """
+    rows = [night for _, stay in stays for night in stay]
+    try:
+        with transaction.atomic():
+            RoomNight.objects.bulk_create(rows)
+        return len(rows)
+    except IntegrityError:
+        pass
+    # Rare (the constraint keeps live writes apart): find the double bookings stay by stay
+    held = dict(((room_id, day), holder) for room_id, day, holder in RoomNight.objects.filter(
+        room_id__in={night.room_id for night in rows},
+        date__gte=min(night.date for night in rows),
+        date__lte=max(night.date for night in rows),
+    ).values_list('room_id', 'date', 'booking_id'))
+    kept = []
+    for booking_id, stay in stays:
+        holders = [held[night.room_id, night.date] for night in stay if (night.room_id, night.date) in held]
+        if holders:
+            conflicts.append((booking_id, min(holders)))
+            continue
+        held.update(((night.room_id, night.date), booking_id) for night in stay)
+        kept.extend(stay)
+    RoomNight.objects.bulk_create(kept)
+    return len(kept)
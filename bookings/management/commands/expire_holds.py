@@ -0,0 +1,50 @@
+"""
+Management command that expires booking holds past their deadline and
+releases their nights (see bookings.holds).
+Run: python manage.py expire_holds [--batch-size 500] [--interval SECONDS]
+
+With --interval it sweeps on that schedule until interrupted (e.g. as a
+worker process); run it from cron every minute or so otherwise. Overdue
+holds keep their nights until swept, so the interval bounds how long an
+abandoned checkout can keep a room off the market.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from bookings import holds
+from rooms import cache as listing_cache
+
+
+class Command(BaseCommand):
+    help = "Expire pending booking holds past their deadline, releasing their nights"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=holds.BATCH_SIZE, help="Holds expired per transaction."
+        )
+        parser.add_argument("--max-batches", type=int, help="Stop a sweep after this many batches.")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Sweep every this many seconds until interrupted (default: sweep once).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if not listing_cache.is_shared():
+            self.stderr.write(self.style.WARNING(listing_cache.local_cache_warning("released nights as sold")))
+        while True:
+            started = time.monotonic()
+            sweep = holds.expire(batch_size=options["batch_size"], max_batches=options["max_batches"])
+            if sweep.expired or not options["interval"]:
+                self.stdout.write(
+                    f"Expired {sweep.expired} hold(s) in {sweep.batches} batch(es), {sweep.seconds:.2f}s "
+                    f"({sweep.rate:.0f}/s); {holds.overdue().count()} overdue left."
+                )
+            if not options["interval"]:
+                return
+            try:
+                time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
+            except KeyboardInterrupt:
+                return
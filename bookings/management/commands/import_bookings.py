@@ -0,0 +1,79 @@
+"""
+Management command to bulk-import bookings from a CSV or JSONL export.
+Run: python manage.py import_bookings reservations.csv [--batch-size 1000]
+
+The file is streamed (constant memory) and written in batches with
+bulk_create; see bookings.importer for the accepted columns. Rejected rows go
+to <file>.rejects.csv with the reason. Progress is recorded in the database
+(ImportProgress, keyed by the file's absolute path) in the transaction of
+every batch, so an interrupted import resumes exactly where it stopped when
+run again, and a finished file is not imported twice (use --restart to start
+over).
+"""
+import csv
+import json
+import os
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from bookings import importer
+from rooms import cache as listing_cache
+
+
+class Command(BaseCommand):
+    help = "Stream bookings from a CSV/JSONL export into the database in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import.")
+        parser.add_argument("--format", choices=importer.FORMATS, help="Input format (default: from the extension).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction.")
+        parser.add_argument("--rejects", help="Rejected rows report (default: <path>.rejects.csv).")
+        parser.add_argument("--restart", action="store_true", help="Ignore the progress of an earlier run.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.isfile(path):
+            raise CommandError(f"No such file: {path}")
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError("The database backend must return ids from bulk inserts.")
+        if not listing_cache.is_shared():
+            self.stderr.write(self.style.WARNING(listing_cache.local_cache_warning("imported nights as available")))
+        fmt = options["format"] or importer.detect_format(path)
+        batch_size = max(1, options["batch_size"])
+        rejects_path = options["rejects"] or f"{path}.rejects.csv"
+
+        progress = importer.load_progress(os.path.abspath(path), restart=options["restart"])
+        resuming = progress.rows > 0
+        if resuming:
+            self.stdout.write(f"Resuming after row {progress.rows}.")
+            importer.trim_rejects(rejects_path, progress.rows)
+
+        rows = islice(importer.read_rows(path, fmt), progress.rows, None)
+        start = time.perf_counter()
+        done_this_run = 0
+        with open(rejects_path, "a" if resuming else "w", newline="") as rejects_file:
+            rejects = csv.writer(rejects_file)
+            if not resuming:
+                rejects.writerow(["row", "reason", "data"])
+            for batch in importer.batched(rows, batch_size):
+                with transaction.atomic():
+                    imported, rejected = importer.import_batch(batch)
+                    # Reported before the commit: a resumed run trims rejects of batches that did not commit
+                    for number, row, reason in rejected:
+                        data = row if isinstance(row, str) else json.dumps(row, default=str)
+                        rejects.writerow([number, reason, data])
+                    rejects_file.flush()
+                    importer.record_progress(progress, batch[-1][0], imported, len(rejected))
+                done_this_run += len(batch)
+                rate = done_this_run / ((time.perf_counter() - start) or 1)
+                self.stdout.write(
+                    f"rows {progress.rows}: {progress.imported} imported, "
+                    f"{progress.rejected} rejected ({rate:.0f} rows/s)"
+                )
+
+        style = self.style.WARNING if progress.rejected else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Done: {progress.imported} bookings imported, {progress.rejected} rows rejected"
+            + (f" (see {rejects_path})." if progress.rejected else ".")
+        ))
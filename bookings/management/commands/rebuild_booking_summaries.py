@@ -0,0 +1,27 @@
+"""
+Management command to recompute the per-user booking summaries from bookings.
+Run: python manage.py rebuild_booking_summaries [--user ID ...]
+
+Summaries are kept current by every booking change made through the ORM or
+bookings.status; run this after writing bookings with raw SQL (e.g. the
+synthetic dataset loaded into existing accounts) or fixing data by hand.
+"""
+from django.core.management.base import BaseCommand
+from bookings import summary
+
+
+class Command(BaseCommand):
+    help = "Recompute the BookingSummary rows (stays, nights, spend, upcoming) of users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Limit the rebuild to this user id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        written = summary.rebuild(options["users"])
+        self.stdout.write(self.style.SUCCESS(f"Done. {len(written)} booking summaries written."))
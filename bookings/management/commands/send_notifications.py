@@ -0,0 +1,47 @@
+"""
+Management command that sends the booking emails queued in the outbox
+(see bookings.outbox).
+Run: python manage.py send_notifications [--batch-size 100] [--interval SECONDS]
+
+With --interval it drains the outbox on that schedule until interrupted
+(e.g. as a worker process); run it from cron every minute otherwise. Several
+workers can run at once on PostgreSQL: each claims its own batches.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from bookings import outbox
+
+
+class Command(BaseCommand):
+    help = "Send due booking emails from the outbox, with retries and backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=outbox.BATCH_SIZE, help="Emails claimed and sent per batch."
+        )
+        parser.add_argument("--max-batches", type=int, help="Stop a drain after this many batches.")
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Drain every this many seconds until interrupted (default: drain once).",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        while True:
+            started = time.monotonic()
+            result = outbox.drain(batch_size=options["batch_size"], max_batches=options["max_batches"])
+            if result.claimed or not options["interval"]:
+                self.stdout.write(
+                    f"Sent {result.sent}, retrying {result.retried}, failed {result.failed}, "
+                    f"skipped {result.skipped} in {result.batches} batch(es), {time.monotonic() - started:.2f}s; "
+                    f"{outbox.due().count()} due left."
+                )
+            if not options["interval"]:
+                return
+            try:
+                time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,127 @@
+"""
+Management command to fire parallel confirmed bookings at a set of rooms and
+verify that no two confirmed bookings overlap afterwards.
+Run: python manage.py stress_bookings --threads 16 --attempts 50 --rooms 1
+"""
+import random
+import threading
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from bookings.exceptions import BookingConflict
+from bookings.models import Booking
+from rooms.models import Room
+
+
+GUEST_NAME = "stress-test"
+MAX_RETRIES = 50
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent bookings at a few rooms and check that no overlaps get through"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Number of concurrent workers.")
+        parser.add_argument("--attempts", type=int, default=25, help="Bookings attempted per worker.")
+        parser.add_argument(
+            "--rooms",
+            type=int,
+            default=1,
+            help="How many distinct rooms to target (1 = maximum contention).",
+        )
+        parser.add_argument("--days", type=int, default=30, help="Size of the date window to book into.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+        parser.add_argument("--keep", action="store_true", help="Keep the created bookings.")
+
+    def handle(self, *args, **options):
+        rooms = Room.objects.in_bulk(
+            list(Room.objects.order_by("id").values_list("id", flat=True)[:options["rooms"]])
+        )
+        room_ids = list(rooms)
+        if not room_ids:
+            raise CommandError("No rooms found. Run 'python manage.py create_sample_data' first.")
+
+        rng = random.Random(options["seed"])
+        start = date.today() + timedelta(days=1)
+        plans = [
+            [
+                (rng.choice(room_ids), start + timedelta(days=rng.randrange(options["days"])), rng.randint(1, 4))
+                for _ in range(options["attempts"])
+            ]
+            for _ in range(options["threads"])
+        ]
+        counts = {"booked": 0, "conflict": 0, "busy": 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(options["threads"])
+
+        def worker(plan):
+            close_old_connections()
+            local = {"booked": 0, "conflict": 0, "busy": 0}
+            rng_backoff = random.Random()
+            barrier.wait()
+            try:
+                for room_id, check_in, nights in plan:
+                    booking = Booking(
+                        room=rooms[room_id],
+                        check_in=check_in,
+                        check_out=check_in + timedelta(days=nights),
+                        status="confirmed",
+                        guest_name=GUEST_NAME,
+                    )
+                    for retry in range(MAX_RETRIES):
+                        try:
+                            booking.save()
+                            local["booked"] += 1
+                        except BookingConflict:
+                            local["conflict"] += 1
+                        except OperationalError:
+                            # SQLite "database is locked": nothing was written, try again.
+                            booking.pk = None
+                            time.sleep(rng_backoff.uniform(0, 0.002 * (retry + 1)))
+                            continue
+                        break
+                    else:
+                        local["busy"] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker, args=(plan,)) for plan in plans]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        overlaps = self.find_overlaps(room_ids)
+        total = options["threads"] * options["attempts"]
+        self.stdout.write(
+            f"{total} attempts in {elapsed:.2f}s ({total / elapsed:.0f}/s): "
+            f"{counts['booked']} booked, {counts['conflict']} conflicts, {counts['busy']} busy"
+        )
+        if not options["keep"]:
+            Booking.objects.filter(guest_name=GUEST_NAME, room_id__in=room_ids).delete()
+        if overlaps:
+            raise CommandError(f"{len(overlaps)} overlapping confirmed bookings: {overlaps[:10]}")
+        self.stdout.write(self.style.SUCCESS("No overlapping confirmed bookings."))
+
+    def find_overlaps(self, room_ids):
+        """Pairs of confirmed bookings on the same room whose stays intersect."""
+        bookings = Booking.objects.filter(room_id__in=room_ids, status__in=Booking.BLOCKING_STATUSES)
+        by_room = {}
+        for pk, room_id, check_in, check_out in bookings.values_list("id", "room_id", "check_in", "check_out"):
+            by_room.setdefault(room_id, []).append((check_in, check_out, pk))
+        overlaps = []
+        for stays in by_room.values():
+            stays.sort()
+            latest_out, latest_pk = None, None
+            for check_in, check_out, pk in stays:
+                if latest_out and check_in < latest_out:
+                    overlaps.append((latest_pk, pk))
+                if latest_out is None or check_out > latest_out:
+                    latest_out, latest_pk = check_out, pk
+        return overlaps
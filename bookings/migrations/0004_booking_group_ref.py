@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='group_ref',
+            field=models.UUIDField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('bookings', '0005_booking_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='booking_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('stays', models.IntegerField(default=0)),
+                ('nights', models.IntegerField(default=0)),
+                ('total_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('upcoming_stays', models.IntegerField(default=0)),
+                ('upcoming_as_of', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'booking summaries',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_user_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='booking_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'status', '-created_at', '-id'], name='booking_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'check_in', 'status'], name='booking_user_check_in_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+def request_legacy_pending(apps, schema_editor):
+    # Pending bookings made before checkout holds were reservation requests
+    # waiting for staff, holding no nights (every hold has its nights): keep
+    # them out of inventory and away from the hold sweeper.
+    Booking = apps.get_model('bookings', 'Booking')
+    RoomNight = apps.get_model('bookings', 'RoomNight')
+    Booking.objects.filter(status='pending').exclude(
+        models.Exists(RoomNight.objects.filter(booking=models.OuterRef('pk')))
+    ).update(status='requested', hold_expires_at=None)
+
+
+def pend_requested(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    Booking.objects.filter(status='requested').update(status='pending')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_import_progress'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('requested', 'Awaiting confirmation'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(request_legacy_pending, pend_requested),
+    ]
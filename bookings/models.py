@@ -1,18 +1,30 @@
 """
 Booking model for room reservations.
 """
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 from rooms.models import Room
+from .exceptions import BookingConflict
 
 
 class Booking(models.Model):
     """Room booking with check-in/out, guests, and status."""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('requested', 'Awaiting confirmation'),
         ('confirmed', 'Confirmed'),
         ('cancelled', 'Cancelled'),
+        ('expired', 'Expired'),
     ]
+    # Statuses whose nights are taken out of inventory (see bookings.inventory):
+    # pending bookings made at checkout are holds until hold_expires_at (see
+    # bookings.holds); other pending ones (admin, imports) hold their nights
+    # until staff confirm or cancel them. Requests made before holds existed
+    # are 'requested' and hold no nights.
+    BLOCKING_STATUSES = ('pending', 'confirmed')
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -30,11 +42,41 @@ class Booking(models.Model):
     guest_email = models.EmailField(blank=True)
     guest_phone = models.CharField(max_length=20, blank=True)
     special_requests = models.TextField(blank=True)
+    # Shared by the bookings of one group reservation (see bookings.groups)
+    group_ref = models.UUIDField(null=True, blank=True, db_index=True, editable=False)
+    # Deadline of a checkout hold, after which its nights are released (None for other bookings)
+    hold_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Conflict checks and per-room availability
+            models.Index(fields=['room', 'status', 'check_in', 'check_out'], name='booking_room_status_dates_idx'),
+            # Sold stays by date (inventory rebuilds, arrivals/departures)
+            models.Index(
+                fields=['check_in', 'check_out'],
+                condition=models.Q(status='confirmed'),
+                name='booking_confirmed_dates_idx',
+            ),
+            # Booking history: keyset pages on (created_at, id), all or by status,
+            # and the upcoming-stays count of the user's summary
+            models.Index(fields=['user', '-created_at', '-id'], name='booking_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='booking_user_status_idx'),
+            models.Index(fields=['user', 'check_in', 'status'], name='booking_user_check_in_idx'),
+            # Admin changelist ordering and check-in filter
+            models.Index(fields=['-created_at', '-id'], name='booking_created_idx'),
+            # Admin status filter and bulk status actions
+            models.Index(fields=['status', '-created_at', '-id'], name='booking_status_created_idx'),
+            models.Index(fields=['check_in'], name='booking_check_in_idx'),
+            # Hold sweeper: pending holds by deadline
+            models.Index(
+                fields=['hold_expires_at', 'id'],
+                condition=models.Q(status='pending'),
+                name='booking_hold_expiry_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.room} - {self.check_in} to {self.check_out} ({self.status})"
@@ -43,8 +85,204 @@ class Booking(models.Model):
         """Number of nights for this booking."""
         return (self.check_out - self.check_in).days
 
+    @property
+    def blocks_inventory(self):
+        """True if this booking's nights are unavailable to other guests."""
+        return self.status in self.BLOCKING_STATUSES
+
+    @property
+    def is_hold(self):
+        """True for a pending booking placed at checkout, which the guest completes before its deadline."""
+        return self.status == 'pending' and self.hold_expires_at is not None
+
+    @property
+    def awaits_confirmation(self):
+        """True for a booking waiting for staff to confirm it rather than for the guest to complete it."""
+        return self.status == 'requested' or (self.status == 'pending' and self.hold_expires_at is None)
+
+    @property
+    def hold_expired(self):
+        """True for a pending booking whose hold has run out (its nights are released on the next sweep)."""
+        return self.status == 'pending' and self.hold_expires_at is not None and self.hold_expires_at <= timezone.now()
+
+    @staticmethod
+    def hold_deadline():
+        """hold_expires_at for a hold placed at checkout now."""
+        return timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
+    def has_conflict(self):
+        """True if another booking already holds any of this stay's nights."""
+        return RoomNight.is_sold(self.room_id, self.check_in, self.check_out, exclude_booking=self.pk)
+
+    def clean(self):
+        if self.room_id and self.check_in and self.check_out and self.blocks_inventory:
+            if self.has_conflict():
+                raise ValidationError(BookingConflict.default_message)
+
+    @staticmethod
+    def price_for(room, check_in, check_out):
+        """
+        Total price of a stay from the compiled nightly rates, as stored in
+        total_price by save() when a booking is made or its stay changes.
+        Bulk callers price many stays with one rooms.pricing.RateTable instead.
+        """
+        from rooms.pricing import RateTable  # rooms.pricing imports this module
+        return RateTable([room], check_in, check_out).stay_price(room, check_in, check_out)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        booking = super().from_db(db, field_names, values)
+        if {'room_id', 'check_in', 'check_out'} <= set(field_names):
+            booking._loaded_stay = (booking.room_id, booking.check_in, booking.check_out)
+        return booking
+
+    def stay_changed(self):
+        """True for a new booking, or one whose room or dates differ from the stored ones."""
+        if self._state.adding:
+            return True
+        loaded = getattr(self, '_loaded_stay', None)
+        if loaded is None:  # not loaded from the database, or loaded without its stay
+            loaded = Booking.objects.filter(pk=self.pk).values_list('room_id', 'check_in', 'check_out').first()
+        return loaded != (self.room_id, self.check_in, self.check_out)
+
     def save(self, *args, **kwargs):
-        if self.room and self.check_in and self.check_out:
-            nights = (self.check_out - self.check_in).days
-            self.total_price = self.room.price_per_night * nights
-        super().save(*args, **kwargs)
+        # Priced when booked; later saves keep the quoted price unless the stay changes
+        if self.room and self.check_in and self.check_out and self.stay_changed():
+            self.total_price = self.price_for(self.room, self.check_in, self.check_out)
+        with transaction.atomic():
+            if self.blocks_inventory:
+                # Row lock on the room serializes only bookings for this room;
+                # SQLite ignores it and relies on the RoomNight unique constraint.
+                list(Room.objects.select_for_update().filter(pk=self.room_id).values_list('pk'))
+                if self.has_conflict():
+                    raise BookingConflict()
+            super().save(*args, **kwargs)
+        self._loaded_stay = (self.room_id, self.check_in, self.check_out)
+
+
+class RoomNight(models.Model):
+    """
+    One sold or held night of a room. Materialized from blocking bookings so that
+    availability search is an indexed lookup on (date, room) rather than an
+    overlap scan over the whole Booking table.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='nights')
+    date = models.DateField()
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='nights')
+
+    class Meta:
+        ordering = ['room', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='unique_room_night'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'room'], name='roomnight_date_room_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_id} @ {self.date}"
+
+    @classmethod
+    def is_sold(cls, room_id, check_in, check_out, exclude_booking=None):
+        """True if any night of [check_in, check_out) is sold for the room."""
+        nights = cls.objects.filter(room_id=room_id, date__gte=check_in, date__lt=check_out)
+        if exclude_booking:
+            nights = nights.exclude(booking_id=exclude_booking)
+        return nights.exists()
+
+
+class BookingSummary(models.Model):
+    """
+    Totals of one user's bookings that are not cancelled or expired, kept
+    current by bookings.summary so that the history page reads one row
+    instead of aggregating every booking the user ever made.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='booking_summary',
+    )
+    stays = models.IntegerField(default=0)
+    nights = models.IntegerField(default=0)
+    total_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Stays checking in on or after upcoming_as_of (recounted when the day changes)
+    upcoming_stays = models.IntegerField(default=0)
+    upcoming_as_of = models.DateField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'booking summaries'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.stays} stays, {self.nights} nights, {self.total_spend}"
+
+
+class Notification(models.Model):
+    """
+    Outbox row for one email about a booking. Written in the transaction that
+    changes the booking and sent afterwards by bookings.outbox, so requests
+    never wait on the mail server and no email is lost or sent for a change
+    that rolled back.
+    """
+    CONFIRMATION = 'confirmation'
+    CANCELLATION = 'cancellation'
+    REMINDER = 'reminder'
+    KIND_CHOICES = [
+        (CONFIRMATION, 'Confirmation'),
+        (CANCELLATION, 'Cancellation'),
+        (REMINDER, 'Reminder'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    recipient = models.EmailField()
+    # One notification per key: '<kind>:<booking id>', plus ':<check-in>' for reminders
+    key = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a queued notification is due: now, its reminder date, or its next retry
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Outbox worker: queued notifications by due time
+            models.Index(
+                fields=['next_attempt_at', 'id'],
+                condition=models.Q(status='queued'),
+                name='notification_due_idx',
+            ),
+            # Admin changelist ordering and status filter
+            models.Index(fields=['-created_at', '-id'], name='notification_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='notification_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for booking {self.booking_id} to {self.recipient} ({self.status})"
+
+
+class ImportProgress(models.Model):
+    """
+    How far import_bookings got through one input file. Updated in the
+    transaction that writes each batch, so an interrupted import resumes
+    exactly after the last committed batch.
+    """
+    source = models.CharField(max_length=500, unique=True)
+    rows = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'import progress'
+
+    def __str__(self):
+        return f"{self.source}: {self.rows} rows"
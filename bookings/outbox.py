@@ -0,0 +1,223 @@
+"""
+Booking emails through a transactional outbox.
+
+A booking change queues its emails as Notification rows in the transaction
+that makes the change: a confirmation, and a reminder due
+BOOKING_REMINDER_DAYS before check-in, when a booking is confirmed, and a
+cancellation (dropping the queued reminder) when it is cancelled. Single
+saves queue them from a post_save handler, bulk status changes from
+bookings.status. Requests never talk to the mail server, and a change that
+rolls back queues nothing.
+
+The send_notifications worker drains the outbox in batches. Each batch is
+claimed in one short transaction (FOR UPDATE SKIP LOCKED where supported, so
+workers never share a row), has its attempt counted and its due time moved
+past a lease, then is sent over one mail connection. Failed sends are
+retried with exponential backoff until NOTIFICATION_MAX_ATTEMPTS, and a
+worker that dies mid-batch leaves its rows to be retried once the lease runs
+out. The unique key of each notification keeps every email to one row, however
+often a change is saved or replayed; an email whose booking has moved on
+since (a confirmation for a booking cancelled meanwhile, a reminder for
+changed dates) is skipped.
+"""
+import random
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.utils import DNS_NAME
+from django.db import connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from .models import Booking, Notification
+
+BATCH_SIZE = 100
+QUEUED, SENT, FAILED, SKIPPED = 'queued', 'sent', 'failed', 'skipped'
+# Kind of email for each booking status it announces
+KIND_FOR_STATUS = {'confirmed': Notification.CONFIRMATION, 'cancelled': Notification.CANCELLATION}
+SUBJECTS = {
+    Notification.CONFIRMATION: 'Your booking #{booking.pk} is confirmed',
+    Notification.CANCELLATION: 'Your booking #{booking.pk} has been cancelled',
+    Notification.REMINDER: 'Your stay at {booking.room.hotel.name} starts on {booking.check_in}',
+}
+REMINDER_HOUR = 9
+RETRY_BASE = timedelta(minutes=1)
+RETRY_MAX = timedelta(hours=6)
+# Claimed notifications are retried after this if their worker does not report back
+CLAIM_LEASE = timedelta(minutes=15)
+
+
+@dataclass
+class Delivery:
+    """What a deliver() or drain() call did."""
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    skipped: int = 0
+    batches: int = 0
+
+    @property
+    def claimed(self):
+        return self.sent + self.retried + self.failed + self.skipped
+
+    def __iadd__(self, other):
+        for name in ('sent', 'retried', 'failed', 'skipped', 'batches'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+
+def reminder_key(booking_id, check_in):
+    return f'{Notification.REMINDER}:{booking_id}:{check_in.isoformat()}'
+
+
+def reminder_time(check_in):
+    """When the reminder for a stay is due: REMINDER_HOUR, BOOKING_REMINDER_DAYS before check-in."""
+    day = check_in - timedelta(days=settings.BOOKING_REMINDER_DAYS)
+    return datetime.combine(day, time(REMINDER_HOUR), timezone.get_current_timezone())
+
+
+def status_changed(booking_ids, new_status):
+    """
+    Queue the emails announcing that some bookings moved to ``new_status``,
+    in the caller's transaction. Bookings without an email address get none.
+    """
+    kind = KIND_FOR_STATUS.get(new_status)
+    if kind is None or not booking_ids:
+        return
+    now = timezone.now()
+    notes = []
+    rows = Booking.objects.filter(pk__in=booking_ids).values_list('id', 'guest_email', 'user__email', 'check_in')
+    for booking_id, guest_email, user_email, check_in in rows:
+        recipient = guest_email or user_email
+        if not recipient:
+            continue
+        notes.append(Notification(
+            booking_id=booking_id, kind=kind, recipient=recipient, key=f'{kind}:{booking_id}', next_attempt_at=now,
+        ))
+        if kind == Notification.CONFIRMATION and reminder_time(check_in) > now:
+            notes.append(Notification(
+                booking_id=booking_id,
+                kind=Notification.REMINDER,
+                recipient=recipient,
+                key=reminder_key(booking_id, check_in),
+                next_attempt_at=reminder_time(check_in),
+            ))
+    if kind == Notification.CANCELLATION:
+        Notification.objects.filter(
+            booking_id__in=booking_ids, kind=Notification.REMINDER, status=QUEUED
+        ).update(status=SKIPPED)
+    # Keys already queued (a replayed change) are skipped by the unique constraint
+    Notification.objects.bulk_create(notes, batch_size=1000, ignore_conflicts=True)
+
+
+def due(now=None):
+    """Queued notifications due by ``now``, oldest first."""
+    return Notification.objects.filter(
+        status=QUEUED, next_attempt_at__lte=now or timezone.now()
+    ).order_by('next_attempt_at', 'id')
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt after ``attempts`` failed ones: doubling, capped, with jitter."""
+    delay = min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+    return delay * random.uniform(1, 1.25)
+
+
+def _claim(batch_size, now):
+    """Claim up to ``batch_size`` due notifications for this worker; returns them with their bookings."""
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        ids = list(due(now).select_for_update(skip_locked=skip_locked).values_list('pk', flat=True)[:batch_size])
+        Notification.objects.filter(pk__in=ids).update(attempts=F('attempts') + 1, next_attempt_at=now + CLAIM_LEASE)
+    return list(
+        Notification.objects.filter(pk__in=ids)
+        .select_related('booking__room__hotel', 'booking__room__category')
+        .order_by('id')
+    )
+
+
+def current(note):
+    """False if the notification's booking has moved on since it was queued."""
+    booking = note.booking
+    if note.kind == Notification.CANCELLATION:
+        return booking.status == 'cancelled'
+    if note.kind == Notification.REMINDER:
+        return (
+            booking.status == 'confirmed'
+            and note.key == reminder_key(booking.pk, booking.check_in)
+            and booking.check_in >= timezone.localdate()
+        )
+    return booking.status == 'confirmed'
+
+
+def message(note):
+    """The EmailMessage for a notification."""
+    booking = note.booking
+    context = {
+        'booking': booking,
+        'url': settings.SITE_URL + reverse('bookings:confirmation', args=[booking.pk]),
+    }
+    return EmailMessage(
+        subject=SUBJECTS[note.kind].format(booking=booking),
+        body=render_to_string(f'bookings/email/{note.kind}.txt', context),
+        to=[note.recipient],
+        # Stable across retries, so receiving servers can drop a duplicate delivery
+        headers={'Message-ID': f'<{note.key.replace(":", ".")}@{DNS_NAME}>'},
+    )
+
+
+def _failed(note, exc, now, result):
+    note.last_error = f'{type(exc).__name__}: {exc}'[:1000]
+    if note.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        note.status = FAILED
+        result.failed += 1
+    else:
+        note.next_attempt_at = now + retry_delay(note.attempts)
+        result.retried += 1
+
+
+def deliver(batch_size=BATCH_SIZE, now=None):
+    """Claim and send one batch of due notifications over one mail connection. Returns a Delivery."""
+    now = now or timezone.now()
+    result = Delivery(batches=1)
+    notes = _claim(batch_size, now)
+    if not notes:
+        return result
+    mail = get_connection()
+    try:
+        mail.open()
+    except Exception as exc:  # the mail server is down: retry the whole batch later
+        for note in notes:
+            _failed(note, exc, now, result)
+    else:
+        try:
+            for note in notes:
+                if not current(note):
+                    note.status = SKIPPED
+                    result.skipped += 1
+                    continue
+                try:
+                    if not mail.send_messages([message(note)]):
+                        raise RuntimeError('the email backend sent nothing')
+                except Exception as exc:  # one bad message must not stop the batch
+                    _failed(note, exc, now, result)
+                else:
+                    note.status, note.sent_at, note.last_error = SENT, timezone.now(), ''
+                    result.sent += 1
+        finally:
+            mail.close()
+    Notification.objects.bulk_update(notes, ['status', 'next_attempt_at', 'last_error', 'sent_at'])
+    return result
+
+
+def drain(batch_size=BATCH_SIZE, max_batches=None):
+    """Deliver batches until no due notification is left (or after ``max_batches``). Returns a Delivery."""
+    total = Delivery()
+    while max_batches is None or total.batches < max_batches:
+        result = deliver(batch_size)
+        total += result
+        if result.claimed < batch_size:
+            break
+    return total
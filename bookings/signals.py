@@ -0,0 +1,58 @@
+"""
+Signal handlers that keep derived booking data (room-night inventory,
+occupancy-based rates and per-user summaries) current and queue booking
+emails in the outbox.
+"""
+from datetime import timedelta
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rooms import pricing
+from .models import Booking
+from . import inventory, outbox, summary
+
+
+@receiver(pre_save, sender=Booking)
+@receiver(pre_delete, sender=Booking)
+def remember_booking(sender, instance, raw=False, **kwargs):
+    """Keep the stored version of a changed or deleted booking, for the owner's summary."""
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Booking.objects.filter(pk=instance.pk).values_list(*summary.ROW_FIELDS).first()
+
+
+@receiver(post_save, sender=Booking)
+def update_room_nights(sender, instance, raw=False, **kwargs):
+    """Sync sold nights whenever a booking is created, confirmed or cancelled."""
+    if raw:
+        return
+    changed = inventory.sync_booking(instance)
+    for room_id in {room_id for room_id, _ in changed}:
+        nights = [day for changed_room, day in changed if changed_room == room_id]
+        pricing.occupancy_changed(room_id, min(nights), max(nights) + timedelta(days=1))
+
+
+@receiver(post_delete, sender=Booking)
+def release_room_nights(sender, instance, **kwargs):
+    """Nights go with the booking (cascade); make cached searches see that."""
+    inventory.release_booking(instance)
+    if instance.blocks_inventory:
+        pricing.occupancy_changed(instance.room_id, instance.check_in, instance.check_out)
+
+
+@receiver(post_save, sender=Booking)
+def update_summary(sender, instance, raw=False, **kwargs):
+    if not raw:
+        summary.booking_saved(instance, getattr(instance, '_previous', None))
+
+
+@receiver(post_delete, sender=Booking)
+def remove_from_summary(sender, instance, **kwargs):
+    summary.booking_deleted(instance, getattr(instance, '_previous', None))
+
+
+@receiver(post_save, sender=Booking)
+def queue_notifications(sender, instance, raw=False, **kwargs):
+    """Queue the emails for a status change, in the transaction of the save (see bookings.outbox)."""
+    previous = getattr(instance, '_previous', None)
+    if not raw and (previous is None or previous[summary.ROW_FIELDS.index('status')] != instance.status):
+        outbox.status_changed([instance.pk], instance.status)
@@ -0,0 +1,142 @@
+"""
+Set-based booking status changes, for bulk operations such as the admin's
+confirm and cancel actions, checkout completion and hold expiry.
+
+Booking.save and the post_save handlers change one booking at a time (room
+lock, conflict check, RoomNight rewrite, cache invalidation, occupancy
+rates, owner summaries, emails). Here the same effects are applied to many bookings
+per batch: one UPDATE of their status, one INSERT or DELETE of their
+RoomNight rows, one query for their rooms, one set of version tokens for the
+whole change, one UPDATE per owner summary and one INSERT of queued emails
+(bookings.outbox) per batch.
+total_price is kept as quoted when the booking was made.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from config.bulk import insert_rows
+from rooms import pricing
+from rooms.models import Room
+from . import inventory, outbox, summary
+from .exceptions import BookingConflict
+from .models import Booking, RoomNight
+
+BATCH_SIZE = 1000
+CONFIRMED = 'confirmed'
+CANCELLED = 'cancelled'
+NIGHT_COLUMNS = ('room_id', 'date', 'booking_id')
+# Booking columns the functions below read, in this order
+STAY_FIELDS = ('id', 'room_id', 'check_in', 'check_out', 'status', 'user_id', 'total_price')
+
+
+def _batches(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def _rooms(room_ids, lock=False):
+    """{room_id: (hotel_id, category_id)}, optionally locking the rooms in id order."""
+    rooms = Room.objects.filter(pk__in=room_ids).order_by('pk')
+    if lock:
+        rooms = rooms.select_for_update()
+    return {pk: (hotel_id, category_id) for pk, hotel_id, category_id in rooms.values_list(
+        'pk', 'hotel_id', 'category_id'
+    )}
+
+
+def _inventory_changed(stays, rooms):
+    """Invalidate caches and occupancy rates for (room_id, check_in, check_out) stays sold or released."""
+    if not stays:
+        return
+    inventory.stays_changed(stays, {room_id: category_id for room_id, (_, category_id) in rooms.items()})
+    pricing.sales_changed(
+        {rooms[room_id][0] for room_id, _, _ in stays if room_id in rooms},
+        min(check_in for _, check_in, _ in stays),
+        max(check_out for _, _, check_out in stays),
+    )
+
+
+def confirm(bookings):
+    """
+    Confirm the bookings of a queryset that are not confirmed yet, oldest
+    first, skipping any whose nights are held by another booking (or taken
+    by an older booking of the same batch). Holds keep the nights they
+    already hold. Returns (confirmed_ids, conflicting_ids). Raises
+    BookingConflict if a concurrent sale takes one of the nights.
+    """
+    confirmed, conflicts = [], []
+    with transaction.atomic():
+        stays = list(bookings.exclude(status=CONFIRMED).order_by('created_at', 'id').values_list(*STAY_FIELDS))
+        # Same lock as Booking.save, so single bookings and this batch serialize per room
+        rooms = _rooms({stay[1] for stay in stays}, lock=True)
+        sold_stays, before, after = [], [], []
+        for batch in _batches(stays):
+            room_ids = {stay[1] for stay in batch}
+            # {(room_id, night): booking_id holding it}
+            sold = dict(((room_id, day), holder) for room_id, day, holder in RoomNight.objects.filter(
+                room_id__in=room_ids,
+                date__gte=min(stay[2] for stay in batch),
+                date__lt=max(stay[3] for stay in batch),
+            ).values_list('room_id', 'date', 'booking_id'))
+            ids, rows = [], []
+            for booking_id, room_id, check_in, check_out, status, user_id, total_price in batch:
+                nights = {(room_id, day) for day in inventory.stay_dates(check_in, check_out)}
+                if any(sold.get(night, booking_id) != booking_id for night in nights):
+                    conflicts.append(booking_id)
+                    continue
+                sold.update(dict.fromkeys(nights, booking_id))
+                ids.append(booking_id)
+                before.append((user_id, status, check_in, check_out, total_price))
+                after.append((user_id, CONFIRMED, check_in, check_out, total_price))
+                if status in Booking.BLOCKING_STATUSES:
+                    continue  # a hold: its nights are already taken
+                sold_stays.append((room_id, check_in, check_out))
+                rows.extend(
+                    (room_id, connection.ops.adapt_datefield_value(day), booking_id)
+                    for _, day in sorted(nights)
+                )
+            Booking.objects.filter(pk__in=ids).update(status=CONFIRMED, updated_at=timezone.now())
+            outbox.status_changed(ids, CONFIRMED)
+            try:
+                with transaction.atomic():
+                    insert_rows(RoomNight, NIGHT_COLUMNS, rows)
+            except IntegrityError:
+                raise BookingConflict('Some of the selected bookings were sold to another guest meanwhile.')
+            confirmed.extend(ids)
+        _inventory_changed(sold_stays, rooms)
+        summary.apply_changes(before, after)
+    return confirmed, conflicts
+
+
+def cancel(bookings):
+    """Cancel the bookings of a queryset that are not cancelled yet, releasing their nights. Returns their ids."""
+    with transaction.atomic():
+        stays = list(bookings.exclude(status=CANCELLED).order_by('id').values_list(*STAY_FIELDS))
+        return release(stays, CANCELLED)
+
+
+def release(stays, new_status):
+    """
+    Move bookings given as STAY_FIELDS rows to a non-blocking ``new_status``,
+    releasing their nights. The caller has selected (and, where it matters,
+    locked) the rows in the current transaction. Returns their ids.
+    """
+    released = []
+    with transaction.atomic():
+        for batch in _batches(stays):
+            ids = [booking_id for booking_id, *_ in batch]
+            RoomNight.objects.filter(booking_id__in=ids).delete()
+            Booking.objects.filter(pk__in=ids).update(status=new_status, updated_at=timezone.now())
+            outbox.status_changed(ids, new_status)
+            released.extend(ids)
+        freed = [
+            (room_id, check_in, check_out)
+            for _, room_id, check_in, check_out, status, _, _ in stays if status in Booking.BLOCKING_STATUSES
+        ]
+        _inventory_changed(freed, _rooms({room_id for room_id, _, _ in freed}))
+        summary.apply_changes(
+            [(user_id, status, check_in, check_out, total_price)
+             for _, _, check_in, check_out, status, user_id, total_price in stays],
+            [(user_id, new_status, check_in, check_out, total_price)
+             for _, _, check_in, check_out, _, user_id, total_price in stays],
+        )
+    return released
@@ -0,0 +1,130 @@
+"""
+Per-user booking summaries: stays, nights and spend over the bookings that
+are not cancelled or expired, plus the stays still to come, stored in one
+BookingSummary row per user.
+
+Every booking change adds the difference between the booking's stored row
+before and after it to the owner's summary with one UPDATE (signal handlers
+for single saves and deletes, bookings.status for bulk status changes).
+Reading a summary is one query; a missing one is built from the user's
+bookings, and "upcoming" is recounted on an index once per day, since it
+shrinks as stays begin without any booking changing.
+"""
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, F, When
+from .models import Booking, BookingSummary
+
+# Statuses left out of the totals
+UNCOUNTED = ('cancelled', 'expired')
+# Booking columns a summary is computed from, in the order the functions below expect
+ROW_FIELDS = ('user_id', 'status', 'check_in', 'check_out', 'total_price')
+SUMMARY_FIELDS = ('stays', 'nights', 'total_spend', 'upcoming_stays', 'upcoming_as_of')
+
+
+def row_of(booking):
+    return tuple(getattr(booking, field) for field in ROW_FIELDS)
+
+
+def _add(totals, row, sign, today):
+    user_id, status, check_in, check_out, total_price = row
+    if user_id is None or status in UNCOUNTED:
+        return
+    stays, nights, spend, upcoming = totals.get(user_id, (0, 0, Decimal(0), 0))
+    totals[user_id] = (
+        stays + sign,
+        nights + sign * (check_out - check_in).days,
+        spend + sign * Decimal(total_price),
+        upcoming + sign * (check_in >= today),
+    )
+
+
+def apply_changes(removed=(), added=()):
+    """
+    Update the summaries of the owners of some bookings, given their ROW_FIELDS
+    values before (``removed``) and after (``added``) a change. Users without a
+    summary row yet are skipped: theirs is built from scratch when first read.
+    """
+    today = date.today()
+    totals = {}
+    for row in removed:
+        _add(totals, row, -1, today)
+    for row in added:
+        _add(totals, row, 1, today)
+    for user_id, (stays, nights, spend, upcoming) in sorted(totals.items()):
+        if not (stays or nights or spend or upcoming):
+            continue
+        BookingSummary.objects.filter(user_id=user_id).update(
+            stays=F('stays') + stays,
+            nights=F('nights') + nights,
+            total_spend=F('total_spend') + spend,
+            # A count taken on an earlier day is recounted on read anyway
+            upcoming_stays=Case(
+                When(upcoming_as_of=today, then=F('upcoming_stays') + upcoming),
+                default=F('upcoming_stays'),
+            ),
+        )
+
+
+def booking_saved(booking, previous=None):
+    """Account for a created or changed booking; ``previous`` is its stored row before the save."""
+    apply_changes([previous] if previous else [], [row_of(booking)])
+
+
+def booking_deleted(booking, previous=None):
+    """Account for a deleted booking; ``previous`` is its stored row, if the instance may be stale."""
+    apply_changes([previous or row_of(booking)])
+
+
+def upcoming_stays(user_id, today):
+    return Booking.objects.filter(user_id=user_id, check_in__gte=today).exclude(status__in=UNCOUNTED).count()
+
+
+def for_user(user):
+    """The user's summary: one query, plus a recount of upcoming stays on a new day."""
+    today = date.today()
+    summary = BookingSummary.objects.filter(user=user).first()
+    if summary is None:
+        return rebuild([user.pk])[0]
+    if summary.upcoming_as_of != today:
+        summary.upcoming_stays = upcoming_stays(user.pk, today)
+        summary.upcoming_as_of = today
+        summary.save(update_fields=['upcoming_stays', 'upcoming_as_of'])
+    return summary
+
+
+def rebuild(user_ids=None):
+    """
+    Recompute the summaries of some users (every user with bookings when
+    ``user_ids`` is None) from their bookings; returns the rows written.
+    """
+    today = date.today()
+    bookings = Booking.objects.filter(user__isnull=False).exclude(status__in=UNCOUNTED)
+    if user_ids is not None:
+        bookings = bookings.filter(user_id__in=user_ids)
+    totals = {}
+    for row in bookings.order_by().values_list(*ROW_FIELDS).iterator(chunk_size=5000):
+        _add(totals, row, 1, today)
+    summaries = []
+    for user_id in sorted(totals) if user_ids is None else user_ids:
+        stays, nights, spend, upcoming = totals.get(user_id, (0, 0, Decimal(0), 0))
+        summaries.append(BookingSummary(
+            user_id=user_id,
+            stays=stays,
+            nights=nights,
+            total_spend=spend,
+            upcoming_stays=upcoming,
+            upcoming_as_of=today,
+        ))
+    with transaction.atomic():
+        if user_ids is None:
+            BookingSummary.objects.all().delete()
+        BookingSummary.objects.bulk_create(
+            summaries,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=list(SUMMARY_FIELDS),
+        )
+    return summaries
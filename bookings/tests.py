@@ -0,0 +1,472 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+import csv
+import os
+import tempfile
+from base64 import urlsafe_b64encode
+from unittest import mock
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from bookings import history, holds, importer, inventory, outbox, status, summary
+from bookings.groups import book_group
+from bookings.exceptions import BookingConflict
+from bookings.management.commands.stress_bookings import Command as StressBookings
+from bookings.models import Booking, BookingSummary, ImportProgress, Notification, RoomNight
+from rooms.models import Hotel, Room, RoomCategory
+
+
+def make_room(name='Room 101'):
+    category, _ = RoomCategory.objects.get_or_create(slug='double-room', defaults={'name': 'Double Room'})
+    hotel = Hotel.objects.create(name='Test Hotel', address='1 Test Street')
+    return Room.objects.create(
+        hotel=hotel, category=category, name=name, description='A room', price_per_night=Decimal('100.00')
+    )
+
+
+def book(room, check_in, nights, status='confirmed', **details):
+    return Booking.objects.create(
+        room=room, check_in=check_in, check_out=check_in + timedelta(days=nights), status=status, guest_name='Guest',
+        **details,
+    )
+
+
+# Templates render without a collectstatic manifest
+STATIC_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+class FailingBackend(BaseEmailBackend):
+    """Email backend whose server rejects every message."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('mail server down')
+
+
+class BookingConflictTests(TestCase):
+    """A night of a room is held by one blocking booking at most."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = make_room()
+        cls.day = date.today() + timedelta(days=10)
+
+    def test_overlapping_stay_is_rejected(self):
+        book(self.room, self.day, 3)
+        with self.assertRaises(BookingConflict):
+            book(self.room, self.day + timedelta(days=2), 2)
+        self.assertEqual(Booking.objects.filter(room=self.room).count(), 1)
+
+    def test_back_to_back_stays_are_accepted(self):
+        book(self.room, self.day, 2)
+        book(self.room, self.day + timedelta(days=2), 2)
+        self.assertEqual(RoomNight.objects.filter(room=self.room).count(), 4)
+
+    def test_pending_hold_blocks_its_nights(self):
+        book(self.room, self.day, 2, status='pending')
+        with self.assertRaises(BookingConflict):
+            book(self.room, self.day + timedelta(days=1), 1)
+
+    def test_cancelling_releases_nights(self):
+        first = book(self.room, self.day, 2)
+        first.status = 'cancelled'
+        first.save()
+        self.assertFalse(RoomNight.objects.filter(booking=first).exists())
+        book(self.room, self.day, 2)
+
+    def test_room_night_constraint_rejects_a_second_holder(self):
+        first = book(self.room, self.day, 1)
+        second = book(self.room, self.day + timedelta(days=5), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RoomNight.objects.create(room=self.room, date=self.day, booking=second)
+        self.assertEqual(RoomNight.objects.get(room=self.room, date=self.day).booking, first)
+
+
+class GroupBookingTests(TestCase):
+    """A group reservation books every room or none."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rooms = [make_room(f'Room {number}') for number in (101, 102, 103)]
+        cls.day = date.today() + timedelta(days=10)
+
+    def book_group(self, rooms):
+        return book_group(rooms, self.day, self.day + timedelta(days=2), len(rooms), guest_name='Group')
+
+    def test_books_every_room(self):
+        bookings = self.book_group(self.rooms)
+        self.assertEqual({booking.group_ref for booking in bookings}, {bookings[0].group_ref})
+        self.assertEqual(RoomNight.objects.filter(booking__in=bookings).count(), 6)
+
+    def test_sold_room_rolls_back_the_group(self):
+        book(self.rooms[1], self.day + timedelta(days=1), 1)
+        with self.assertRaises(BookingConflict):
+            self.book_group(self.rooms)
+        self.assertFalse(Booking.objects.filter(group_ref__isnull=False).exists())
+        self.assertEqual(RoomNight.objects.count(), 1)
+
+    def test_conflict_after_some_rooms_are_saved_rolls_them_back(self):
+        # The same room twice passes the up-front check and conflicts on save
+        with self.assertRaises(BookingConflict):
+            self.book_group([self.rooms[0], self.rooms[1], self.rooms[0]])
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(RoomNight.objects.exists())
+
+
+class InventoryRebuildTests(TestCase):
+    """Rebuilding the inventory reports double bookings instead of hiding them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = make_room()
+        cls.day = date.today() + timedelta(days=10)
+        cls.first = book(cls.room, cls.day, 3)
+        book(cls.room, cls.day + timedelta(days=5), 2)
+        # Written around Booking.save, as raw SQL or an old bug would
+        cls.overlap, = Booking.objects.bulk_create([Booking(
+            room=cls.room, check_in=cls.day + timedelta(days=2), check_out=cls.day + timedelta(days=4),
+            status='confirmed', guest_name='Guest',
+        )])
+
+    def test_overlapping_booking_is_reported(self):
+        for batch_size in (1, 5000):  # found across batches and within one
+            with self.subTest(batch_size=batch_size):
+                written, conflicts = inventory.rebuild(batch_size=batch_size)
+                self.assertEqual(written, 5)
+                self.assertEqual(conflicts, [(self.overlap.pk, self.first.pk)])
+                self.assertFalse(RoomNight.objects.filter(booking=self.overlap).exists())
+                self.assertEqual(RoomNight.objects.filter(booking=self.first).count(), 3)
+
+    def test_command_fails_on_double_bookings(self):
+        err = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 double-booked booking(s) found'):
+            call_command('rebuild_room_nights', stdout=StringIO(), stderr=err)
+        self.assertIn(f'Booking {self.overlap.pk} overlaps booking {self.first.pk}', err.getvalue())
+
+
+class HoldTests(TestCase):
+    """Only checkout holds expire; other pending bookings wait for staff."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = make_room()
+        cls.day = date.today() + timedelta(days=10)
+
+    def sweep(self):
+        return holds.expire(now=timezone.now() + timedelta(days=1))
+
+    def test_checkout_hold_expires_and_releases_its_nights(self):
+        response = self.client.post(reverse('bookings:create', args=[self.room.pk]), {
+            'check_in': self.day, 'check_out': self.day + timedelta(days=2), 'num_guests': 1,
+            'guest_name': 'Guest', 'guest_email': 'guest@example.com',
+        })
+        booking = Booking.objects.get(room=self.room)
+        self.assertRedirects(
+            response, reverse('bookings:confirmation', args=[booking.pk]), fetch_redirect_response=False
+        )
+        self.assertTrue(booking.is_hold)
+        self.assertEqual(RoomNight.objects.filter(booking=booking).count(), 2)
+        self.assertEqual(self.sweep().expired, 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'expired')
+        self.assertFalse(RoomNight.objects.filter(booking=booking).exists())
+
+    def test_admin_pending_booking_survives_a_sweep(self):
+        booking = book(self.room, self.day, 2, status='pending')
+        self.assertIsNone(booking.hold_expires_at)
+        self.assertEqual(self.sweep().expired, 0)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'pending')
+        self.assertEqual(RoomNight.objects.filter(booking=booking).count(), 2)
+
+    def test_imported_pending_booking_survives_a_sweep(self):
+        imported, rejects = importer.import_batch([(2, {
+            'room_id': str(self.room.pk), 'check_in': self.day.isoformat(),
+            'check_out': (self.day + timedelta(days=2)).isoformat(), 'status': 'pending',
+        })])
+        self.assertEqual((imported, rejects), (1, []))
+        self.assertEqual(self.sweep().expired, 0)
+        booking = Booking.objects.get(room=self.room)
+        self.assertEqual(booking.status, 'pending')
+        self.assertIsNone(booking.hold_expires_at)
+        self.assertEqual(RoomNight.objects.filter(booking=booking).count(), 2)
+
+    def test_legacy_pending_booking_awaits_confirmation(self):
+        legacy = book(self.room, self.day, 2, status='pending')
+        held = book(self.room, self.day + timedelta(days=5), 2, status='pending')
+        RoomNight.objects.filter(booking=legacy).delete()  # made before pending bookings held nights
+        migration = import_module('bookings.migrations.0010_requested_status')
+        migration.request_legacy_pending(apps, None)
+        legacy.refresh_from_db()
+        held.refresh_from_db()
+        self.assertEqual((legacy.status, held.status), ('requested', 'pending'))
+        self.assertEqual(self.sweep().expired, 0)
+        self.assertEqual(status.confirm(Booking.objects.filter(pk=legacy.pk)), ([legacy.pk], []))
+        self.assertEqual(RoomNight.objects.filter(booking=legacy).count(), 2)
+
+
+class ImportTests(TestCase):
+    """Bulk import rejects bad rows with a reason and resumes after the last committed batch."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = make_room()
+        cls.day = date.today() + timedelta(days=10)
+
+    def row(self, offset, nights=2, **fields):
+        check_in = self.day + timedelta(days=offset)
+        return {
+            'room_id': str(self.room.pk), 'check_in': check_in.isoformat(),
+            'check_out': (check_in + timedelta(days=nights)).isoformat(), **fields,
+        }
+
+    def test_batch_rejects_bad_rows(self):
+        book(self.room, self.day + timedelta(days=20), 2)
+        imported, rejects = importer.import_batch([
+            (1, self.row(0)),
+            (2, self.row(0, room_id='999999')),
+            (3, {**self.row(12, room_id=''), 'hotel': 'Test Hotel', 'room': 'Room 999'}),
+            (4, self.row(0, check_out='tomorrow')),
+            (5, self.row(0, nights=0)),
+            (6, self.row(1)),
+            (7, self.row(21)),
+            (8, importer.InvalidRow('invalid JSON: oops', '{oops')),
+            (9, self.row(5, status='pending')),
+        ])
+        self.assertEqual(imported, 2)
+        self.assertEqual([(number, reason) for number, _, reason in rejects], [
+            (2, 'room not found'),
+            (3, 'room not found'),
+            (4, "check_out 'tomorrow' is not a YYYY-MM-DD date"),
+            (5, 'check_out must be after check_in'),
+            (6, 'overlaps an earlier row for the same room'),
+            (7, 'nights already booked'),
+            (8, 'invalid JSON: oops'),
+        ])
+        statuses = sorted(Booking.objects.values_list('status', flat=True))
+        self.assertEqual(statuses, ['confirmed', 'confirmed', 'pending'])
+        self.assertEqual(RoomNight.objects.filter(room=self.room).count(), 6)
+
+    def test_interrupted_import_resumes_after_the_last_committed_batch(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'bookings.csv')
+        rows = [self.row(0), self.row(0, room_id='999999'), self.row(4), self.row(8, check_in='soon')]
+        with open(path, 'w', newline='') as handle:
+            writer = csv.DictWriter(handle, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+        def import_file():
+            call_command('import_bookings', path, '--batch-size', '2', stdout=StringIO(), stderr=StringIO())
+
+        record_progress = importer.record_progress
+        calls = []
+
+        def crash_on_second_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('killed')
+            record_progress(*args)
+
+        # The second batch's rejects are written before the crash rolls the batch back
+        with mock.patch.object(importer, 'record_progress', crash_on_second_batch):
+            with self.assertRaisesMessage(RuntimeError, 'killed'):
+                import_file()
+        progress = ImportProgress.objects.get(source=os.path.abspath(path))
+        self.assertEqual((progress.rows, progress.imported, progress.rejected), (2, 1, 1))
+        self.assertEqual(Booking.objects.count(), 1)
+
+        import_file()
+        import_file()  # a finished file is not imported again
+        progress.refresh_from_db()
+        self.assertEqual((progress.rows, progress.imported, progress.rejected), (4, 2, 2))
+        self.assertEqual(Booking.objects.count(), 2)
+        with open(f'{path}.rejects.csv', newline='') as handle:
+            self.assertEqual([line[0] for line in csv.reader(handle)], ['row', '2', '4'])
+
+
+@override_settings(STATICFILES_STORAGE=STATIC_STORAGE)
+class HistoryTests(TestCase):
+    """History pages are keyset pages on (created_at, id) that survive ties and reject bad cursors."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('guest', password='secret')
+        room = make_room()
+        day = date.today() + timedelta(days=10)
+        bookings = [book(room, day + timedelta(days=3 * n), 2, user=cls.user) for n in range(8)]
+        # Bookings made in the same instant, as bulk imports and group bookings are
+        moments = [timezone.now() - timedelta(hours=hours) for hours in (1, 1, 1, 1, 2, 3, 3, 3)]
+        for booking, moment in zip(bookings, moments):
+            Booking.objects.filter(pk=booking.pk).update(created_at=moment)
+        cls.expected = list(Booking.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_pages_cover_every_booking_once_with_ties(self):
+        for page_size in (1, 3, 4, 8):
+            seen, cursor = [], None
+            while True:
+                page, cursor = history.paginate(history.bookings_for(self.user), cursor, page_size)
+                seen += [booking.pk for booking in page]
+                if cursor is None:
+                    break
+            self.assertEqual(seen, self.expected, page_size)
+
+    def test_cursor_round_trip(self):
+        booking = Booking.objects.get(pk=self.expected[2])
+        self.assertEqual(history.decode_cursor(history.encode_cursor(booking)), (booking.created_at, booking.pk))
+        after = history.after(history.bookings_for(self.user), history.encode_cursor(booking))
+        self.assertEqual([booking.pk for booking in after], self.expected[3:])
+
+    def test_malformed_cursors_are_rejected(self):
+        encoded = [urlsafe_b64encode(raw.encode()).decode() for raw in (
+            'yesterday|1', '2026-01-01T00:00:00+00:00|one', '2026-01-01T00:00:00+00:00', '2026-01-01T00:00:00|1',
+            '2026-01-01T00:00:00+00:00|1|2',
+        )]
+        for cursor in ['not a cursor', '\u00e9', urlsafe_b64encode(b'\xff\xfe').decode(), *encoded]:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                history.after(history.bookings_for(self.user), cursor)
+
+    def test_history_page_falls_back_to_the_first_page_on_a_bad_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('bookings:history'), {'cursor': 'not a cursor'})
+        self.assertEqual(response.status_code, 200)
+        first_page = self.expected[:history.PAGE_SIZE]
+        self.assertEqual([booking.pk for booking in response.context['bookings']], first_page)
+
+
+class SummaryTests(TestCase):
+    """Summaries kept up to date change by change agree with ones rebuilt from the bookings."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('guest', password='secret')
+        cls.room = make_room()
+        cls.day = date.today() + timedelta(days=10)
+
+    def setUp(self):
+        summary.for_user(self.user)  # changes only update an existing summary row
+
+    def assertMatchesRebuild(self):
+        kept = BookingSummary.objects.values_list(*summary.SUMMARY_FIELDS).get(user=self.user)
+        rebuilt = summary.rebuild([self.user.pk])[0]
+        self.assertEqual(kept, tuple(getattr(rebuilt, field) for field in summary.SUMMARY_FIELDS))
+        return kept
+
+    def test_changes_match_a_rebuild(self):
+        stay = book(self.room, self.day, 2, user=self.user)
+        past = book(self.room, date.today() - timedelta(days=5), 3, user=self.user)
+        book(self.room, self.day + timedelta(days=10), 1, user=self.user, status='pending')
+        book(self.room, self.day + timedelta(days=20), 1)  # another guest's booking
+        self.assertEqual(self.assertMatchesRebuild()[:2], (3, 6))
+
+        stay.check_out += timedelta(days=2)  # repriced by save()
+        stay.save()
+        self.assertEqual(self.assertMatchesRebuild()[:3], (3, 8, Decimal('800.00')))
+
+        stay.status = 'cancelled'
+        stay.save()
+        self.assertEqual(self.assertMatchesRebuild()[:2], (2, 4))
+
+        status.cancel(Booking.objects.filter(status='pending'))
+        self.assertEqual(self.assertMatchesRebuild()[:2], (1, 3))
+
+        past.delete()
+        stay.delete()
+        self.assertEqual(self.assertMatchesRebuild(), (0, 0, Decimal('0.00'), 0, date.today()))
+
+
+class OutboxTests(TestCase):
+    """Booking emails are queued with the change and sent by the outbox worker (locmem backend)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = make_room()
+        cls.day = date.today() + timedelta(days=10)
+        cls.user = User.objects.create_user('guest', 'guest@example.com', 'secret')
+
+    def queued(self, kind):
+        return Notification.objects.filter(kind=kind, status=outbox.QUEUED)
+
+    def test_checkout_sends_a_confirmation_and_queues_a_reminder(self):
+        self.client.post(reverse('bookings:create', args=[self.room.pk]), {
+            'check_in': self.day, 'check_out': self.day + timedelta(days=2), 'num_guests': 1,
+            'guest_name': 'Guest', 'guest_email': 'guest@example.com',
+        })
+        booking = Booking.objects.get(room=self.room)
+        self.assertFalse(Notification.objects.exists())  # holds are not announced
+        self.client.post(reverse('bookings:complete', args=[booking.pk]))
+        delivery = outbox.drain()
+        self.assertEqual((delivery.sent, delivery.failed), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['guest@example.com'])
+        self.assertEqual(mail.outbox[0].subject, f'Your booking #{booking.pk} is confirmed')
+        reminder = self.queued(Notification.REMINDER).get()
+        self.assertEqual(reminder.next_attempt_at, outbox.reminder_time(booking.check_in))
+
+    def test_cancelling_skips_the_reminder_and_sends_a_cancellation(self):
+        booking = book(self.room, self.day, 2, user=self.user, guest_email='guest@example.com')
+        outbox.drain()
+        self.client.force_login(self.user)
+        self.client.post(reverse('bookings:cancel', args=[booking.pk]))
+        self.assertEqual(outbox.drain().sent, 1)
+        self.assertEqual([message.subject for message in mail.outbox], [
+            f'Your booking #{booking.pk} is confirmed', f'Your booking #{booking.pk} has been cancelled',
+        ])
+        self.assertEqual(Notification.objects.get(kind=Notification.REMINDER).status, outbox.SKIPPED)
+
+    def test_replayed_change_queues_each_email_once(self):
+        booking = book(self.room, self.day, 2, guest_email='guest@example.com')
+        outbox.status_changed([booking.pk], 'confirmed')
+        self.assertEqual(Notification.objects.filter(booking=booking).count(), 2)
+        outbox.drain()
+        outbox.status_changed([booking.pk], 'confirmed')
+        self.assertEqual(outbox.drain().claimed, 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_rolled_back_change_queues_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            book(self.room, self.day, 2, guest_email='guest@example.com')
+            raise RuntimeError('payment declined')
+        self.assertFalse(Notification.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='bookings.tests.FailingBackend', NOTIFICATION_MAX_ATTEMPTS=3)
+    def test_failed_sends_back_off_until_max_attempts(self):
+        book(self.room, self.day, 2, guest_email='guest@example.com')
+        note = self.queued(Notification.CONFIRMATION).get()
+        now = timezone.now()
+        for attempt in (1, 2):
+            delivery = outbox.deliver(now=now)
+            self.assertEqual((delivery.retried, delivery.failed), (1, 0))
+            note.refresh_from_db()
+            self.assertEqual((note.status, note.attempts), (outbox.QUEUED, attempt))
+            self.assertIn('mail server down', note.last_error)
+            self.assertGreaterEqual(note.next_attempt_at - now, outbox.RETRY_BASE * 2 ** (attempt - 1))
+            self.assertEqual(outbox.deliver(now=now).claimed, 0)  # not due before its backoff
+            now = note.next_attempt_at
+        self.assertEqual(outbox.deliver(now=now).failed, 1)
+        note.refresh_from_db()
+        self.assertEqual((note.status, note.attempts), (outbox.FAILED, 3))
+        self.assertEqual(mail.outbox, [])
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Parallel bookings of the same room never produce overlapping stays."""
+
+    def test_no_overlaps_under_contention(self):
+        room = make_room()
+        out = StringIO()
+        call_command('stress_bookings', threads=6, attempts=15, rooms=1, days=10, seed=7, keep=True, stdout=out)
+        self.assertIn('No overlapping confirmed bookings.', out.getvalue())
+        self.assertEqual(StressBookings().find_overlaps([room.pk]), [])
+        booked = Booking.objects.filter(room=room, status__in=Booking.BLOCKING_STATUSES)
+        self.assertGreater(booked.count(), 0)
+        nights = sum(booking.get_nights() for booking in booked)
+        self.assertEqual(RoomNight.objects.filter(room=room).count(), nights)
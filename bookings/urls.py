@@ -1,14 +1,24 @@
 """
 URL configuration for bookings app.
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 app_name = 'bookings'
 
 urlpatterns = [
     path('create/<int:room_id>/', views.booking_create, name='create'),
-    path('confirmation/<int:pk>/', views.booking_confirmation, name='confirmation'),
+    path('confirmation/<int:pk>/', read_views.booking_confirmation, name='confirmation'),
+    path('complete/<int:pk>/', views.booking_complete, name='complete'),
+    path('group/', views.group_booking_create, name='group_create'),
+    path('group/<uuid:ref>/', views.group_confirmation, name='group_confirmation'),
+    path('group/<uuid:ref>/complete/', views.group_complete, name='group_complete'),
     path('history/', views.BookingHistoryView.as_view(), name='history'),
     path('cancel/<int:pk>/', views.booking_cancel, name='cancel'),
 ]
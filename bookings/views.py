@@ -1,15 +1,39 @@
 """
-Booking views: create booking, confirmation, history, cancel.
+Booking views: create booking (a hold), complete checkout, confirmation, history, cancel.
 """
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
 from datetime import date
+from .exceptions import BookingConflict
+from .groups import book_group
 from .models import Booking
-from .forms import BookingForm
+from .forms import BookingForm, BookingHistoryFilterForm, GroupBookingForm
+from . import history, holds, summary
 from rooms.models import Room
+from rooms.views import page_links
+
+# Session key listing the bookings this browser placed, so anonymous guests can complete theirs
+HELD_SESSION_KEY = 'held_bookings'
+MAX_REMEMBERED_HOLDS = 20
+
+
+def _remember_holds(request, bookings):
+    held = request.session.get(HELD_SESSION_KEY, []) + [booking.pk for booking in bookings]
+    request.session[HELD_SESSION_KEY] = held[-MAX_REMEMBERED_HOLDS:]
+
+
+def _may_complete(request, booking):
+    """Staff, the booking's owner, or the session that placed an anonymous booking."""
+    if request.user.is_staff:
+        return True
+    if booking.user_id is not None:
+        return booking.user_id == request.user.pk
+    return booking.pk in request.session.get(HELD_SESSION_KEY, [])
 
 
 def booking_create(request, room_id):
@@ -33,9 +57,15 @@ def booking_create(request, room_id):
         booking = form.save(commit=False)
         booking.room = room
         booking.user = request.user if request.user.is_authenticated else None
-        booking.save()
-        messages.success(request, 'Booking submitted successfully!')
-        return redirect('bookings:confirmation', pk=booking.pk)
+        booking.hold_expires_at = Booking.hold_deadline()
+        try:
+            booking.save()
+        except BookingConflict as exc:
+            form.add_error(None, str(exc))
+        else:
+            _remember_holds(request, [booking])
+            messages.success(request, 'The room is on hold for you: complete your booking to confirm it.')
+            return redirect('bookings:confirmation', pk=booking.pk)
 
     context = {'form': form, 'room': room}
     return render(request, 'bookings/booking_form.html', context)
@@ -51,18 +81,149 @@ def booking_confirmation(request, pk):
     return render(request, 'bookings/booking_confirmation.html', context)
 
 
+def group_booking_create(request):
+    """Book every room of a group search offer in one transaction."""
+    form = GroupBookingForm(request.POST or None, initial={
+        'check_in': request.GET.get('check_in'),
+        'check_out': request.GET.get('check_out'),
+        'num_guests': request.GET.get('guests'),
+        'rooms': request.GET.get('rooms'),
+    })
+    if request.method == 'GET' and request.user.is_authenticated:
+        form.initial['guest_name'] = request.user.get_full_name() or request.user.username
+        form.initial['guest_email'] = request.user.email
+
+    if form.is_valid():
+        data = form.cleaned_data
+        try:
+            bookings = book_group(
+                data['rooms'], data['check_in'], data['check_out'], data['num_guests'],
+                user=request.user if request.user.is_authenticated else None,
+                guest_name=data['guest_name'],
+                guest_email=data['guest_email'],
+                guest_phone=data['guest_phone'],
+                special_requests=data['special_requests'],
+                hold_expires_at=Booking.hold_deadline(),
+            )
+        except BookingConflict as exc:
+            form.add_error(None, str(exc))
+        else:
+            _remember_holds(request, bookings)
+            messages.success(request, 'The rooms are on hold for you: complete your booking to confirm them.')
+            return redirect('bookings:group_confirmation', ref=bookings[0].group_ref)
+
+    rooms = _offer_rooms(form['rooms'].value())
+    context = {
+        'form': form,
+        'rooms': rooms,
+        'total_price': _group_total(rooms, form),
+    }
+    return render(request, 'bookings/group_booking_form.html', context)
+
+
+def _offer_rooms(value):
+    """Rooms named by a comma-separated id list, for the booking summary."""
+    try:
+        room_ids = [int(room_id) for room_id in (value or '').split(',') if room_id]
+    except ValueError:
+        return []
+    rooms = Room.objects.select_related('hotel', 'category').in_bulk(room_ids)
+    return [rooms[room_id] for room_id in room_ids if room_id in rooms]
+
+
+def _group_total(rooms, form):
+    """Total price of the selection for the form's dates, or None if they are not valid yet."""
+    try:
+        check_in, check_out = (date.fromisoformat(str(form[name].value())) for name in ('check_in', 'check_out'))
+    except ValueError:
+        return None
+    if not rooms or check_out <= check_in:
+        return None
+    return sum(Booking.price_for(room, check_in, check_out) for room in rooms)
+
+
+def group_confirmation(request, ref):
+    """Summary of every booking of one group reservation."""
+    bookings = list(
+        Booking.objects.filter(group_ref=ref).select_related('room', 'room__hotel', 'room__category').order_by('id')
+    )
+    if not bookings:
+        raise Http404('No group booking found matching the query')
+    context = {
+        'bookings': bookings,
+        'first': bookings[0],
+        'total_price': sum(booking.total_price for booking in bookings),
+        'num_guests': sum(booking.num_guests for booking in bookings),
+    }
+    return render(request, 'bookings/group_confirmation.html', context)
+
+
+def _complete(request, bookings):
+    """Confirm the holds among ``bookings`` (the guest's first), with a message on the outcome."""
+    if not _may_complete(request, bookings[0]):
+        messages.error(request, 'You do not have permission to complete this booking.')
+    elif holds.complete(Booking.objects.filter(pk__in=[booking.pk for booking in bookings])):
+        messages.success(request, 'Your booking is confirmed. Thank you!')
+    elif all(booking.status == 'confirmed' for booking in bookings):
+        messages.info(request, 'This booking is already confirmed.')
+    elif bookings[0].awaits_confirmation:
+        messages.info(request, 'This booking is waiting for the hotel to confirm it.')
+    elif any(booking.is_hold for booking in bookings):
+        messages.error(request, 'Your hold has expired and the room was released. Please book again.')
+    else:
+        messages.error(request, f'This booking is {bookings[0].status} and can no longer be completed.')
+
+
+@require_POST
+def booking_complete(request, pk):
+    """Complete checkout: confirm a held booking before its hold runs out."""
+    _complete(request, [get_object_or_404(Booking, pk=pk)])
+    return redirect('bookings:confirmation', pk=pk)
+
+
+@require_POST
+def group_complete(request, ref):
+    """Complete checkout for every room of a group reservation."""
+    bookings = list(Booking.objects.filter(group_ref=ref).order_by('id'))
+    if not bookings:
+        raise Http404('No group booking found matching the query')
+    _complete(request, bookings)
+    return redirect('bookings:group_confirmation', ref=ref)
+
+
 class BookingHistoryView(LoginRequiredMixin, ListView):
-    """User's booking history."""
+    """
+    User's booking history with their summary totals. Keyset pages via
+    ?cursor= (see bookings.history), filterable by status and booking date.
+    """
     model = Booking
     template_name = 'bookings/booking_history.html'
     context_object_name = 'bookings'
-    paginate_by = 10
+    page_size = history.PAGE_SIZE
     login_url = reverse_lazy('accounts:login')
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).select_related(
-            'room', 'room__hotel', 'room__category'
-        ).order_by('-created_at')
+        self.form = BookingHistoryFilterForm(self.request.GET)
+        self.filters = {}
+        if self.form.is_valid():
+            self.filters = {name: value for name, value in self.form.cleaned_data.items() if value}
+        return history.bookings_for(self.request.user, **self.filters)
+
+    def get_context_data(self, **kwargs):
+        cursor = self.request.GET.get('cursor')
+        try:
+            bookings, next_cursor = history.paginate(self.object_list, cursor, self.page_size)
+        except ValueError:
+            cursor = None
+            bookings, next_cursor = history.paginate(self.object_list, page_size=self.page_size)
+        context = super().get_context_data(object_list=bookings, **kwargs)
+        context.update({
+            'form': self.form,
+            'filtered': bool(self.filters),
+            'summary': summary.for_user(self.request.user),
+            **page_links(self.request, cursor, next_cursor),
+        })
+        return context
 
 
 def booking_cancel(request, pk):
@@ -72,8 +233,8 @@ def booking_cancel(request, pk):
     if not (request.user == booking.user or request.user.is_staff):
         messages.error(request, 'You do not have permission to cancel this booking.')
         return redirect('bookings:history')
-    if booking.status == 'cancelled':
-        messages.info(request, 'This booking is already cancelled.')
+    if not booking.blocks_inventory:
+        messages.info(request, f'This booking is already {booking.status}.')
         return redirect('bookings:history')
     booking.status = 'cancelled'
     booking.save()
@@ -0,0 +1,9 @@
+"""
+Helpers for async views.
+"""
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+# Templates may touch request.user, the session or lazy querysets, which the
+# ORM only allows from sync code: render in the request's sync thread.
+arender = sync_to_async(render)
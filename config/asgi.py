@@ -5,4 +5,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Under ASGI serve the async versions of the read-heavy views
+os.environ.setdefault('ASYNC_VIEWS', 'true')
 application = get_asgi_application()
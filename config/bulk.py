@@ -0,0 +1,23 @@
+"""
+Bulk INSERT of prepared rows, for the few writers (synthetic data, compiled
+rate tables) whose row counts make bulk_create's per-instance cost dominate.
+"""
+from django.db import connection
+
+
+def insert_rows(model, columns, rows):
+    """
+    INSERT value tuples (already adapted for the database, e.g. with
+    connection.ops.adapt_datefield_value) with one executemany; returns the row count.
+    """
+    if not rows:
+        return 0
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(model._meta.get_field(name).column) for name in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
@@ -0,0 +1,131 @@
+"""
+Admin changelists over tables too large to count or scan.
+
+Django's changelist counts the filtered rows and the whole table with
+COUNT(*) on every page, and its date hierarchy lists years, months or days
+with a SELECT DISTINCT over every row. LargeTableAdmin replaces both:
+
+- ApproximatePaginator takes an unfiltered table's row count from the
+  planner's statistics (pg_class on PostgreSQL, sqlite_stat1 after ANALYZE on
+  SQLite) and counts a filtered result only up to ADMIN_COUNT_LIMIT rows,
+  so the last pages of a huge result are reachable only by narrowing it;
+- IndexedDatesQuerySet answers the date hierarchy with one MIN() per
+  year/month/day shown, each a single seek on an index of the date field.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Min
+from django.utils.functional import cached_property
+
+
+def estimated_rows(model, using='default'):
+    """Row count of a model's table from planner statistics, or None if there are none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)', [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of any index's stat is the table's row count
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(float(str(row[0]).split()[0]))
+    return estimate if estimate >= 0 else None  # -1: never analyzed (PostgreSQL 14+)
+
+
+class ApproximatePaginator(Paginator):
+    """Paginator whose count never scans more than ADMIN_COUNT_LIMIT rows."""
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_COUNT_LIMIT
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > limit:
+                return estimate
+        # COUNT(*) over a LIMITed subquery stops after ``limit`` rows
+        return queryset.order_by()[:limit].count()
+
+
+class IndexedDatesQuerySet:
+    """
+    Mixin for a QuerySet whose dates() walks an index of the date field:
+    the first date of each period is MIN(field) over the rows on or after
+    the period's start, so N periods take N + 1 seeks instead of a scan.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        periods = []
+        queryset = self.order_by()
+        start = None
+        while True:
+            rows = queryset if start is None else queryset.filter(**{f'{field_name}__gte': start})
+            first = rows.aggregate(first=Min(field_name))['first']
+            if first is None:
+                break
+            period = _truncate(first, kind)
+            periods.append(period)
+            start = _next_period(period, kind)
+            if start is None:
+                break
+        return periods if order == 'ASC' else periods[::-1]
+
+
+def _truncate(day, kind):
+    if kind == 'year':
+        return date(day.year, 1, 1)
+    if kind == 'month':
+        return date(day.year, day.month, 1)
+    return date(day.year, day.month, day.day)
+
+
+def _next_period(period, kind):
+    """Start of the period after ``period``, or None past date.max."""
+    if kind == 'day':
+        return period + timedelta(days=1) if period < date.max else None
+    if kind == 'year' or period.month == 12:
+        return date(period.year + 1, 1, 1) if period.year < date.max.year else None
+    return date(period.year, period.month + 1, 1)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin for tables with millions of rows: approximate counts, no
+    unfiltered total, and an index-backed date_hierarchy (which must be a
+    DateField with an index leading on it) that also orders the rows it
+    narrows down to.
+    """
+    paginator = ApproximatePaginator
+    show_full_result_count = False
+
+    def get_ordering(self, request):
+        # Rows picked by a date range are listed in that date's order, read off its index
+        if self.date_hierarchy and any(key.startswith(f'{self.date_hierarchy}__') for key in request.GET):
+            return [f'-{self.date_hierarchy}', '-pk']
+        return super().get_ordering(request)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not self.date_hierarchy:
+            return queryset
+        indexed = _indexed_dates_class(type(queryset))
+        return indexed(model=queryset.model, query=queryset.query.chain(), using=queryset._db)
+
+
+@lru_cache(maxsize=None)
+def _indexed_dates_class(queryset_class):
+    return type(f'Indexed{queryset_class.__name__}', (IndexedDatesQuerySet, queryset_class), {})
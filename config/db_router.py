@@ -0,0 +1,150 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+settings.DATABASE_REPLICA_URLS adds replica databases (replica1, replica2,
+...) next to the primary ('default'). ReplicaRouter sends every write to
+the primary and routes reads:
+
+- to the primary outside web requests (management commands and workers
+  read what they are about to write);
+- to the primary for PRIMARY_MODELS: a session missing from a lagging
+  replica would log its user out;
+- to the primary inside a transaction on the primary, and for the rest of a
+  request once it has written, so a request reads its own writes;
+- to the primary for a client that wrote within the last
+  REPLICA_STICKY_SECONDS (the ``primary_until`` cookie set by
+  ReplicaRoutingMiddleware), so a guest who has just booked or cancelled
+  does not see a replica that has not caught up yet;
+- otherwise to one replica, chosen per request so that all of a page's
+  queries read the same replica.
+
+Every decision is counted per database and reason in
+config.metrics.registry (see /metrics/).
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .metrics import registry
+
+logger = logging.getLogger('config.db_router')
+
+PIN_COOKIE = 'primary_until'
+# Models always read from the primary
+PRIMARY_MODELS = {'sessions.session'}
+
+
+@dataclass
+class Routing:
+    """Routing state of the request being handled."""
+    replica: str
+    pinned: bool = False
+    wrote: bool = False
+
+
+# Routing state of the current request (None outside a request). Mutated in
+# place, so writes made in a sync_to_async thread pin the rest of the request.
+current_routing = ContextVar('current_routing', default=None)
+
+
+class ReplicaRouter:
+    """Writes to the primary; reads to a replica unless the request needs its own writes."""
+
+    def db_for_read(self, model, **hints):
+        alias, reason = self.route_read(model)
+        registry.count_route(alias, reason)
+        return alias
+
+    def route_read(self, model):
+        """(database alias, reason) for a read of ``model`` in the current context."""
+        routing = current_routing.get()
+        if routing is None:
+            return DEFAULT_DB_ALIAS, 'no_request'
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS, 'primary_model'
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS, 'transaction'
+        if routing.wrote:
+            return DEFAULT_DB_ALIAS, 'wrote'
+        if routing.pinned:
+            return DEFAULT_DB_ALIAS, 'sticky'
+        return routing.replica, 'replica'
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.wrote = True
+        registry.count_route(DEFAULT_DB_ALIAS, 'write')
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication
+        return db == DEFAULT_DB_ALIAS
+
+
+def pinned_until(request):
+    """The time (epoch seconds) until which the client reads from the primary, from its cookie."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0))
+    except ValueError:
+        return 0.0
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Set up the routing state of each request, and pin a client that wrote to
+    the primary for REPLICA_STICKY_SECONDS. Runs natively in sync and async
+    mode, like config.middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        replicas = settings.REPLICA_DATABASES
+        routing = Routing(
+            replica=random.choice(replicas) if replicas else DEFAULT_DB_ALIAS,
+            pinned=pinned_until(request) > time.time(),
+        )
+        return routing, current_routing.set(routing)
+
+    def finish(self, request, response, routing):
+        if routing.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                PIN_COOKIE,
+                f'{time.time() + settings.REPLICA_STICKY_SECONDS:.0f}',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+            logger.debug('%s wrote: reads pinned to the primary for %ss', request.path, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(request, response, routing)
+
+    async def __acall__(self, request):
+        routing, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        return self.finish(request, response, routing)
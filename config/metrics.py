@@ -0,0 +1,165 @@
+"""
+In-process performance metrics, aggregated per view (URL name).
+
+Each view keeps a rolling window of recent samples for latency, SQL count,
+SQL time and template render time, plus lifetime count/sum totals. Metrics are
+per process: with several gunicorn workers each one reports its own numbers.
+"""
+import math
+import threading
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+WINDOW_SIZE = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Stats of the request currently being handled (None outside a request).
+current_request = ContextVar('current_request_stats', default=None)
+
+
+@dataclass
+class RequestStats:
+    """Numbers collected while one request is being handled."""
+    sql_queries: int = 0
+    sql_ms: float = 0.0
+    template_ms: float = 0.0
+
+
+class RollingSummary:
+    """Quantiles over the last ``window`` samples plus lifetime count and sum."""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+
+METRICS = {
+    'latency_ms': 'Total request latency in milliseconds',
+    'sql_queries': 'SQL queries per request',
+    'sql_ms': 'Time spent in SQL per request in milliseconds',
+    'template_ms': 'Template render time per request in milliseconds',
+}
+
+
+class MetricsRegistry:
+    """Thread-safe map of view name -> metric name -> RollingSummary."""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.window = window
+        self.lock = threading.Lock()
+        self.views = {}
+        self.cache = {}
+        self.routes = {}
+
+    def record(self, view_name, latency_ms, stats):
+        values = {
+            'latency_ms': latency_ms,
+            'sql_queries': stats.sql_queries,
+            'sql_ms': stats.sql_ms,
+            'template_ms': stats.template_ms,
+        }
+        with self.lock:
+            summaries = self.views.setdefault(
+                view_name, {name: RollingSummary(self.window) for name in METRICS}
+            )
+            for name, value in values.items():
+                summaries[name].add(value)
+
+    def count_cache(self, namespace, hit):
+        """Count a cache lookup in ``namespace`` as a hit or a miss."""
+        with self.lock:
+            counts = self.cache.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def count_route(self, alias, reason):
+        """Count a database routing decision (see config.db_router)."""
+        with self.lock:
+            self.routes[alias, reason] = self.routes.get((alias, reason), 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.cache.clear()
+            self.routes.clear()
+
+    def cache_snapshot(self):
+        """Hit/miss counts and hit ratio per cache namespace."""
+        with self.lock:
+            return {
+                namespace: {
+                    **counts,
+                    'hit_ratio': round(counts['hits'] / ((counts['hits'] + counts['misses']) or 1), 3),
+                }
+                for namespace, counts in sorted(self.cache.items())
+            }
+
+    def routes_snapshot(self):
+        """Routing decisions per database alias and reason."""
+        with self.lock:
+            snapshot = {}
+            for (alias, reason), count in sorted(self.routes.items()):
+                snapshot.setdefault(alias, {})[reason] = count
+            return snapshot
+
+    def snapshot(self):
+        """Plain-dict copy of all metrics, suitable for JSON."""
+        with self.lock:
+            return {
+                view_name: {
+                    name: {
+                        'count': summary.count,
+                        'sum': round(summary.sum, 3),
+                        **{f'p{int(q * 100)}': round(summary.quantile(q), 3) for q in QUANTILES},
+                    }
+                    for name, summary in summaries.items()
+                }
+                for view_name, summaries in sorted(self.views.items())
+            }
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format (summaries)."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, help_text in METRICS.items():
+            metric = f'hotel_view_{name}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} summary')
+            for view_name, metrics in snapshot.items():
+                values = metrics[name]
+                label = view_name.replace('\\', '\\\\').replace('"', '\\"')
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{view="{label}",quantile="{q}"}} {values[f"p{int(q * 100)}"]}')
+                lines.append(f'{metric}_sum{{view="{label}"}} {values["sum"]}')
+                lines.append(f'{metric}_count{{view="{label}"}} {values["count"]}')
+        cache = self.cache_snapshot()
+        for outcome in ('hits', 'misses'):
+            metric = f'hotel_cache_{outcome}_total'
+            lines.append(f'# HELP {metric} Cache lookups that were {outcome}')
+            lines.append(f'# TYPE {metric} counter')
+            for namespace, counts in cache.items():
+                lines.append(f'{metric}{{namespace="{namespace}"}} {counts[outcome]}')
+        routes = self.routes_snapshot()
+        if routes:
+            lines.append('# HELP hotel_db_route_total Database routing decisions by database and reason')
+            lines.append('# TYPE hotel_db_route_total counter')
+            for alias, reasons in routes.items():
+                for reason, count in reasons.items():
+                    lines.append(f'hotel_db_route_total{{database="{alias}",reason="{reason}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,150 @@
+"""
+Per-request performance instrumentation, and static file serving.
+
+PerformanceMiddleware records total latency, SQL query count and time, and
+template render time for every request, aggregates them per URL name in
+config.metrics.registry, and logs a warning when a view goes over its budget
+(settings.QUERY_BUDGETS / settings.LATENCY_BUDGETS_MS).
+
+Both middlewares run natively in sync and async mode, so under ASGI an async
+view is not pushed onto a thread by the middleware around it.
+"""
+import logging
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+from whitenoise.middleware import WhiteNoiseMiddleware
+from .metrics import RequestStats, current_request, registry
+
+logger = logging.getLogger('config.performance')
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+
+def _time_sql(execute, sql, params, many, context):
+    """Database execute wrapper that charges query time to the current request."""
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_queries += 1
+        stats.sql_ms += (time.perf_counter() - start) * 1000
+
+
+def _add_sql_timer(connection, **kwargs):
+    if _time_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_sql)
+
+
+def _timed_render(render):
+    def render_and_time(self, context=None, request=None):
+        stats = current_request.get()
+        if stats is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.template_ms += (time.perf_counter() - start) * 1000
+    render_and_time.timed = True
+    return render_and_time
+
+
+def install_hooks():
+    """Attach the SQL and template timers once per process."""
+    connection_created.connect(_add_sql_timer, dispatch_uid='config.performance.sql_timer')
+    for connection in connections.all(initialized_only=True):
+        _add_sql_timer(connection)
+    if not getattr(DjangoTemplate.render, 'timed', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+class PerformanceMiddleware:
+    """Measure each request and feed the per-view metrics registry."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_hooks()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            current_request.reset(token)
+        self.finish(request, latency_ms, stats)
+        return response
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context into its thread, so SQL and template
+        # time spent there is still charged to this request's stats.
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            current_request.reset(token)
+        self.finish(request, latency_ms, stats)
+        return response
+
+    def finish(self, request, latency_ms, stats):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else UNRESOLVED_VIEW
+        registry.record(view_name, latency_ms, stats)
+        self.check_budgets(view_name, latency_ms, stats)
+
+    def check_budgets(self, view_name, latency_ms, stats):
+        query_budget = settings.QUERY_BUDGETS.get(view_name)
+        latency_budget = settings.LATENCY_BUDGETS_MS.get(view_name, settings.DEFAULT_LATENCY_BUDGET_MS)
+        if query_budget is not None and stats.sql_queries > query_budget:
+            logger.warning(
+                '%s ran %d SQL queries (budget %d, %.1f ms in SQL)',
+                view_name, stats.sql_queries, query_budget, stats.sql_ms,
+            )
+        if latency_budget is not None and latency_ms > latency_budget:
+            logger.warning(
+                '%s took %.1f ms (budget %d ms; SQL %.1f ms, templates %.1f ms)',
+                view_name, latency_ms, latency_budget, stats.sql_ms, stats.template_ms,
+            )
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, usable without a thread hop when the handler chain is async."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
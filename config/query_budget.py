@@ -0,0 +1,28 @@
+"""
+Query-count budgets: a context manager that fails when a block of code runs
+more SQL queries than allowed. Used by `manage.py check_query_budgets` and
+usable from any test.
+"""
+from contextlib import contextmanager
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A block ran more queries than its budget."""
+
+
+@contextmanager
+def assert_max_queries(limit, using='default', label=''):
+    """
+    Run the enclosed block and raise QueryBudgetExceeded if it issued more
+    than ``limit`` queries on the ``using`` connection. Yields the capture
+    context so callers can inspect ``len(ctx)`` / ``ctx.captured_queries``.
+    """
+    with CaptureQueriesContext(connections[using]) as ctx:
+        yield ctx
+    if len(ctx) > limit:
+        queries = '\n'.join(f'  {i}. {q["sql"]}' for i, q in enumerate(ctx.captured_queries, 1))
+        raise QueryBudgetExceeded(
+            f'{label or "Block"} ran {len(ctx)} queries, budget is {limit}:\n{queries}'
+        )
@@ -47,7 +47,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'config.middleware.StaticFilesMiddleware',
+    'config.middleware.PerformanceMiddleware',
+    'config.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,6 +77,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Route the read-heavy pages to their async views (rooms/async_views.py,
+# bookings/async_views.py). config/asgi.py turns this on unless it is set.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False').lower() == 'true'
 
 # Database
 import dj_database_url
@@ -85,6 +92,75 @@ DATABASES = {
     )
 }
 
+# Read replicas: comma-separated database URLs, added as replica1, replica2, ...
+# Web requests read from one of them unless they need the primary (see config.db_router).
+# Under the test runner they mirror the test primary (replicas get no schema of
+# their own), so tests check routing by its decisions (config/tests.py).
+REPLICA_DATABASES = []
+for number, url in enumerate(
+    (url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()), 1
+):
+    DATABASES[f'replica{number}'] = {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(f'replica{number}')
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter'] if REPLICA_DATABASES else []
+# Seconds a client that wrote (booked, cancelled, ...) keeps reading from the
+# primary, to outlast replication lag
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '15'))
+
+# Cache: local memory by default; CACHE_URL=redis://host:6379/0 for a shared
+# cache across workers, or file:///path/to/dir for a file-based one (one host).
+# Cached listings and searches are invalidated through the cache itself, so
+# several web workers need a shared one (system check rooms.E001).
+CACHE_URL = os.environ.get('CACHE_URL', '')
+# Web worker processes; gunicorn reads the same variable
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('file://'):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_URL[len('file://'):]}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'hotel-booking'}}
+
+# Seconds to keep cached hotel/room/category listings (invalidated by signals on change)
+LISTING_CACHE_TIMEOUT = int(os.environ.get('LISTING_CACHE_TIMEOUT', str(60 * 60 * 24)))
+
+# Seconds to keep cached date-search results. Booking changes invalidate them
+# precisely in a shared CACHE_URL; this bounds how long a result can stay stale
+# when an invalidation is lost or it was read from a lagging replica.
+AVAILABILITY_CACHE_TIMEOUT = int(os.environ.get('AVAILABILITY_CACHE_TIMEOUT', '300'))
+
+# Days ahead with compiled nightly rates (rooms.pricing); run compile_rates daily
+PRICING_HORIZON_DAYS = int(os.environ.get('PRICING_HORIZON_DAYS', '400'))
+
+# Holidays (YYYY-MM-DD, comma-separated) whose stays `warm_cache` precomputes
+# along with the coming weekends and peak seasons
+WARMUP_HOLIDAYS = [day for day in os.environ.get('WARMUP_HOLIDAYS', '').split(',') if day.strip()]
+
+# Rows counted at most by large admin changelists (config.changelist); unfiltered
+# tables larger than this show the database's estimated row count instead
+ADMIN_COUNT_LIMIT = int(os.environ.get('ADMIN_COUNT_LIMIT', '10000'))
+
+# Minutes a new (pending) booking holds its room while the guest finishes
+# checkout; `expire_holds` releases holds past their deadline
+BOOKING_HOLD_MINUTES = int(os.environ.get('BOOKING_HOLD_MINUTES', '15'))
+
+# Booking emails: written to an outbox with each booking change and sent by
+# `send_notifications` (see bookings.outbox). The console backend prints them.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False').lower() == 'true'
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '10'))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'bookings@localhost')
+# Absolute base URL for links in emails
+SITE_URL = os.environ.get('SITE_URL', 'http://localhost:8000').rstrip('/')
+# Days before check-in that the stay reminder is sent
+BOOKING_REMINDER_DAYS = int(os.environ.get('BOOKING_REMINDER_DAYS', '2'))
+# Sending attempts per notification before it is marked failed (retries back off exponentially)
+NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', '8'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -112,9 +188,44 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Background threads generating resized/WebP image variants (rooms.images)
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Maximum SQL queries per view (URL name); checked by `manage.py check_query_budgets`
+# and logged as a warning by config.middleware.PerformanceMiddleware when exceeded.
+# Views that price stays include two pricing queries (active rules, nightly rates);
+# views that filter or show amenities load the amenity catalogue once; text
+# searches add one full-text index lookup. The booking history reads the
+# session, the user, their summary and one page, and on a user's first visit
+# of a day recounts their upcoming stays (two more).
+QUERY_BUDGETS = {
+    'rooms:home': 2,
+    'rooms:hotel_list': 2,
+    'rooms:hotel_detail': 3,
+    'rooms:room_list': 8,
+    'rooms:room_detail': 3,
+    'rooms:room_list_api': 6,
+    'rooms:group_search': 5,
+    'rooms:room_calendar': 5,
+    'rooms:hotel_calendar': 6,
+    'rooms:room_quote': 4,
+    'bookings:history': 6,
+}
+
+# Latency budgets per view in milliseconds (None disables the warning)
+DEFAULT_LATENCY_BUDGET_MS = int(os.environ.get('DEFAULT_LATENCY_BUDGET_MS', '500'))
+LATENCY_BUDGETS_MS = {
+    'rooms:room_list': 300,
+    'rooms:room_list_api': 300,
+    'bookings:create': 800,
+}
+
+# Bearer token for scraping /metrics/ without a staff session (empty = staff only)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Login redirect URLs
 LOGIN_REDIRECT_URL = 'rooms:room_list'
 LOGOUT_REDIRECT_URL = 'rooms:home'
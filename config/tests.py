@@ -0,0 +1,83 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import time
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from bookings.models import Booking
+from config.db_router import PIN_COOKIE, ReplicaRouter, Routing, current_routing
+from config.metrics import registry
+from rooms.models import Hotel, Room, RoomCategory
+
+ROUTER = 'config.db_router.ReplicaRouter'
+# Templates render without a collectstatic manifest
+STATIC_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+class RouteReadTests(TransactionTestCase):
+    """Each read goes to the primary or the request's replica for the documented reason."""
+
+    def read(self, model=Booking, **state):
+        token = current_routing.set(Routing(replica='replica1', **state))
+        try:
+            return ReplicaRouter().route_read(model)
+        finally:
+            current_routing.reset(token)
+
+    def test_outside_a_request(self):
+        self.assertEqual(ReplicaRouter().route_read(Booking), (DEFAULT_DB_ALIAS, 'no_request'))
+
+    def test_primary_model(self):
+        self.assertEqual(self.read(Session), (DEFAULT_DB_ALIAS, 'primary_model'))
+
+    def test_transaction(self):
+        with transaction.atomic():
+            self.assertEqual(self.read(), (DEFAULT_DB_ALIAS, 'transaction'))
+
+    def test_wrote(self):
+        self.assertEqual(self.read(wrote=True), (DEFAULT_DB_ALIAS, 'wrote'))
+
+    def test_sticky(self):
+        self.assertEqual(self.read(pinned=True), (DEFAULT_DB_ALIAS, 'sticky'))
+
+    def test_replica(self):
+        self.assertEqual(self.read(), ('replica1', 'replica'))
+
+
+# The test database has no replica: the primary stands in for it, and the
+# routing counters tell reads sent to the replica from pinned ones.
+@override_settings(
+    REPLICA_DATABASES=[DEFAULT_DB_ALIAS], DATABASE_ROUTERS=[ROUTER], STATICFILES_STORAGE=STATIC_STORAGE,
+)
+class StickyRoutingTests(TransactionTestCase):
+    """A client that booked reads from the primary on its next requests."""
+
+    def setUp(self):
+        category = RoomCategory.objects.create(name='Double Room', slug='double-room')
+        hotel = Hotel.objects.create(name='Test Hotel', address='1 Test Street')
+        self.room = Room.objects.create(
+            hotel=hotel, category=category, name='Room 101', description='A room', price_per_night=Decimal('100.00'),
+        )
+
+    def reasons(self, url):
+        """{reason: count} of the reads made by a GET of ``url``."""
+        cache.clear()
+        registry.reset()
+        self.assertEqual(self.client.get(url).status_code, 200)
+        return {reason: count for (_, reason), count in registry.routes.items() if reason != 'write'}
+
+    def test_booking_pins_reads_to_the_primary(self):
+        room_url = reverse('rooms:room_detail', args=[self.room.pk])
+        self.assertIn('replica', self.reasons(room_url))
+        check_in = date.today() + timedelta(days=10)
+        response = self.client.post(reverse('bookings:create', args=[self.room.pk]), {
+            'check_in': check_in, 'check_out': check_in + timedelta(days=2), 'num_guests': 1,
+            'guest_name': 'Guest', 'guest_email': 'guest@example.com',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(float(response.cookies[PIN_COOKIE].value), time.time())
+        reasons = self.reasons(room_url)
+        self.assertNotIn('replica', reasons)
+        self.assertIn('sticky', reasons)
@@ -5,9 +5,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from . import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', views.metrics, name='metrics'),
     path('', include('rooms.urls')),
     path('accounts/', include('accounts.urls')),
     path('bookings/', include('bookings.urls')),
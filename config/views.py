@@ -0,0 +1,39 @@
+"""
+Project-level views: performance metrics endpoint.
+"""
+import hmac
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.cache import never_cache
+from bookings import holds
+from .metrics import registry
+
+
+def _has_metrics_access(request):
+    """Staff users, or scrapers presenting settings.METRICS_TOKEN as a bearer token."""
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+@never_cache
+def metrics(request):
+    """
+    Per-view latency, SQL and template metrics, cache hit rates and database
+    routing decisions for this process, and booking hold outcomes and sweeps (see bookings.holds).
+    Prometheus text format by default, JSON with ?format=json.
+    """
+    if not _has_metrics_access(request):
+        return HttpResponseForbidden('Staff only.')
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'views': registry.snapshot(),
+            'cache': registry.cache_snapshot(),
+            'routes': registry.routes_snapshot(),
+            'holds': holds.metrics(),
+        })
+    return HttpResponse(
+        registry.prometheus() + holds.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings for both production profiles.
+
+SERVER_MODE=wsgi (default): sync workers running config.wsgi.
+SERVER_MODE=asgi: uvicorn workers running config.asgi, which serves the async
+versions of the read-heavy views; a slow database round-trip then no longer
+holds a whole worker. Compare the two with `manage.py benchmark_views`.
+Worker count comes from WEB_CONCURRENCY (gunicorn's own default).
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+if os.environ.get('SERVER_MODE', 'wsgi').lower() == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
@@ -1,8 +1,36 @@
 """
 Admin configuration for rooms app.
 """
+from django import forms
 from django.contrib import admin
-from .models import RoomCategory, Hotel, Room, RoomImage
+from config.changelist import LargeTableAdmin
+from .models import Amenity, RoomCategory, Hotel, Room, RoomImage, PricingRule
+from . import amenities
+
+
+class RoomAdminForm(forms.ModelForm):
+    """Room form that edits amenity_mask as a set of amenity checkboxes."""
+    amenity_set = forms.ModelMultipleChoiceField(
+        queryset=Amenity.objects.all(),
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        label='Amenities',
+    )
+
+    class Meta:
+        model = Room
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        mask = self.instance.amenity_mask
+        self.initial['amenity_set'] = [
+            amenity.pk for amenity in amenities.catalogue() if mask >> amenity.bit & 1
+        ]
+
+    def save(self, commit=True):
+        self.instance.amenity_mask = amenities.mask_of(self.cleaned_data['amenity_set'])
+        return super().save(commit)
 
 
 class RoomImageInline(admin.TabularInline):
@@ -16,6 +44,13 @@ class RoomCategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
 
 
+@admin.register(Amenity)
+class AmenityAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'bit']
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ['bit']
+
+
 @admin.register(Hotel)
 class HotelAdmin(admin.ModelAdmin):
     list_display = ['name', 'address', 'is_active', 'created_at']
@@ -24,8 +59,20 @@ class HotelAdmin(admin.ModelAdmin):
 
 
 @admin.register(Room)
-class RoomAdmin(admin.ModelAdmin):
+class RoomAdmin(LargeTableAdmin):
+    form = RoomAdminForm
     list_display = ['name', 'hotel', 'category', 'price_per_night', 'max_guests', 'is_available']
+    list_select_related = ['hotel', 'category']
+    raw_id_fields = ['hotel']
     list_filter = ['category', 'hotel', 'is_available']
     search_fields = ['name', 'description']
     inlines = [RoomImageInline]
+
+
+@admin.register(PricingRule)
+class PricingRuleAdmin(admin.ModelAdmin):
+    list_display = ['name', 'kind', 'adjustment', 'hotel', 'category', 'start_date', 'end_date', 'is_active']
+    list_filter = ['kind', 'is_active', 'category']
+    list_select_related = ['hotel', 'category']
+    search_fields = ['name']
+    raw_id_fields = ['hotel']
@@ -0,0 +1,123 @@
+"""
+Group allocation: the cheapest set of rooms in one hotel that sleeps a party.
+
+The search is a min-cost covering knapsack over the hotel's available rooms.
+Rooms are first pruned per capacity: with ``guests`` people, no optimal set
+holds more than ceil(guests / c) rooms of capacity c, and those are always the
+cheapest ones. That leaves at most guests * H(guests) candidates however many
+rooms the hotel has, and a DP over "guests covered so far" (capped at
+``guests``) picks the set in O(candidates * guests).
+"""
+from collections import defaultdict
+from django.conf import settings
+from bookings import inventory
+from .models import Room
+from .search import available_rooms
+from . import cache as listing_cache
+from . import pricing
+
+MAX_GROUP_GUESTS = 60
+MAX_OFFERS = 10
+
+
+def prune(rooms, guests):
+    """The rooms that can appear in a cheapest cover; ``rooms`` are (key, capacity, cost) triples."""
+    by_capacity = defaultdict(list)
+    for room in rooms:
+        if room[1] > 0:
+            by_capacity[room[1]].append(room)
+    candidates = []
+    for capacity, group in by_capacity.items():
+        group.sort(key=lambda room: room[2])
+        candidates.extend(group[:-(-guests // capacity)])
+    return candidates
+
+
+def cheapest_cover(rooms, guests):
+    """
+    (total_cost, [keys]) of the cheapest rooms whose capacities add up to at
+    least ``guests``, preferring fewer rooms on equal cost; None if no set does.
+    ``rooms`` are (key, capacity, cost) triples.
+    """
+    candidates = prune(rooms, guests)
+    # best[j]: (cost, room count) of the cheapest set covering at least j guests
+    best = [(0, 0)] + [None] * guests
+    taken = []
+    for _, capacity, cost in candidates:
+        row = [False] * (guests + 1)
+        for covered in range(guests, 0, -1):
+            previous = best[max(covered - capacity, 0)]
+            if previous is None:
+                continue
+            option = (previous[0] + cost, previous[1] + 1)
+            if best[covered] is None or option < best[covered]:
+                best[covered] = option
+                row[covered] = True
+        taken.append(row)
+    if best[guests] is None:
+        return None
+    keys = []
+    covered = guests
+    for index in range(len(candidates) - 1, -1, -1):
+        if covered > 0 and taken[index][covered]:
+            key, capacity, _ = candidates[index]
+            keys.append(key)
+            covered = max(covered - capacity, 0)
+    return best[guests][0], keys[::-1]
+
+
+def group_offers(check_in, check_out, guests, category_slug=None, limit=MAX_OFFERS):
+    """
+    The cheapest room set per hotel for a party of ``guests``, cheapest hotels
+    first, as [(hotel_id, total_price, [room_ids])]. Cached per search under
+    availability_version(), like date searches, and pricing.version().
+    """
+    categories = listing_cache.categories()
+    if category_slug:
+        categories = [category for category in categories if category.slug == category_slug]
+        if not categories:
+            return []
+    version = inventory.availability_version(check_in, check_out, [category.pk for category in categories])
+
+    def compute():
+        rooms = list(available_rooms(check_in, check_out, category_slug).select_related(None).prefetch_related(
+            None
+        ).only('id', 'hotel_id', 'category_id', 'max_guests', 'price_per_night'))
+        rates = pricing.RateTable(rooms, check_in, check_out)
+        by_hotel = defaultdict(list)
+        for room in rooms:
+            by_hotel[room.hotel_id].append((room.pk, room.max_guests, rates.stay_price(room, check_in, check_out)))
+        offers = []
+        for hotel_id, hotel_rooms in by_hotel.items():
+            cover = cheapest_cover(hotel_rooms, guests)
+            if cover:
+                offers.append((hotel_id, *cover))
+        offers.sort(key=lambda offer: (offer[1], len(offer[2]), offer[0]))
+        return offers[:limit]
+
+    return listing_cache.get_or_set(
+        'group-offers',
+        (check_in.isoformat(), check_out.isoformat(), guests, category_slug or '*', limit, version,
+         pricing.version()),
+        compute,
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+    )
+
+
+def load_offers(offers):
+    """Attach rooms (with hotel and category) to cached offers: [{hotel, rooms, total_price, capacity}]."""
+    room_ids = [room_id for _, _, ids in offers for room_id in ids]
+    rooms = Room.objects.select_related('hotel', 'category').in_bulk(room_ids)
+    loaded = []
+    for hotel_id, total_price, ids in offers:
+        offer_rooms = [rooms[room_id] for room_id in ids if room_id in rooms]
+        if len(offer_rooms) != len(ids):
+            continue  # a room was deleted since the offer was cached
+        loaded.append({
+            'hotel': offer_rooms[0].hotel,
+            'rooms': offer_rooms,
+            'total_price': total_price,
+            'capacity': sum(room.max_guests for room in offer_rooms),
+            'room_ids': ','.join(str(room.pk) for room in offer_rooms),
+        })
+    return loaded
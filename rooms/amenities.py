@@ -0,0 +1,82 @@
+"""
+Structured room amenities.
+
+Amenity rows form a small catalogue in which every amenity owns one bit; a
+room stores the OR of its amenities' bits in Room.amenity_mask. "Has all of
+these amenities" is then ``amenity_mask & wanted = wanted``, a test the
+database evaluates on the listing index (where amenity_mask is a trailing
+column) for any number of amenities, with no join or text matching.
+"""
+from django.db.models import F
+from django.utils.text import slugify
+from .models import Amenity
+from . import cache as listing_cache
+
+
+def catalogue():
+    """Every amenity, by name, cached until one changes."""
+    return listing_cache.amenities()
+
+
+def mask_of(amenities):
+    """Mask with the bits of some Amenity instances set."""
+    mask = 0
+    for amenity in amenities:
+        mask |= 1 << amenity.bit
+    return mask
+
+
+def names(mask):
+    """Names of the amenities in a mask, in catalogue order."""
+    if not mask:
+        return []
+    return [amenity.name for amenity in catalogue() if mask >> amenity.bit & 1]
+
+
+def mask_for_slugs(slugs):
+    """
+    Mask for amenity slugs (e.g. from ?amenity= query parameters) and the
+    slugs that matched, sorted; unknown slugs are ignored.
+    """
+    wanted = set(slugs)
+    if not wanted:
+        return 0, []
+    matched = [amenity for amenity in catalogue() if amenity.slug in wanted]
+    return mask_of(matched), sorted(amenity.slug for amenity in matched)
+
+
+def parse(text):
+    """Amenity names from comma-separated text, stripped and de-duplicated (case-insensitively)."""
+    seen = set()
+    result = []
+    for name in text.split(','):
+        name = name.strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            result.append(name)
+    return result
+
+
+def mask_for_names(names, create=False):
+    """
+    Mask for amenity names, matched case-insensitively. With create=True,
+    names missing from the catalogue are added; otherwise they raise KeyError.
+    """
+    known = {amenity.name.lower(): amenity for amenity in catalogue()}
+    amenities = []
+    for name in names:
+        amenity = known.get(name.lower())
+        if amenity is None:
+            if not create:
+                raise KeyError(name)
+            amenity, _ = Amenity.objects.get_or_create(name=name, defaults={'slug': slugify(name)})
+            known[name.lower()] = amenity
+        amenities.append(amenity)
+    return mask_of(amenities)
+
+
+def filter_rooms(rooms, mask):
+    """Restrict a Room queryset to rooms that have every amenity in ``mask``."""
+    if not mask:
+        return rooms
+    return rooms.alias(amenity_match=F('amenity_mask').bitand(mask)).filter(amenity_match=mask)
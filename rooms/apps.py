@@ -5,3 +5,6 @@ class RoomsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rooms'
     verbose_name = 'Rooms & Hotels'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,80 @@
+"""
+Async versions of the read-heavy room views, routed when settings.ASYNC_VIEWS
+is on (the ASGI profile, see config/asgi.py).
+
+Data is loaded through the async ORM and cache API, so a slow database or
+cache round-trip suspends the request instead of holding a worker. Templates
+are still rendered synchronously (they read request.user and the session) in
+the request's own thread via config.aio.arender. Output matches rooms.views.
+"""
+from asgiref.sync import sync_to_async
+from config.aio import arender
+from .forms import RoomSearchForm
+from .search import search_rooms
+from .views import filter_links, listing_form, page_links, search_area
+from . import amenities
+from . import cache as listing_cache
+
+
+async def home(request):
+    """Landing page with search form."""
+    context = {
+        'form': RoomSearchForm(request.GET or None),
+        'categories': await listing_cache.acategories(),
+        'hotels': await listing_cache.afeatured_hotels(),
+    }
+    return await arender(request, 'rooms/home.html', context)
+
+
+async def room_list(request):
+    """Room search; the search itself runs as one sync step (cache + inventory lookups)."""
+    form = listing_form(request)
+    category_slug = request.GET.get('category')
+    query = request.GET.get('q', '').strip()
+    area, area_error = search_area(request)
+    catalogue = await listing_cache.aamenities()
+    wanted = set(request.GET.getlist('amenity'))
+    selected = [amenity for amenity in catalogue if amenity.slug in wanted]
+    amenity_mask = amenities.mask_of(selected)
+
+    check_in = None
+    check_out = None
+    if form.is_valid():
+        check_in = form.cleaned_data['check_in']
+        check_out = form.cleaned_data['check_out']
+    cursor = request.GET.get('cursor')
+    try:
+        rooms, next_cursor = await sync_to_async(search_rooms)(
+            check_in, check_out, category_slug, cursor, amenity_mask=amenity_mask, query=query, area=area
+        )
+    except ValueError:
+        cursor = None
+        rooms, next_cursor = await sync_to_async(search_rooms)(
+            check_in, check_out, category_slug, amenity_mask=amenity_mask, query=query, area=area
+        )
+
+    context = {
+        'rooms': rooms,
+        'form': form,
+        'categories': await listing_cache.acategories(),
+        'amenities': catalogue,
+        'selected_amenities': sorted(amenity.slug for amenity in selected),
+        'query': query,
+        'area': area,
+        'area_error': area_error,
+        'check_in': check_in,
+        'check_out': check_out,
+        **filter_links(request),
+        **page_links(request, cursor, next_cursor),
+    }
+    return await arender(request, 'rooms/room_list.html', context)
+
+
+async def room_detail(request, pk):
+    """Room detail page with images, amenities, and booking form link."""
+    room = await listing_cache.aroom(pk)
+    context = {
+        'room': room,
+        'primary_image': room.get_primary_image(),
+    }
+    return await arender(request, 'rooms/room_detail.html', context)
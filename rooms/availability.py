@@ -0,0 +1,115 @@
+"""
+Nightly availability calendars for rooms and hotels.
+
+A calendar window is computed from one range query over Booking (the blocking
+stays that overlap the window, for every room asked about) and an interval
+sweep per room, never one query per day; nightly prices come from the
+compiled rate tables (rooms.pricing). Results are cached under
+inventory.room_version() and pricing.version(), so they stay valid until a
+booking for one of the rooms, the room catalogue or the hotel's rates change.
+"""
+from datetime import timedelta
+from django.conf import settings
+from bookings import inventory
+from bookings.models import Booking
+from . import cache as listing_cache
+from . import pricing
+
+DEFAULT_DAYS = 42
+MAX_DAYS = 366
+
+
+def blocking_stays(room_ids, start, end):
+    """(room_id, check_in, check_out) of the blocking stays overlapping [start, end)."""
+    return Booking.objects.filter(
+        room_id__in=room_ids,
+        status__in=Booking.BLOCKING_STATUSES,
+        check_in__lt=end,
+        check_out__gt=start,
+    ).order_by().values_list('room_id', 'check_in', 'check_out')
+
+
+def booked_nights(room_ids, start, days):
+    """
+    {room_id: [bool] * days} marking the sold nights of [start, start + days).
+    One query fetches every overlapping stay; each room's stays are swept as
+    +1/-1 events over the window.
+    """
+    stays = blocking_stays(room_ids, start, start + timedelta(days=days))
+    events = {room_id: [0] * (days + 1) for room_id in room_ids}
+    for room_id, check_in, check_out in stays:
+        deltas = events[room_id]
+        deltas[max((check_in - start).days, 0)] += 1
+        deltas[min((check_out - start).days, days)] -= 1
+    sold = {}
+    for room_id, deltas in events.items():
+        held = 0
+        nights = []
+        for delta in deltas[:days]:
+            held += delta
+            nights.append(held > 0)
+        sold[room_id] = nights
+    return sold
+
+
+def _nights(room, start, sold, prices):
+    return [
+        {
+            'date': (start + timedelta(days=offset)).isoformat(),
+            'available': room.is_available and not taken,
+            'price': str(price),
+        }
+        for offset, (taken, price) in enumerate(zip(sold, prices))
+    ]
+
+
+def room_calendar(room, start, days=DEFAULT_DAYS):
+    """List of {date, available, price} for each night of the window."""
+    end = start + timedelta(days=days)
+    version = (inventory.room_version([room.pk]), pricing.version([room.hotel_id]))
+
+    def compute():
+        prices = pricing.RateTable([room], start, end).nightly_prices(room, start, end)
+        return _nights(room, start, booked_nights([room.pk], start, days)[room.pk], prices)
+
+    return listing_cache.get_or_set(
+        'room-calendar',
+        (room.pk, start.isoformat(), days, *version),
+        compute,
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+    )
+
+
+def hotel_calendar(hotel, rooms, start, days=DEFAULT_DAYS):
+    """
+    Per-night summary for a hotel ({date, available_rooms, min_price}) plus
+    each room's own nights, for ``rooms`` (the hotel's bookable rooms).
+    """
+    end = start + timedelta(days=days)
+    room_ids = [room.pk for room in rooms]
+    version = (inventory.room_version(room_ids), pricing.version([hotel.pk]))
+
+    def compute():
+        sold = booked_nights(room_ids, start, days)
+        rates = pricing.RateTable(rooms, start, end)
+        prices = {room.pk: rates.nightly_prices(room, start, end) for room in rooms}
+        per_room = [
+            {'id': room.pk, 'name': room.name, 'nights': _nights(room, start, sold[room.pk], prices[room.pk])}
+            for room in rooms
+        ]
+        summary = []
+        for offset in range(days):
+            free = [prices[room.pk][offset] for room in rooms if room.is_available and not sold[room.pk][offset]]
+            summary.append({
+                'date': (start + timedelta(days=offset)).isoformat(),
+                'available_rooms': len(free),
+                'min_price': str(min(free)) if free else None,
+            })
+        return {'nights': summary, 'rooms': per_room}
+
+    return listing_cache.get_or_set(
+        'hotel-calendar',
+        (hotel.pk, start.isoformat(), days, *version),
+        compute,
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+    )
@@ -0,0 +1,218 @@
+"""
+Listing cache for hotels, rooms and categories.
+
+Caches querysets (as lists of model instances) and rendered card fragments
+under per-object keys, and deletes exactly the affected keys when a Hotel,
+Room, RoomImage, RoomCategory or Amenity is saved or deleted (see rooms.signals).
+Works with any Django cache backend; hits and misses are counted in
+config.metrics.registry.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from bookings import inventory
+from config.metrics import registry
+from .models import Amenity, Hotel, Room, RoomCategory
+
+KEY_PREFIX = 'rooms'
+MISSING = object()
+
+# Every fragment name usable with {% cachedfragment %}, by the model it is keyed on.
+# Invalidation deletes all of them for the changed object, so new names go here.
+FRAGMENTS = {
+    'hotel': ('hotel-card-home', 'hotel-card-list', 'hotel-header'),
+    'room': ('room-card', 'room-card-hotel', 'room-gallery'),
+}
+
+
+def is_shared():
+    """
+    False when the default cache is local to this process: entries written
+    and invalidated here are invisible to the other web workers and to
+    management commands.
+    """
+    return 'locmem' not in settings.CACHES['default']['BACKEND'].lower()
+
+
+def local_cache_warning(what):
+    """Warning for a command whose cache invalidations the web workers cannot see."""
+    return (
+        f"The cache is local to this process: set CACHE_URL to the web workers' cache, "
+        f"or they keep serving {what} until their cached entries time out."
+    )
+
+
+def make_key(namespace, *parts):
+    return ':'.join([KEY_PREFIX, namespace, *(str(part) for part in parts)])
+
+
+def fragment_key(name, pk):
+    return make_key('fragment', name, pk)
+
+
+def fragment_model(name):
+    """Model label ('hotel' or 'room') a fragment name is keyed on, or None."""
+    for model, names in FRAGMENTS.items():
+        if name in names:
+            return model
+    return None
+
+
+def get_or_set(namespace, parts, compute, timeout=None):
+    """Return the cached value for (namespace, parts), computing and storing it on a miss."""
+    key = make_key(namespace, *parts)
+    value = cache.get(key, MISSING)
+    registry.count_cache(namespace, value is not MISSING)
+    if value is MISSING:
+        value = compute()
+        cache.set(key, value, settings.LISTING_CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+async def aget_or_set(namespace, parts, compute, timeout=None):
+    """Async get_or_set; ``compute`` is a coroutine function."""
+    key = make_key(namespace, *parts)
+    value = await cache.aget(key, MISSING)
+    registry.count_cache(namespace, value is not MISSING)
+    if value is MISSING:
+        value = await compute()
+        await cache.aset(key, value, settings.LISTING_CACHE_TIMEOUT if timeout is None else timeout)
+    return value
+
+
+def get_fragment(name, pk):
+    value = cache.get(fragment_key(name, pk))
+    registry.count_cache(f'fragment:{name}', value is not None)
+    return value
+
+
+def set_fragment(name, pk, content):
+    cache.set(fragment_key(name, pk), content, settings.LISTING_CACHE_TIMEOUT)
+
+
+# Cached querysets
+
+def categories():
+    return get_or_set('categories', (), lambda: list(RoomCategory.objects.all()))
+
+
+def amenities():
+    return get_or_set('amenities', (), lambda: list(Amenity.objects.all()))
+
+
+def featured_hotels():
+    return get_or_set('featured-hotels', (), lambda: list(Hotel.objects.filter(is_active=True)[:6]))
+
+
+def hotel(pk):
+    """Hotel by pk, or Http404 (misses for unknown ids are not cached)."""
+    found = get_or_set('hotel', (pk,), lambda: Hotel.objects.filter(pk=pk).first())
+    if found is None:
+        cache.delete(make_key('hotel', pk))
+        raise Http404('No hotel found matching the query')
+    return found
+
+
+def hotel_rooms(hotel_id):
+    """Available rooms of a hotel with categories and images loaded."""
+    return get_or_set('hotel-rooms', (hotel_id,), lambda: list(
+        Room.objects.filter(hotel_id=hotel_id, is_available=True).select_related(
+            'category'
+        ).prefetch_related('images')
+    ))
+
+
+def room(pk):
+    """Room by pk with hotel, category and images loaded, or Http404."""
+    found = get_or_set('room', (pk,), lambda: Room.objects.select_related(
+        'hotel', 'category'
+    ).prefetch_related('images').filter(pk=pk).first())
+    if found is None:
+        cache.delete(make_key('room', pk))
+        raise Http404('No room found matching the query')
+    return found
+
+
+# Async variants for rooms.async_views (same keys, so both share one cache)
+
+async def acategories():
+    return await aget_or_set('categories', (), lambda: _alist(RoomCategory.objects.all()))
+
+
+async def aamenities():
+    return await aget_or_set('amenities', (), lambda: _alist(Amenity.objects.all()))
+
+
+async def afeatured_hotels():
+    return await aget_or_set('featured-hotels', (), lambda: _alist(Hotel.objects.filter(is_active=True)[:6]))
+
+
+async def aroom(pk):
+    found = await aget_or_set('room', (pk,), lambda: Room.objects.select_related(
+        'hotel', 'category'
+    ).prefetch_related('images').filter(pk=pk).afirst())
+    if found is None:
+        await cache.adelete(make_key('room', pk))
+        raise Http404('No room found matching the query')
+    return found
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+# Invalidation
+
+def _delete(keys):
+    keys = list(keys)
+    if keys:
+        # Delete after commit so a concurrent request cannot re-cache pre-commit rows.
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def room_keys(room_ids):
+    for room_id in room_ids:
+        yield make_key('room', room_id)
+        for name in FRAGMENTS['room']:
+            yield fragment_key(name, room_id)
+
+
+def hotel_keys(hotel_ids):
+    for hotel_id in hotel_ids:
+        yield make_key('hotel', hotel_id)
+        yield make_key('hotel-rooms', hotel_id)
+        for name in FRAGMENTS['hotel']:
+            yield fragment_key(name, hotel_id)
+
+
+def invalidate_category(category):
+    inventory.bump_rooms()
+    rooms = Room.objects.filter(category=category).values_list('id', 'hotel_id')
+    room_ids = [room_id for room_id, _ in rooms]
+    hotel_ids = {hotel_id for _, hotel_id in rooms}
+    _delete([
+        make_key('categories'),
+        *room_keys(room_ids),
+        *(make_key('hotel-rooms', hotel_id) for hotel_id in hotel_ids),
+    ])
+
+
+def invalidate_amenities(rooms=()):
+    """Drop the catalogue, plus the cached rooms whose masks changed, given as (id, hotel_id)."""
+    inventory.bump_rooms()
+    _delete([
+        make_key('amenities'),
+        *room_keys([room_id for room_id, _ in rooms]),
+        *(make_key('hotel-rooms', hotel_id) for hotel_id in {hotel_id for _, hotel_id in rooms}),
+    ])
+
+
+def invalidate_hotel(hotel):
+    room_ids = Room.objects.filter(hotel=hotel).values_list('id', flat=True)
+    _delete([make_key('featured-hotels'), *hotel_keys([hotel.pk]), *room_keys(room_ids)])
+
+
+def invalidate_room(room_id, hotel_ids):
+    inventory.bump_rooms()
+    _delete([*room_keys([room_id]), *(make_key('hotel-rooms', hotel_id) for hotel_id in hotel_ids)])
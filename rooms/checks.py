@@ -0,0 +1,38 @@
+"""
+System checks for the rooms app.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.db import connection
+from . import cache as listing_cache
+from . import fulltext
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Cached listings, searches and prices are invalidated by replacing version
+    tokens in the cache (see bookings.inventory). A per-process cache keeps
+    every other worker on its stale entries until they time out.
+    """
+    if settings.WEB_CONCURRENCY > 1 and not listing_cache.is_shared():
+        return [Error(
+            f'WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}, but the default cache is local to each worker, '
+            f'so bookings and edits in one worker never invalidate the others.',
+            hint='Set CACHE_URL to a cache shared by all workers (redis://host:6379/0).',
+            id='rooms.E001',
+        )]
+    return []
+
+
+@register(Tags.compatibility)
+def fulltext_index_check(app_configs, **kwargs):
+    """Text search is ranked with the FTS5 or tsvector index of SQLite or PostgreSQL only."""
+    if not fulltext.is_indexed():
+        return [Warning(
+            f'The {connection.vendor} database has no full-text index: text searches are unranked '
+            f'substring filters, slow on large tables.',
+            hint='Use SQLite or PostgreSQL for ranked, indexed text search (see rooms.fulltext).',
+            id='rooms.W001',
+        )]
+    return []
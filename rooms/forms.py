@@ -4,6 +4,7 @@ Forms for room search and display.
 from django import forms
 from django.core.exceptions import ValidationError
 from datetime import date
+from .allocation import MAX_GROUP_GUESTS
 
 
 class RoomSearchForm(forms.Form):
@@ -27,3 +28,13 @@ class RoomSearchForm(forms.Form):
             if check_out <= check_in:
                 raise ValidationError({'check_out': 'Check-out must be after check-in.'})
         return cleaned
+
+
+class GroupSearchForm(RoomSearchForm):
+    """Group search: dates plus the size of the party."""
+    guests = forms.IntegerField(
+        min_value=1,
+        max_value=MAX_GROUP_GUESTS,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+        label='Guests'
+    )
@@ -0,0 +1,256 @@
+"""
+Ranked full-text search over hotels and rooms.
+
+Every hotel and room has a search document in an index table created by
+migration rooms.0006: an FTS5 virtual table (ranked with bm25) on SQLite, or
+a tsvector column with a GIN index (ranked with ts_rank_cd) on PostgreSQL.
+A room's document holds its name, amenities and description plus its hotel's
+name, address and description, so "beachfront suite with spa" finds suites
+in beachfront hotels with a spa. Documents are rewritten by the signal
+handlers when a hotel, room or amenity changes (rooms.signals), and
+``rebuild_search_index`` recreates them all.
+
+A search returns ranked ids, at most MAX_MATCHES, which callers narrow with
+their other filters (availability, category, amenities) by primary key.
+Every index write replaces SEARCH_VERSION_KEY, which cached results embed.
+Other databases have no index (the migration skips them): writes are
+skipped and searches fall back to unranked icontains filters on the tables
+themselves (system check rooms.W001).
+"""
+import hashlib
+import re
+from functools import reduce
+from operator import or_
+from django.db import connection
+from django.db.models import Q
+from bookings import inventory
+from .models import Amenity, Hotel, Room
+
+ROOM_TABLE = 'rooms_room_search'
+HOTEL_TABLE = 'rooms_hotel_search'
+MAX_MATCHES = 1000
+BATCH_SIZE = 500
+SEARCH_VERSION_KEY = 'search:index'
+
+# Document columns, each with its bm25 weight (SQLite) and tsvector weight (PostgreSQL)
+ROOM_COLUMNS = (
+    ('name', 10.0, 'A'),
+    ('amenities', 4.0, 'B'),
+    ('description', 1.0, 'C'),
+    ('hotel_name', 6.0, 'A'),
+    ('hotel_address', 3.0, 'B'),
+    ('hotel_description', 1.0, 'C'),
+)
+HOTEL_COLUMNS = (
+    ('name', 10.0, 'A'),
+    ('address', 4.0, 'B'),
+    ('description', 1.0, 'C'),
+)
+
+# Dropped from SQLite queries so that, as with PostgreSQL's websearch_to_tsquery,
+# every remaining word must match
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it near of on or the to with'.split()
+)
+
+
+def terms(query):
+    """Lower-cased search words of a query, without stopwords."""
+    return [word for word in re.findall(r'\w+', query.lower()) if word not in STOPWORDS]
+
+
+def query_key(query):
+    """Short cache-key part identifying a normalized query."""
+    return hashlib.sha1(' '.join(terms(query)).encode()).hexdigest()[:16]
+
+
+def version():
+    return inventory.token_digest([SEARCH_VERSION_KEY])
+
+
+# Backends
+
+class SQLiteIndex:
+    """FTS5 tables keyed by rowid = hotel or room id."""
+
+    def write(self, cursor, table, columns, rows):
+        self.delete(cursor, table, [row[0] for row in rows])
+        names = ', '.join(name for name, _, _ in columns)
+        placeholders = ', '.join(['%s'] * (len(columns) + 1))
+        cursor.executemany(f'INSERT INTO {table} (rowid, {names}) VALUES ({placeholders})', rows)
+
+    def delete(self, cursor, table, ids):
+        if ids:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids)
+
+    def clear(self, cursor, table):
+        cursor.execute(f'DELETE FROM {table}')
+
+    def match(self, cursor, table, columns, query, limit):
+        words = terms(query)
+        if not words:
+            return []
+        weights = ', '.join(str(weight) for _, weight, _ in columns)
+        cursor.execute(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY bm25({table}, {weights}), rowid LIMIT %s',
+            [' '.join(f'"{word}"' for word in words), limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresIndex:
+    """Tables of (id, document tsvector) with a GIN index on document."""
+
+    def write(self, cursor, table, columns, rows):
+        document = ' || '.join(
+            f"setweight(to_tsvector('english', %s), '{weight}')" for _, _, weight in columns
+        )
+        cursor.executemany(
+            f'INSERT INTO {table} (id, document) VALUES (%s, {document}) '
+            f'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document',
+            rows,
+        )
+
+    def delete(self, cursor, table, ids):
+        if ids:
+            cursor.execute(f'DELETE FROM {table} WHERE id = ANY(%s)', [list(ids)])
+
+    def clear(self, cursor, table):
+        cursor.execute(f'DELETE FROM {table}')
+
+    def match(self, cursor, table, columns, query, limit):
+        if not terms(query):
+            return []
+        cursor.execute(
+            f"SELECT id FROM {table}, websearch_to_tsquery('english', %s) query WHERE document @@ query "
+            f"ORDER BY ts_rank_cd(document, query) DESC, id LIMIT %s",
+            [query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackIndex:
+    """No index: every word must appear in one of the text fields (icontains), matches in id order."""
+    FIELDS = {
+        ROOM_TABLE: (Room, ('name', 'description', 'hotel__name', 'hotel__address', 'hotel__description')),
+        HOTEL_TABLE: (Hotel, ('name', 'address', 'description')),
+    }
+
+    def write(self, cursor, table, columns, rows):
+        pass
+
+    def delete(self, cursor, table, ids):
+        pass
+
+    def clear(self, cursor, table):
+        pass
+
+    def match(self, cursor, table, columns, query, limit):
+        words = terms(query)
+        if not words:
+            return []
+        model, fields = self.FIELDS[table]
+        matches = model.objects.all()
+        for word in words:
+            matches = matches.filter(reduce(or_, (Q(**{f'{field}__icontains': word}) for field in fields)))
+        return list(matches.order_by('id').values_list('id', flat=True)[:limit])
+
+
+BACKENDS = {'sqlite': SQLiteIndex, 'postgresql': PostgresIndex}
+
+
+def is_indexed():
+    """True if the database has a full-text index (SQLite or PostgreSQL)."""
+    return connection.vendor in BACKENDS
+
+
+def backend():
+    return BACKENDS.get(connection.vendor, FallbackIndex)()
+
+
+# Documents
+
+def room_documents(room_ids):
+    """Index rows (id, *ROOM_COLUMNS values) for some rooms."""
+    catalogue = list(Amenity.objects.order_by('name'))
+    rooms = Room.objects.filter(pk__in=room_ids).order_by().values_list(
+        'id', 'name', 'amenity_mask', 'description', 'hotel__name', 'hotel__address', 'hotel__description'
+    )
+    return [
+        (room_id, name, ' '.join(a.name for a in catalogue if mask >> a.bit & 1), description, *hotel)
+        for room_id, name, mask, description, *hotel in rooms
+    ]
+
+
+def hotel_documents(hotel_ids):
+    """Index rows (id, *HOTEL_COLUMNS values) for some hotels."""
+    return list(Hotel.objects.filter(pk__in=hotel_ids).order_by().values_list(
+        'id', 'name', 'address', 'description'
+    ))
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+# Incremental updates
+
+def index_rooms(room_ids):
+    """Rewrite the documents of some rooms (rooms that no longer exist are dropped)."""
+    index = backend()
+    with connection.cursor() as cursor:
+        for batch in _batches(room_ids):
+            rows = room_documents(batch)
+            index.delete(cursor, ROOM_TABLE, sorted(set(batch) - {row[0] for row in rows}))
+            index.write(cursor, ROOM_TABLE, ROOM_COLUMNS, rows)
+    inventory.replace_tokens([SEARCH_VERSION_KEY])
+
+
+def index_hotels(hotel_ids):
+    """Rewrite the documents of some hotels and of all their rooms."""
+    index = backend()
+    with connection.cursor() as cursor:
+        for batch in _batches(hotel_ids):
+            rows = hotel_documents(batch)
+            index.delete(cursor, HOTEL_TABLE, sorted(set(batch) - {row[0] for row in rows}))
+            index.write(cursor, HOTEL_TABLE, HOTEL_COLUMNS, rows)
+    index_rooms(Room.objects.filter(hotel_id__in=hotel_ids).order_by('id').values_list('id', flat=True))
+
+
+def remove_rooms(room_ids):
+    with connection.cursor() as cursor:
+        backend().delete(cursor, ROOM_TABLE, list(room_ids))
+    inventory.replace_tokens([SEARCH_VERSION_KEY])
+
+
+def remove_hotels(hotel_ids):
+    with connection.cursor() as cursor:
+        backend().delete(cursor, HOTEL_TABLE, list(hotel_ids))
+    inventory.replace_tokens([SEARCH_VERSION_KEY])
+
+
+def rebuild():
+    """Recreate every document; returns (hotels, rooms) indexed."""
+    index = backend()
+    with connection.cursor() as cursor:
+        index.clear(cursor, HOTEL_TABLE)
+        index.clear(cursor, ROOM_TABLE)
+    hotel_ids = list(Hotel.objects.order_by('id').values_list('id', flat=True))
+    index_hotels(hotel_ids)
+    return len(hotel_ids), Room.objects.count()
+
+
+# Queries
+
+def match_rooms(query, limit=MAX_MATCHES):
+    """Ids of the rooms matching every word of ``query``, best match first."""
+    with connection.cursor() as cursor:
+        return backend().match(cursor, ROOM_TABLE, ROOM_COLUMNS, query, limit)
+
+
+def match_hotels(query, limit=MAX_MATCHES):
+    """Ids of the hotels matching every word of ``query``, best match first."""
+    with connection.cursor() as cursor:
+        return backend().match(cursor, HOTEL_TABLE, HOTEL_COLUMNS, query, limit)
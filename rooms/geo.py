@@ -0,0 +1,120 @@
+"""
+Proximity search over hotel coordinates without GIS extensions.
+
+Each hotel with coordinates stores the id of the CELL_DEGREES x CELL_DEGREES
+grid cell it lies in (Hotel.geo_cell, numbered row by row from the south-west
+corner), indexed together with its coordinates. A radius query covers its
+circle with a latitude band of cell rows and, per row, the contiguous run of
+cells spanning the circle's longitude extent. Each run is one range scan of
+the index, which also holds the coordinates. The exact great-circle
+distance is then computed for those candidates only, which are filtered and
+sorted by it.
+"""
+from math import asin, cos, degrees, floor, radians, sin, sqrt
+from typing import NamedTuple
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 0.1
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 200
+
+
+class Area(NamedTuple):
+    """A circle on the globe: centre in degrees, radius in kilometres."""
+    latitude: float
+    longitude: float
+    radius_km: float
+
+    def cache_key(self):
+        return f'{self.latitude:.5f},{self.longitude:.5f},{self.radius_km:g}'
+
+
+def parse_area(params):
+    """
+    Area from ?lat=&lng=[&radius=] query parameters, or None when no centre
+    is given. Raises ValueError for a partial, malformed or out-of-range one.
+    """
+    lat, lng, radius = params.get('lat'), params.get('lng'), params.get('radius')
+    if not (lat or lng):
+        return None
+    try:
+        area = Area(float(lat), float(lng), float(radius or DEFAULT_RADIUS_KM))
+    except (TypeError, ValueError):
+        raise ValueError('lat and lng must both be given as decimal degrees, and radius in km.')
+    if not (-90 <= area.latitude <= 90 and -180 <= area.longitude <= 180):
+        raise ValueError('lat must be between -90 and 90 and lng between -180 and 180.')
+    if not 0 < area.radius_km <= MAX_RADIUS_KM:
+        raise ValueError(f'radius must be between 0 and {MAX_RADIUS_KM} km.')
+    return area
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Great-circle (haversine) distance between two points in degrees."""
+    lat1, lng1, lat2, lng2 = map(radians, (lat1, lng1, lat2, lng2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+
+
+def _row(latitude):
+    return min(floor((latitude + 90) / CELL_DEGREES), ROWS - 1)
+
+
+def _column(longitude):
+    return floor((longitude + 180) / CELL_DEGREES) % COLUMNS
+
+
+def cell(latitude, longitude):
+    """Grid cell id of a point, or None without coordinates."""
+    if latitude is None or longitude is None:
+        return None
+    return _row(latitude) * COLUMNS + _column(longitude)
+
+
+def cell_ranges(area):
+    """
+    Inclusive (first, last) cell id ranges covering ``area``. The longitude
+    extent is the exact one of a circle on a sphere; near the poles, or when
+    the circle is wider than the globe, rows are covered whole.
+    """
+    angle = area.radius_km / EARTH_RADIUS_KM
+    south = max(area.latitude - degrees(angle), -90)
+    north = min(area.latitude + degrees(angle), 90)
+    ratio = sin(angle) / cos(radians(area.latitude)) if abs(area.latitude) < 90 else 2
+    if north == 90 or south == -90 or ratio >= 1:
+        runs = [(0, COLUMNS - 1)]
+    else:
+        spread = degrees(asin(ratio))
+        west, east = _column(area.longitude - spread), _column(area.longitude + spread)
+        # A run crossing the antimeridian wraps to the start of the row
+        runs = [(west, east)] if west <= east else [(west, COLUMNS - 1), (0, east)]
+    ranges = []
+    for row in range(_row(south), _row(north) + 1):
+        for first, last in runs:
+            first, last = row * COLUMNS + first, row * COLUMNS + last
+            if ranges and ranges[-1][1] + 1 == first:
+                ranges[-1] = (ranges[-1][0], last)  # whole rows join into one range
+            else:
+                ranges.append((first, last))
+    return ranges
+
+
+def candidates(hotels, area):
+    """The active hotels of a queryset in the grid cells covering ``area``."""
+    cells = Q()
+    for first, last in cell_ranges(area):
+        cells |= Q(geo_cell__range=(first, last)) if first != last else Q(geo_cell=first)
+    return hotels.filter(cells, is_active=True)
+
+
+def nearby(hotels, area):
+    """Active hotels of a queryset within ``area``, nearest first, each with ``distance_km`` set."""
+    found = []
+    for hotel in candidates(hotels, area):
+        hotel.distance_km = distance_km(area.latitude, area.longitude, hotel.latitude, hotel.longitude)
+        if hotel.distance_km <= area.radius_km:
+            found.append(hotel)
+    found.sort(key=lambda hotel: (hotel.distance_km, hotel.pk))
+    return found
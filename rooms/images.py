@@ -0,0 +1,129 @@
+"""
+Image derivative pipeline for hotel and room photos.
+
+When an image is uploaded, resized JPEG and WebP variants are generated next
+to the original (rooms/photo.jpg -> rooms/photo.jpg.w640.webp, ...) by a small
+background thread pool, so admin saves do not wait on Pillow. The variant
+names are recorded on the model's ``image_variants`` field and rendered as a
+srcset by the {% responsive_image %} tag. Run `manage.py generate_image_variants`
+to backfill existing images or to repair variants lost to a restart.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+from .models import Hotel
+from . import cache as listing_cache
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1024)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def variant_name(name, width, fmt):
+    # The full source name, extension included: photo.jpg and photo.png must not share variants
+    return f'{name}.w{width}.{FORMATS[fmt][1]}'
+
+
+def generate_variants(field_file):
+    """
+    Write resized variants of an image file and return the mapping stored in
+    ``image_variants``: {'source': name, 'webp': {width: name}, 'jpeg': {...}}.
+    Widths larger than the original are skipped (no upscaling).
+    """
+    with field_file.open('rb') as handle:
+        original = ImageOps.exif_transpose(Image.open(handle))
+        original.load()
+    if original.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', original.size, 'white')
+        background.paste(original.convert('RGBA'), mask=original.convert('RGBA').split()[-1])
+        original = background
+    original = original.convert('RGB')
+
+    variants = {'source': field_file.name}
+    widths = [width for width in VARIANT_WIDTHS if width < original.width] or [original.width]
+    for fmt, (pil_format, _, options) in FORMATS.items():
+        variants[fmt] = {}
+        for width in widths:
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = variant_name(field_file.name, width, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[fmt][str(width)] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def delete_variants(variants):
+    for fmt in FORMATS:
+        for name in variants.get(fmt, {}).values():
+            default_storage.delete(name)
+
+
+def needs_variants(instance):
+    """True if the instance has an image whose variants are missing, stale or not named after it."""
+    if not instance.image:
+        return False
+    variants = instance.image_variants
+    return variants.get('source') != instance.image.name or any(
+        not name.startswith(f'{instance.image.name}.w') for fmt in FORMATS for name in variants.get(fmt, {}).values()
+    )
+
+
+def process(model, pk):
+    """Generate variants for one object and record them if its image is unchanged."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not needs_variants(instance):
+        return False
+    source = instance.image.name
+    variants = generate_variants(instance.image)
+    # update() skips save signals, so nothing re-schedules; drop cached cards explicitly.
+    updated = model.objects.filter(pk=pk, image=source).update(image_variants=variants)
+    if not updated:
+        delete_variants(variants)
+        return False
+    delete_variants(instance.image_variants)
+    if isinstance(instance, Hotel):
+        listing_cache.invalidate_hotel(instance)
+    else:
+        listing_cache.invalidate_room(instance.room_id, {instance.room.hotel_id})
+    return True
+
+
+def _run(model, pk):
+    close_old_connections()
+    try:
+        process(model, pk)
+    except Exception:
+        logger.exception('Generating image variants failed for %s %s', model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule(instance):
+    """Queue variant generation for after the current transaction commits."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-variants')
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _executor.submit(_run, model, pk))
+
+
+def srcset(variants, fmt):
+    """'url 320w, url 640w' for one format of ``image_variants``, or ''."""
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in sorted(variants.get(fmt, {}).items(), key=lambda item: int(item[0]))
+    )
@@ -0,0 +1,232 @@
+"""
+Management command comparing sync (WSGI) and async (ASGI) request throughput.
+Run: python manage.py benchmark_views [--requests 2000] [--concurrency 100]
+     [--workers 4] [--db-latency-ms 20] [--no-cache]
+
+Each mode runs in its own subprocess against the same database: "sync" drives
+config.wsgi with at most --workers requests in flight (like that many sync
+gunicorn workers), "async" drives config.asgi (async views, one event loop).
+--concurrency clients send the requests back to back; --db-latency-ms adds a
+sleep to every SQL query to stand in for a database across the network.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import BytesIO
+from itertools import cycle, islice
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+from bookings.models import Booking
+from config.metrics import QUANTILES, RollingSummary
+from rooms.models import Room
+
+MODES = ("sync", "async")
+
+
+def benchmark_paths():
+    """(path, query string) pairs for the read-heavy pages, cycled by the clients."""
+    room = Room.objects.order_by("id").first()
+    if room is None:
+        raise CommandError("No rooms found. Run 'python manage.py create_sample_data' first.")
+    check_in = date.today() + timedelta(days=7)
+    dates = urlencode({"check_in": check_in.isoformat(), "check_out": (check_in + timedelta(days=2)).isoformat()})
+    paths = [
+        (reverse("rooms:home"), ""),
+        (reverse("rooms:room_list"), ""),
+        (reverse("rooms:room_list"), dates),
+        (reverse("rooms:room_detail", args=[room.pk]), ""),
+    ]
+    booking_id = Booking.objects.order_by("id").values_list("id", flat=True).first()
+    if booking_id:
+        paths.append((reverse("bookings:confirmation", args=[booking_id]), ""))
+    return paths
+
+
+def add_db_latency(latency_ms):
+    def slow_execute(execute, sql, params, many, context):
+        time.sleep(latency_ms / 1000)
+        return execute(sql, params, many, context)
+
+    def install(connection, **kwargs):
+        if slow_execute not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow_execute)
+
+    connection_created.connect(install, weak=False)
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+
+def run_sync(paths, total, concurrency, workers):
+    from config.wsgi import application
+
+    server = threading.BoundedSemaphore(workers)
+
+    def request(path, query):
+        environ = {"PATH_INFO": path, "QUERY_STRING": query, "REQUEST_METHOD": "GET", "wsgi.input": BytesIO()}
+        setup_testing_defaults(environ)
+        status = []
+        with server:
+            body = application(environ, lambda code, headers, exc_info=None: status.append(int(code[:3])))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+        return status[0]
+
+    return drive_threads(request, paths, total, concurrency)
+
+
+def drive_threads(request, paths, total, concurrency):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    targets = islice(cycle(paths), total)
+
+    def client():
+        nonlocal errors
+        while True:
+            with lock:
+                target = next(targets, None)
+            if target is None:
+                return
+            path, query = target
+            start = time.perf_counter()
+            status = request(path, query)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += status >= 400
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return latencies, errors
+
+
+def run_async(paths, total, concurrency):
+    from config.asgi import application
+
+    async def request(path, query):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+            "root_path": "", "headers": [(b"host", b"testserver")],
+            "server": ("testserver", 80), "client": ("127.0.0.1", 0),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Future()  # never disconnects
+
+        status = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        await application(scope, receive, send)
+        return status[0]
+
+    async def main():
+        latencies, errors = [], 0
+        targets = islice(cycle(paths), total)
+
+        async def client():
+            nonlocal errors
+            for path, query in targets:
+                start = time.perf_counter()
+                status = await request(path, query)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += status >= 400
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = "Compare sync (WSGI) and async (ASGI) throughput of the read-heavy views"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per mode.")
+        parser.add_argument("--concurrency", type=int, default=100, help="Concurrent clients.")
+        parser.add_argument("--workers", type=int, default=4, help="Requests in flight in sync mode.")
+        parser.add_argument("--db-latency-ms", type=float, default=0, help="Extra latency per SQL query.")
+        parser.add_argument("--no-cache", action="store_true", help="Disable the listing/search cache.")
+        parser.add_argument("--mode", choices=MODES, help="Run one mode in this process (used internally).")
+
+    def handle(self, *args, **options):
+        if options["mode"]:
+            self.run_mode(options)
+            return
+
+        results = []
+        for mode in MODES:
+            env = {**os.environ, "ASYNC_VIEWS": "true" if mode == "async" else "false"}
+            argv = [sys.executable, sys.argv[0], "benchmark_views", "--mode", mode]
+            for name in ("requests", "concurrency", "workers", "db_latency_ms"):
+                argv += [f"--{name.replace('_', '-')}", str(options[name])]
+            if options["no_cache"]:
+                argv.append("--no-cache")
+            child = subprocess.run(argv, env=env, capture_output=True, text=True)
+            if child.returncode != 0:
+                raise CommandError(f"{mode} run failed:\n{child.stderr}")
+            results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} clients, "
+            f"{options['workers']} sync workers, +{options['db_latency_ms']} ms per query"
+            f"{', no cache' if options['no_cache'] else ''}"
+        )
+        self.stdout.write(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:<6} {result['throughput']:>8.1f} {result['p50']:>8.1f} "
+                f"{result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}"
+            )
+        if any(result["errors"] for result in results):
+            raise CommandError("Some requests failed.")
+
+    def run_mode(self, options):
+        if options["mode"] == "async" and not settings.ASYNC_VIEWS:
+            raise CommandError("The async mode needs ASYNC_VIEWS=true.")
+        overrides = {"STATICFILES_STORAGE": "django.contrib.staticfiles.storage.StaticFilesStorage"}
+        if options["no_cache"]:
+            overrides["CACHES"] = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(**overrides):
+            paths = benchmark_paths()
+            if options["db_latency_ms"]:
+                add_db_latency(options["db_latency_ms"])
+            total, concurrency = options["requests"], max(1, options["concurrency"])
+            start = time.perf_counter()
+            if options["mode"] == "sync":
+                latencies, errors = run_sync(paths, total, concurrency, max(1, options["workers"]))
+            else:
+                latencies, errors = run_async(paths, total, concurrency)
+            elapsed = time.perf_counter() - start
+
+        summary = RollingSummary(window=len(latencies) or 1)
+        for latency in latencies:
+            summary.add(latency)
+        self.stdout.write(json.dumps({
+            "mode": options["mode"],
+            "throughput": (len(latencies) + errors) / elapsed,
+            "errors": errors,
+            **{f"p{int(q * 100)}": summary.quantile(q) for q in QUANTILES},
+        }))
@@ -0,0 +1,116 @@
+"""
+Management command that requests each public view and fails if it runs more
+SQL queries than its budget in settings.QUERY_BUDGETS.
+Run: python manage.py check_query_budgets
+
+Every room gets a couple of images, and a weekend and a length-of-stay pricing
+rule are added, inside a rolled-back transaction first, so per-room (N+1)
+queries in the cards and per-stay pricing queries show up as a budget failure.
+Each request runs against an empty private cache, so budgets hold for a cold
+cache. The booking history is requested as the user with the most bookings, on
+the first visit of a day (when upcoming stays are recounted).
+"""
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from bookings import summary
+from bookings.models import BookingSummary
+from config.query_budget import QueryBudgetExceeded, assert_max_queries
+from rooms.models import Hotel, PricingRule, Room, RoomImage
+
+
+class Rollback(Exception):
+    """Raised to discard the images and rules added for the check."""
+
+
+class Command(BaseCommand):
+    help = "Request each view and fail if it exceeds its SQL query budget"
+
+    def handle(self, *args, **options):
+        hotel = Hotel.objects.annotate(room_count=Count("rooms")).order_by("-room_count").first()
+        room = Room.objects.order_by("id").first()
+        if not hotel or not room:
+            raise CommandError("No hotels or rooms found. Run 'python manage.py create_sample_data' first.")
+
+        check_in = date.today() + timedelta(days=7)
+        dates = {"check_in": check_in.isoformat(), "check_out": (check_in + timedelta(days=2)).isoformat()}
+        requests = [
+            ("rooms:home", reverse("rooms:home"), {}),
+            ("rooms:hotel_list", reverse("rooms:hotel_list"), {}),
+            ("rooms:hotel_detail", reverse("rooms:hotel_detail", args=[hotel.pk]), {}),
+            ("rooms:room_list", reverse("rooms:room_list"), {}),
+            ("rooms:room_list", reverse("rooms:room_list"), dates),
+            ("rooms:room_list", reverse("rooms:room_list"), {**dates, "amenity": ["wifi", "mini-bar"]}),
+            ("rooms:room_list", reverse("rooms:room_list"), {**dates, "q": "suite"}),
+            ("rooms:hotel_list", reverse("rooms:hotel_list"), {"q": "hotel"}),
+            ("rooms:hotel_list", reverse("rooms:hotel_list"), {"lat": 38.72, "lng": -9.14, "radius": 25}),
+            ("rooms:room_list", reverse("rooms:room_list"), {**dates, "lat": 38.72, "lng": -9.14, "radius": 25}),
+            ("rooms:room_detail", reverse("rooms:room_detail", args=[room.pk]), {}),
+            ("rooms:room_list_api", reverse("rooms:room_list_api"), dates),
+            ("rooms:group_search", reverse("rooms:group_search"), {**dates, "guests": 8}),
+            ("rooms:room_calendar", reverse("rooms:room_calendar", args=[room.pk]), {"days": 90}),
+            ("rooms:hotel_calendar", reverse("rooms:hotel_calendar", args=[hotel.pk]), {"days": 90}),
+            ("rooms:room_quote", reverse("rooms:room_quote", args=[room.pk]), dates),
+        ]
+
+        member = User.objects.annotate(booking_count=Count("bookings")).order_by("-booking_count").first()
+        if member:
+            requests.append(("bookings:history", reverse("bookings:history"), {}))
+
+        failures = []
+        client = Client()
+        member_client = Client()
+        overrides = {
+            "STATICFILES_STORAGE": "django.contrib.staticfiles.storage.StaticFilesStorage",
+            "CACHES": {"default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "check-query-budgets",
+            }},
+        }
+        try:
+            with transaction.atomic(), override_settings(**overrides):
+                RoomImage.objects.bulk_create(
+                    [
+                        RoomImage(room_id=room_id, image=f"rooms/budget-{n}.jpg", is_primary=n == 1)
+                        for room_id in Room.objects.values_list("id", flat=True)
+                        for n in range(2)
+                    ],
+                    batch_size=2000,
+                )
+                PricingRule.objects.create(name="Budget weekend", kind=PricingRule.WEEKEND, weekdays="4,5",
+                                           adjustment=20)
+                PricingRule.objects.create(name="Budget long stay", kind=PricingRule.LENGTH_OF_STAY, min_nights=2,
+                                           adjustment=-5)
+                if member:
+                    member_client.force_login(member)
+                    summary.for_user(member)
+                    BookingSummary.objects.filter(user=member).update(upcoming_as_of=None)
+                for url_name, url, params in requests:
+                    cache.clear()
+                    budget = settings.QUERY_BUDGETS[url_name]
+                    try:
+                        with assert_max_queries(budget, label=url_name) as ctx:
+                            response = (member_client if url_name == "bookings:history" else client).get(url, params)
+                    except QueryBudgetExceeded as exc:
+                        failures.append(url_name)
+                        self.stdout.write(self.style.ERROR(str(exc)))
+                        continue
+                    if response.status_code != 200:
+                        failures.append(url_name)
+                        self.stdout.write(self.style.ERROR(f"{url_name}: HTTP {response.status_code}"))
+                        continue
+                    self.stdout.write(self.style.SUCCESS(f"ok   {url_name} {len(ctx)}/{budget} queries"))
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"Query budget exceeded for: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All views within their query budgets."))
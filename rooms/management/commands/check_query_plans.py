@@ -0,0 +1,170 @@
+"""
+Management command that captures EXPLAIN plans for the hot booking and room
+queries and fails if any of them falls back to a full table scan.
+Run: python manage.py check_query_plans [--bookings 200000] [--verbose-plans]
+
+By default a synthetic dataset is loaded inside a transaction that is rolled
+back afterwards, so the command is safe to run against a development database.
+"""
+from datetime import date, timedelta
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+from bookings.models import Booking, Notification
+from bookings import history, holds, outbox
+from rooms import amenities, fulltext, geo, synthetic
+from rooms.availability import blocking_stays
+from rooms.pricing import rate_rows
+from rooms.models import Amenity, Hotel, Room, RoomCategory
+from rooms.search import available_rooms, text_candidates
+
+
+# Lookup tables small enough that scanning them is always cheaper than an index.
+SMALL_TABLES = {RoomCategory._meta.db_table}
+
+
+class Rollback(Exception):
+    """Raised to discard the synthetic dataset once plans are captured."""
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot queries over a large synthetic dataset and fail on sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hotels", type=int, default=200, help="Synthetic hotels to add.")
+        parser.add_argument("--rooms-per-hotel", type=int, default=25, help="Synthetic rooms per hotel.")
+        parser.add_argument("--bookings", type=int, default=100000, help="Synthetic bookings to add.")
+        parser.add_argument("--users", type=int, default=500, help="Synthetic users to spread bookings over.")
+        parser.add_argument(
+            "--no-synthetic",
+            action="store_true",
+            help="Explain against the existing data instead of loading a synthetic dataset.",
+        )
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every captured plan.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if not options["no_synthetic"]:
+                    self.load_dataset(options)
+                failures = self.check_plans(options["verbose_plans"])
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError(f"{len(failures)} query plan(s) use a sequential scan: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes."))
+
+    def load_dataset(self, options):
+        categories = list(RoomCategory.objects.all())
+        if not categories:
+            categories = RoomCategory.objects.bulk_create(
+                [RoomCategory(name=f"Plan Category {i}", slug=f"plan-category-{i}") for i in range(5)]
+            )
+        counts = synthetic.generate(
+            categories,
+            hotels=options["hotels"],
+            rooms_per_hotel=options["rooms_per_hotel"],
+            bookings=options["bookings"],
+            images=0,
+            users=options["users"],
+            queue_reminders=True,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"Loaded {counts['hotels']} hotels, {counts['rooms']} rooms, {counts['bookings']} bookings."
+        )
+
+    def plans(self):
+        """(label, queryset) pairs for every hot query we want to keep index-backed."""
+        today = date.today()
+        check_in, check_out = today + timedelta(days=30), today + timedelta(days=33)
+        slug = RoomCategory.objects.values_list("slug", flat=True).first()
+        amenity_mask = amenities.mask_of(Amenity.objects.order_by("-bit")[:2])
+        hotel_id = Room.objects.values_list("hotel_id", flat=True).first()
+        hotel_room_ids = list(Room.objects.filter(hotel_id=hotel_id).values_list("id", flat=True))
+        user = User.objects.filter(bookings__isnull=False).first() or User(pk=0)
+        user_bookings = history.bookings_for(user)
+        last_seen = user_bookings[history.PAGE_SIZE - 1:].first() or Booking(pk=0, created_at=timezone.now())
+        cursor = history.encode_cursor(last_seen)
+
+        admin_user = User(is_active=True, is_staff=True, is_superuser=True)
+        factory = RequestFactory()
+
+        def changelist(model, **params):
+            request = factory.get("/", params)
+            request.user = admin_user
+            cl = admin.site._registry[model].get_changelist_instance(request)
+            return cl.get_queryset(request)[:cl.list_per_page]
+
+        return [
+            ("room_list", available_rooms()),
+            ("room_list dates", available_rooms(check_in, check_out)),
+            ("room_list dates+category", available_rooms(check_in, check_out, slug)),
+            ("room_list amenities", available_rooms(amenity_mask=amenity_mask)),
+            ("room_list dates+amenities", available_rooms(check_in, check_out, amenity_mask=amenity_mask).values_list(
+                "hotel_id", "category_id", "id"
+            )),
+            ("room_list text+dates", text_candidates(
+                available_rooms(check_in, check_out).order_by(), fulltext.match_rooms("room")
+            )[0].values_list("hotel_id", "category_id", "id")),
+            ("hotels near", geo.candidates(
+                Hotel.objects.only("id", "latitude", "longitude"), geo.Area(*synthetic.CITIES["Lisbon"], 25)
+            )),
+            ("room calendar", blocking_stays(hotel_room_ids[:1], today, today + timedelta(days=42))),
+            ("hotel calendar", blocking_stays(hotel_room_ids, today, today + timedelta(days=42))),
+            ("nightly rates", rate_rows(
+                set(Room.objects.filter(id__in=hotel_room_ids).values_list("hotel_id", "category_id")),
+                check_in, check_out,
+            )),
+            ("booking history", user_bookings[:history.PAGE_SIZE]),
+            ("booking history next page", history.after(user_bookings, cursor)[:history.PAGE_SIZE]),
+            ("booking history by status", history.after(
+                history.bookings_for(user, status="confirmed", booked_from=today - timedelta(days=365)), cursor
+            )[:history.PAGE_SIZE]),
+            ("admin bookings", changelist(Booking)),
+            ("admin bookings by status", changelist(Booking, status__exact="pending")),
+            ("admin bookings by check-in month", changelist(
+                Booking, check_in__year=check_in.year, check_in__month=check_in.month
+            )),
+            ("admin rooms", changelist(Room)),
+            ("overdue holds", holds.overdue()[:holds.BATCH_SIZE]),
+            ("hold outcomes", holds.placed(timezone.now() - holds.METRICS_WINDOW)),
+            ("due notifications", outbox.due()[:outbox.BATCH_SIZE]),
+            ("admin notifications by status", changelist(Notification, status__exact="failed")),
+        ]
+
+    def check_plans(self, verbose):
+        failures = []
+        for label, queryset in self.plans():
+            plan = queryset.explain()
+            scanned = self.scanned_tables(plan)
+            if verbose or scanned:
+                self.stdout.write(f"-- {label}\n{plan}")
+            if scanned:
+                failures.append(f"{label} ({', '.join(sorted(scanned))})")
+                self.stdout.write(self.style.ERROR(f"FAIL {label}: sequential scan on {', '.join(sorted(scanned))}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok   {label}"))
+        return failures
+
+    def scanned_tables(self, plan):
+        """Tables the plan reads in full, for SQLite and PostgreSQL plan formats."""
+        scanned = set()
+        if connection.vendor == "sqlite" and "USE TEMP B-TREE FOR ORDER BY" in plan:
+            # Sorting the whole result means every matching row was read first.
+            scanned.add("<full sort>")
+        for line in plan.splitlines():
+            words = line.replace("-", " ").split()
+            if connection.vendor == "postgresql":
+                if "Seq" in words and "Scan" in words and "on" in words:
+                    scanned.add(words[words.index("on") + 1])
+            elif "SCAN" in words and "USING" not in words:
+                table = words[words.index("SCAN") + 1]
+                if table not in ("TABLE", "SUBQUERY", "CONSTANT"):
+                    scanned.add(table)
+        return scanned - SMALL_TABLES
@@ -0,0 +1,38 @@
+"""
+Management command to compile pricing rules into nightly rate tables.
+Run: python manage.py compile_rates [--hotel ID ...]
+
+Rates are recompiled automatically when rules, rooms or occupancy change; run
+this daily so the horizon (settings.PRICING_HORIZON_DAYS) moves forward, and
+after bulk imports, which skip the occupancy updates.
+"""
+import time
+from django.core.management.base import BaseCommand
+from rooms import cache as listing_cache, pricing
+from rooms.models import NightlyRate
+
+
+class Command(BaseCommand):
+    help = "Compile pricing rules into the nightly rate tables over the pricing horizon"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hotel",
+            type=int,
+            action="append",
+            dest="hotels",
+            help="Limit the compile to this hotel id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        if not listing_cache.is_shared():
+            self.stderr.write(self.style.WARNING(listing_cache.local_cache_warning("the previous prices")))
+        start, end = pricing.horizon()
+        started = time.perf_counter()
+        stored = pricing.compile_rates(hotel_ids=options["hotels"])
+        # Nights that have slipped into the past are no longer needed for pricing
+        expired, _ = NightlyRate.objects.filter(date__lt=start).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. {stored} nightly rates stored for {start} to {end} "
+            f"({expired} expired removed) in {time.perf_counter() - started:.1f}s."
+        ))
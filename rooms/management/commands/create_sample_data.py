@@ -4,21 +4,22 @@ Run: python manage.py create_sample_data
 """
 from decimal import Decimal
 from django.core.management.base import BaseCommand
+from rooms import amenities
 from rooms.models import Hotel, RoomCategory, Room
 
 
-# 10 sample hotels
+# 10 sample hotels (placed around Lisbon, for proximity search)
 HOTELS = [
-    {"name": "Grand Plaza Hotel", "address": "100 Main Street, Downtown", "phone": "+1 555-100-1000", "email": "info@grandplaza.com"},
-    {"name": "Sunset Resort & Spa", "address": "200 Ocean Drive, Beachfront", "phone": "+1 555-200-2000", "email": "hello@sunsetresort.com"},
-    {"name": "Mountain View Lodge", "address": "300 Pine Road, Hillside", "phone": "+1 555-300-3000", "email": "stay@mountainview.com"},
-    {"name": "City Center Inn", "address": "400 Commerce Ave, City Center", "phone": "+1 555-400-4000", "email": "book@citycenterinn.com"},
-    {"name": "Riverside Suites", "address": "500 River Road, Riverside", "phone": "+1 555-500-5000", "email": "info@riversidesuites.com"},
-    {"name": "Garden Hotel", "address": "600 Bloom Street, Garden District", "phone": "+1 555-600-6000", "email": "contact@gardenhotel.com"},
-    {"name": "Lakeside Retreat", "address": "700 Lake View Drive", "phone": "+1 555-700-7000", "email": "reservations@lakesideretreat.com"},
-    {"name": "Heritage Grand", "address": "800 Historic Square", "phone": "+1 555-800-8000", "email": "guest@heritagegrand.com"},
-    {"name": "Skyline Tower Hotel", "address": "900 Skyline Blvd, Uptown", "phone": "+1 555-900-9000", "email": "book@skylinetower.com"},
-    {"name": "Parkside Inn", "address": "1000 Park Avenue, Green Zone", "phone": "+1 555-000-0000", "email": "hello@parksideinn.com"},
+    {"name": "Grand Plaza Hotel", "address": "100 Main Street, Downtown", "phone": "+1 555-100-1000", "email": "info@grandplaza.com", "latitude": 38.7139, "longitude": -9.1334},
+    {"name": "Sunset Resort & Spa", "address": "200 Ocean Drive, Beachfront", "phone": "+1 555-200-2000", "email": "hello@sunsetresort.com", "latitude": 38.6979, "longitude": -9.4215},
+    {"name": "Mountain View Lodge", "address": "300 Pine Road, Hillside", "phone": "+1 555-300-3000", "email": "stay@mountainview.com", "latitude": 38.7979, "longitude": -9.3817},
+    {"name": "City Center Inn", "address": "400 Commerce Ave, City Center", "phone": "+1 555-400-4000", "email": "book@citycenterinn.com", "latitude": 38.7107, "longitude": -9.1399},
+    {"name": "Riverside Suites", "address": "500 River Road, Riverside", "phone": "+1 555-500-5000", "email": "info@riversidesuites.com", "latitude": 38.7046, "longitude": -9.1668},
+    {"name": "Garden Hotel", "address": "600 Bloom Street, Garden District", "phone": "+1 555-600-6000", "email": "contact@gardenhotel.com", "latitude": 38.7167, "longitude": -9.1556},
+    {"name": "Lakeside Retreat", "address": "700 Lake View Drive", "phone": "+1 555-700-7000", "email": "reservations@lakesideretreat.com", "latitude": 38.7677, "longitude": -9.0967},
+    {"name": "Heritage Grand", "address": "800 Historic Square", "phone": "+1 555-800-8000", "email": "guest@heritagegrand.com", "latitude": 38.7103, "longitude": -9.1337},
+    {"name": "Skyline Tower Hotel", "address": "900 Skyline Blvd, Uptown", "phone": "+1 555-900-9000", "email": "book@skylinetower.com", "latitude": 38.7369, "longitude": -9.1427},
+    {"name": "Parkside Inn", "address": "1000 Park Avenue, Green Zone", "phone": "+1 555-000-0000", "email": "hello@parksideinn.com", "latitude": 38.7253, "longitude": -9.15},
 ]
 
 # Price range and max guests per category (category_slug -> (min_price, max_price, max_guests))
@@ -66,6 +67,8 @@ class Command(BaseCommand):
                     "phone": data.get("phone", ""),
                     "email": data.get("email", ""),
                     "description": f"Welcome to {data['name']}. We offer comfortable rooms and great service.",
+                    "latitude": data["latitude"],
+                    "longitude": data["longitude"],
                     "is_active": True,
                 },
             )
@@ -84,6 +87,8 @@ class Command(BaseCommand):
                         phone=data.get("phone", ""),
                         email=data.get("email", ""),
                         description=f"Welcome to {data['name']}. We offer comfortable rooms and great service.",
+                        latitude=data["latitude"],
+                        longitude=data["longitude"],
                         is_active=True,
                     )
                     hotels.append(hotel)
@@ -101,7 +106,7 @@ class Command(BaseCommand):
                 continue
             low, high, max_guests = config
             step = (high - low) / 9 if high != low else Decimal("0")
-            amenities = DEFAULT_AMENITIES
+            amenity_mask = amenities.mask_for_names(amenities.parse(DEFAULT_AMENITIES), create=True)
             for i in range(10):
                 hotel = hotels[i % len(hotels)]
                 price = low + (step * i)
@@ -114,7 +119,7 @@ class Command(BaseCommand):
                         "description": ROOM_DESCRIPTION,
                         "price_per_night": price,
                         "max_guests": max_guests,
-                        "amenities": amenities,
+                        "amenity_mask": amenity_mask,
                         "is_available": True,
                     },
                 )
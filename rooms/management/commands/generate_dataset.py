@@ -0,0 +1,62 @@
+"""
+Management command to load a large synthetic dataset for load and capacity testing.
+Run: python manage.py generate_dataset --hotels 1000 --rooms-per-hotel 100 --bookings 2000000 --images 3 --seed 1
+
+Bookings follow seasonal and weekday demand and never overlap per room; see
+rooms.synthetic. Rows are added to the existing data (run create_categories
+first); use a scratch database for very large runs.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rooms import synthetic
+from rooms.models import RoomCategory
+
+
+class Command(BaseCommand):
+    help = "Bulk-insert synthetic hotels, rooms, images, users and bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hotels", type=int, default=100, help="Hotels to create.")
+        parser.add_argument("--rooms-per-hotel", type=int, default=50, help="Rooms per hotel.")
+        parser.add_argument("--bookings", type=int, default=100000, help="Bookings to aim for (see below).")
+        parser.add_argument("--images", type=int, default=2, help="Images per room (0 for none).")
+        parser.add_argument("--users", type=int, default=1000, help="Users to spread bookings over.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument("--days-back", type=int, default=365, help="Days of booking history.")
+        parser.add_argument("--days-ahead", type=int, default=180, help="Days of future bookings.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk insert.")
+
+    def handle(self, *args, **options):
+        categories = list(RoomCategory.objects.order_by("slug"))
+        if not categories:
+            raise CommandError("Run 'python manage.py create_categories' first.")
+        if options["hotels"] < 1 or options["rooms_per_hotel"] < 1:
+            raise CommandError("--hotels and --rooms-per-hotel must be at least 1.")
+
+        start = time.perf_counter()
+        counts = synthetic.generate(
+            categories,
+            hotels=options["hotels"],
+            rooms_per_hotel=options["rooms_per_hotel"],
+            bookings=options["bookings"],
+            images=options["images"],
+            users=options["users"],
+            seed=options["seed"],
+            days_back=options["days_back"],
+            days_ahead=options["days_ahead"],
+            batch_size=max(1, options["batch_size"]),
+            log=lambda message: self.stdout.write(f"  {message}"),
+        )
+        elapsed = time.perf_counter() - start
+        if counts["bookings"] < options["bookings"]:
+            # Stays that would run past the window or overlap a full calendar are dropped.
+            self.stdout.write(self.style.WARNING(
+                f"Only {counts['bookings']} of {options['bookings']} bookings fit; "
+                "add rooms or widen --days-back/--days-ahead for more."
+            ))
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s: "
+            + ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+            + f" ({total / (elapsed or 1):.0f} rows/s)."
+        ))
@@ -0,0 +1,60 @@
+"""
+Management command to generate resized JPEG/WebP variants of hotel and room images.
+Run: python manage.py generate_image_variants [--force] [--workers 4]
+
+Uploads get their variants in the background when saved; this backfills images
+that predate the pipeline or lost their variants (e.g. a restart mid-job).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from rooms import images
+from rooms.models import Hotel, RoomImage
+
+
+def _process(model, pk):
+    close_old_connections()
+    try:
+        return images.process(model, pk)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = "Generate resized/WebP variants for hotel and room images that lack them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants even if they are already up to date.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Images processed in parallel.",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Hotel, RoomImage):
+            queryset = model.objects.exclude(image="").exclude(image__isnull=True).order_by("pk")
+            if options["force"]:
+                # Clearing the source marks every variant set as stale.
+                queryset.update(image_variants={})
+            pks = [
+                obj.pk for obj in queryset.only("pk", "image", "image_variants").iterator()
+                if images.needs_variants(obj)
+            ]
+            done = failed = 0
+            with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as executor:
+                futures = {pk: executor.submit(_process, model, pk) for pk in pks}
+                for pk, future in futures.items():
+                    try:
+                        done += bool(future.result())
+                    except Exception as exc:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f"{model.__name__} {pk}: {exc}"))
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: {done} of {len(pks)} images processed, {failed} failed."
+            ))
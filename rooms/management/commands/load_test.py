@@ -0,0 +1,386 @@
+"""
+Management command that load-tests the site end to end over HTTP.
+Run: python manage.py load_test [--duration 60] [--users 20] [--workers 4]
+     [--server-mode wsgi|asgi] [--url http://host:port]
+     [--baseline loadtest-baseline.json] [--save-baseline loadtest-baseline.json]
+
+Unless --url points at a running site, a scratch SQLite database is seeded
+(migrate, create_categories, generate_dataset) and served by gunicorn with
+gunicorn.conf.py, as in production (collectstatic is run first if needed).
+Each virtual user registers an account, then replays a weighted mix of home,
+dated room searches, room details, booking form + POST (with its CSRF token),
+confirmations and booking history. The report gives throughput and
+p50/p95/p99 latency per page; --save-baseline stores it, and --baseline fails
+the run when a page's p95 or throughput regresses by more than --tolerance.
+"""
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from http.client import HTTPConnection
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from config.metrics import QUANTILES, RollingSummary
+
+# Must not resemble the generated usernames (UserAttributeSimilarityValidator)
+PASSWORD = "Quiet-harbor-lantern-42"
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+# (label, weight) of each step of the traffic mix
+TRAFFIC = [
+    ("rooms:home", 10),
+    ("rooms:room_list dates", 30),
+    ("rooms:room_detail", 30),
+    ("bookings:create", 15),
+    ("bookings:history", 15),
+]
+
+
+class HTTPError(Exception):
+    pass
+
+
+class Session:
+    """One virtual user's keep-alive connection and cookies."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self.connection = None
+
+    def request(self, method, path, fields=None):
+        """Return (status, headers, body text); redirects are not followed."""
+        body = urlencode(fields) if fields is not None else None
+        headers = {"Host": f"{self.host}:{self.port}", "User-Agent": "hotel-load-test"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{key}={value}" for key, value in self.cookies.items())
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+            headers["Referer"] = f"http://{self.host}:{self.port}{path}"
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                text = response.read().decode("utf-8", "replace")
+                break
+            except (ConnectionError, OSError):
+                # The server closed an idle keep-alive connection: reconnect once.
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+        for header in response.headers.get_all("Set-Cookie") or []:
+            for key, morsel in SimpleCookie(header).items():
+                self.cookies[key] = morsel.value
+        return response.status, response.headers, text
+
+    def csrf_token(self, page):
+        match = CSRF_INPUT.search(page)
+        if not match:
+            raise HTTPError("no CSRF token in page")
+        return match.group(1)
+
+
+class Recorder:
+    """Latency samples and error counts per label (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, label, latency_ms, ok):
+        with self.lock:
+            self.samples.setdefault(label, []).append(latency_ms)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+    def report(self, elapsed):
+        results = {}
+        for label in sorted(self.samples):
+            samples = self.samples[label]
+            summary = RollingSummary(window=len(samples))
+            for sample in samples:
+                summary.add(sample)
+            results[label] = {
+                "requests": len(samples),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(samples) / elapsed, 2),
+                **{f"p{int(q * 100)}": round(summary.quantile(q), 1) for q in QUANTILES},
+            }
+        return results
+
+
+class VirtualUser:
+    def __init__(self, number, base_url, room_ids, recorder, rng):
+        self.number = number
+        self.session = Session(base_url)
+        self.room_ids = room_ids
+        self.recorder = recorder
+        self.rng = rng
+
+    def timed(self, label, method, path, fields=None, expect=(200,)):
+        start = time.perf_counter()
+        try:
+            status, headers, text = self.session.request(method, path, fields)
+        except OSError:
+            self.recorder.record(label, (time.perf_counter() - start) * 1000, False)
+            return None, None, ""
+        self.recorder.record(label, (time.perf_counter() - start) * 1000, status in expect)
+        return status, headers, text
+
+    def register(self, run_id):
+        """Create and log in an account (setup; not part of the measured mix)."""
+        _, _, page = self.session.request("GET", "/accounts/register/")
+        password = PASSWORD
+        status, _, page = self.session.request("POST", "/accounts/register/", {
+            "csrfmiddlewaretoken": self.session.csrf_token(page),
+            "username": f"loadtest-{run_id}-{self.number}",
+            "email": f"loadtest-{run_id}-{self.number}@example.com",
+            "password1": password,
+            "password2": password,
+        })
+        if status != 302:
+            errors = re.findall(r'class="(?:alert alert-danger|text-danger small)">(.*?)</div>', page, re.S)
+            raise HTTPError(f"registration failed with HTTP {status}: {' '.join(errors) or page[:500]}")
+
+    def stay(self):
+        check_in = date.today() + timedelta(days=self.rng.randint(1, 180))
+        return check_in, check_in + timedelta(days=self.rng.choice([1, 2, 2, 3, 3, 4, 7]))
+
+    def step(self, label):
+        if label == "rooms:home":
+            self.timed(label, "GET", "/")
+        elif label == "rooms:room_list dates":
+            check_in, check_out = self.stay()
+            self.timed(label, "GET", "/rooms/?" + urlencode({"check_in": check_in, "check_out": check_out}))
+        elif label == "rooms:room_detail":
+            self.timed(label, "GET", f"/rooms/{self.rng.choice(self.room_ids)}/")
+        elif label == "bookings:history":
+            self.timed(label, "GET", "/bookings/history/")
+        elif label == "bookings:create":
+            room_id = self.rng.choice(self.room_ids)
+            check_in, check_out = self.stay()
+            path = f"/bookings/create/{room_id}/"
+            _, _, page = self.timed("bookings:create GET", "GET", path)
+            if "csrfmiddlewaretoken" not in page:
+                return
+            # 302 = booked; 200 = form re-shown (dates taken or guests over the limit)
+            status, headers, _ = self.timed("bookings:create POST", "POST", path, {
+                "csrfmiddlewaretoken": self.session.csrf_token(page),
+                "check_in": check_in,
+                "check_out": check_out,
+                "num_guests": 1,
+                "guest_name": f"Load Test {self.number}",
+                "guest_email": f"guest{self.number}@example.com",
+                "guest_phone": "",
+                "special_requests": "",
+            }, expect=(200, 302))
+            if status == 302:
+                self.timed("bookings:confirmation", "GET", urlsplit(headers["Location"]).path)
+
+    def run(self, stop_at, labels, weights):
+        while time.monotonic() < stop_at:
+            self.step(self.rng.choices(labels, weights)[0])
+
+
+class Command(BaseCommand):
+    help = "Replay realistic traffic over HTTP and report throughput and latency percentiles per page"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Test an already running site instead of starting one.")
+        parser.add_argument("--duration", type=float, default=60, help="Measured seconds of traffic.")
+        parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before measuring.")
+        parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users.")
+        parser.add_argument("--workers", type=int, default=4, help="Gunicorn workers for the local server.")
+        parser.add_argument("--server-mode", choices=("wsgi", "asgi"), default="wsgi", help="Local server profile.")
+        parser.add_argument("--hotels", type=int, default=50, help="Hotels in the seeded database.")
+        parser.add_argument("--rooms-per-hotel", type=int, default=20, help="Rooms per hotel in the seeded database.")
+        parser.add_argument("--bookings", type=int, default=20000, help="Bookings in the seeded database.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for data and traffic.")
+        parser.add_argument("--baseline", help="Compare against this baseline file and fail on regressions.")
+        parser.add_argument("--save-baseline", help="Write this run's results to this file.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2,
+            help="Allowed relative regression of p95 latency and throughput (default 0.2 = 20%%).",
+        )
+
+    def handle(self, *args, **options):
+        with self.site(options) as base_url:
+            rng = random.Random(options["seed"])
+            room_ids = self.room_ids(base_url)
+            recorder = Recorder()
+            run_id = f"{int(time.time())}{rng.randrange(1000)}"
+            users = [VirtualUser(n, base_url, room_ids, recorder, random.Random(rng.random()))
+                     for n in range(options["users"])]
+            self.stdout.write(f"Registering {len(users)} virtual users...")
+            for user in users:
+                try:
+                    user.register(run_id)
+                except HTTPError as exc:
+                    raise CommandError(str(exc))
+
+            labels, weights = zip(*TRAFFIC)
+            self.stdout.write(f"Warming up for {options['warmup']:.0f}s, measuring for {options['duration']:.0f}s...")
+            self.drive(users, options["warmup"], labels, weights)
+            recorder.samples.clear()
+            recorder.errors.clear()
+            start = time.monotonic()
+            self.drive(users, options["duration"], labels, weights)
+            elapsed = time.monotonic() - start
+
+        results = recorder.report(elapsed)
+        total = sum(result["requests"] for result in results.values())
+        errors = sum(result["errors"] for result in results.values())
+        self.print_report(results, total, errors, elapsed)
+        run = {
+            "options": {name: options[name] for name in ("users", "workers", "server_mode", "duration", "url")},
+            "throughput": round(total / elapsed, 2),
+            "pages": results,
+        }
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as handle:
+                json.dump(run, handle, indent=2)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}.")
+        if options["baseline"]:
+            self.compare(run, options["baseline"], options["tolerance"])
+        if errors:
+            raise CommandError(f"{errors} of {total} requests failed.")
+
+    def drive(self, users, seconds, labels, weights):
+        stop_at = time.monotonic() + seconds
+        threads = [threading.Thread(target=user.run, args=(stop_at, labels, weights)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def room_ids(self, base_url):
+        status, _, text = Session(base_url).request("GET", "/api/rooms/?page_size=100")
+        if status != 200:
+            raise CommandError(f"Room search API returned HTTP {status}.")
+        room_ids = [room["id"] for room in json.loads(text)["results"]]
+        if not room_ids:
+            raise CommandError("The site has no rooms to load-test.")
+        return room_ids
+
+    @contextmanager
+    def site(self, options):
+        """Yield the base URL of the site under test, seeding and serving a scratch copy if needed."""
+        if options["url"]:
+            yield options["url"].rstrip("/")
+            return
+        if not shutil.which("gunicorn"):
+            raise CommandError("gunicorn is not installed (pip install -r requirements.txt).")
+        workdir = tempfile.mkdtemp(prefix="hotel-load-test-")
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadtest.sqlite3')}",
+            "DEBUG": "False",
+            # Shared by the server's workers, as the system checks require
+            "CACHE_URL": f"file://{os.path.join(workdir, 'cache')}",
+        }
+        manage = [sys.executable, os.path.join(settings.BASE_DIR, "manage.py")]
+        self.stdout.write(f"Seeding scratch database in {workdir}...")
+        seed_commands = [
+            ["migrate", "--noinput"],
+            ["create_categories"],
+            ["generate_dataset", "--hotels", str(options["hotels"]),
+             "--rooms-per-hotel", str(options["rooms_per_hotel"]),
+             "--bookings", str(options["bookings"]), "--images", "0", "--seed", str(options["seed"])],
+        ]
+        if not os.path.exists(os.path.join(settings.STATIC_ROOT, "staticfiles.json")):
+            seed_commands.insert(0, ["collectstatic", "--noinput"])
+        for command in seed_commands:
+            child = subprocess.run(manage + command, env=env, capture_output=True, text=True)
+            if child.returncode != 0:
+                raise CommandError(f"{' '.join(command)} failed:\n{child.stderr}")
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        log_path = os.path.join(workdir, "server.log")
+        server_env = {**env, "PORT": str(port), "SERVER_MODE": options["server_mode"],
+                      "WEB_CONCURRENCY": str(options["workers"])}
+        with open(log_path, "w") as log:
+            server = subprocess.Popen(
+                ["gunicorn", "--config", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}"],
+                cwd=settings.BASE_DIR, env=server_env, stdout=log, stderr=subprocess.STDOUT,
+            )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            self.wait_for(base_url, server, log_path)
+            self.stdout.write(f"Serving {options['server_mode']} on {base_url} with {options['workers']} workers.")
+            yield base_url
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def wait_for(self, base_url, server, log_path, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                if Session(base_url, timeout=5).request("GET", "/")[0] == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.5)
+        with open(log_path) as log:
+            raise CommandError(f"The server did not come up:\n{log.read()[-2000:]}")
+
+    def print_report(self, results, total, errors, elapsed):
+        self.stdout.write(f"\n{total} requests in {elapsed:.1f}s: {total / elapsed:.1f} req/s, {errors} errors")
+        self.stdout.write(
+            f"{'page':<26} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for label, result in results.items():
+            self.stdout.write(
+                f"{label:<26} {result['requests']:>8} {result['errors']:>6} {result['rps']:>7.1f} "
+                f"{result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f}"
+            )
+
+    def compare(self, run, path, tolerance):
+        try:
+            with open(path) as handle:
+                baseline = json.load(handle)
+        except FileNotFoundError:
+            raise CommandError(f"No baseline at {path}; create one with --save-baseline.")
+        changed = {
+            name: (value, run["options"][name])
+            for name, value in baseline.get("options", {}).items()
+            if name != "duration" and run["options"].get(name) != value
+        }
+        if changed:
+            self.stdout.write(self.style.WARNING(
+                "Baseline was recorded with different settings: "
+                + ", ".join(f"{name} {before} -> {after}" for name, (before, after) in changed.items())
+            ))
+        regressions = []
+        if run["throughput"] < baseline["throughput"] * (1 - tolerance):
+            regressions.append(f"throughput {run['throughput']} req/s (baseline {baseline['throughput']})")
+        for label, result in run["pages"].items():
+            before = baseline["pages"].get(label)
+            if before and result["p95"] > before["p95"] * (1 + tolerance):
+                regressions.append(f"{label} p95 {result['p95']} ms (baseline {before['p95']} ms)")
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+            raise CommandError(f"{len(regressions)} regression(s) against {path}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path} (tolerance {tolerance:.0%})."))
@@ -0,0 +1,25 @@
+"""
+Management command to recreate the full-text search documents of every hotel
+and room.
+Run: python manage.py rebuild_search_index
+
+The index is updated automatically when hotels, rooms or amenities are saved;
+run this after loading fixtures or writing rooms with raw SQL or queryset
+updates, which skip those signals.
+"""
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rooms import fulltext
+
+
+class Command(BaseCommand):
+    help = "Recreate the full-text search index for all hotels and rooms"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            hotels, rooms = fulltext.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Indexed {hotels} hotels and {rooms} rooms in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,129 @@
+"""
+Management command that primes the cache with the pages hit first after a
+deploy or cache flush (see rooms.warmup).
+Run: python manage.py warm_cache [--weekends 8] [--holiday 2026-12-24 ...]
+     [--workers 4] [--host www.example.com] [--interval SECONDS]
+
+Covers the home page, every hotel list page (all hotel cards) and dated room
+searches, in all categories and in each one, for the next --weekends
+Friday-to-Sunday stays, stays from each holiday (--holiday and
+settings.WARMUP_HOLIDAYS) and from the start of each price-raising season in
+the next --peak-season-days. With --interval it repeats on that schedule
+(e.g. as a worker process); keep the interval below AVAILABILITY_CACHE_TIMEOUT
+so that date searches stay warm. Run it from cron or a release phase for a
+single pass instead.
+"""
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from config.metrics import RollingSummary
+from rooms import cache as listing_cache, warmup
+
+MAX_ERRORS_SHOWN = 10
+
+
+class Command(BaseCommand):
+    help = "Precompute and cache the home page, hotel list and popular date searches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--weekends", type=int, default=8, help="Upcoming weekends to warm searches for.")
+        parser.add_argument(
+            "--holiday",
+            action="append",
+            default=[],
+            dest="holidays",
+            help="Holiday (YYYY-MM-DD) to warm stays from; can be repeated. Adds to settings.WARMUP_HOLIDAYS.",
+        )
+        parser.add_argument(
+            "--holiday-nights", type=int, default=2, help="Nights of each holiday and peak season stay."
+        )
+        parser.add_argument(
+            "--peak-season-days",
+            type=int,
+            default=90,
+            help="Warm stays from the start of price-raising seasons beginning within this many days (0: none).",
+        )
+        parser.add_argument("--max-hotel-pages", type=int, help="Hotel list pages to warm (default: all).")
+        parser.add_argument("--workers", type=int, default=4, help="Pages requested in parallel.")
+        parser.add_argument(
+            "--host", help="Host to request pages for (default: the first entry of settings.ALLOWED_HOSTS)."
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Repeat every this many seconds until interrupted (default: run once).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            holidays = warmup.parse_holidays([*settings.WARMUP_HOLIDAYS, *options["holidays"]])
+        except ValueError:
+            raise CommandError("Holidays must be in YYYY-MM-DD format.")
+        if options["workers"] < 1 or options["holiday_nights"] < 1:
+            raise CommandError("--workers and --holiday-nights must be at least 1.")
+        if not listing_cache.is_shared():
+            self.stderr.write(self.style.WARNING(
+                "The cache is local to this process: set CACHE_URL to the web workers' cache, "
+                "or this warm-up only measures the pages."
+            ))
+        while True:
+            started = time.monotonic()
+            failed = self.run(holidays, options)
+            if not options["interval"]:
+                break
+            try:
+                time.sleep(max(0, options["interval"] - (time.monotonic() - started)))
+            except KeyboardInterrupt:
+                return
+        if failed:
+            raise CommandError(f"{failed} page(s) could not be warmed.")
+
+    def run(self, holidays, options):
+        """One warm-up pass with its report; returns the number of failed pages."""
+        today = date.today()
+        stay_groups = [
+            ("weekends", warmup.weekend_stays(options["weekends"], today)),
+            ("holidays", warmup.holiday_stays(holidays, options["holiday_nights"], today)),
+            ("peak seasons", warmup.peak_season_stays(
+                today + timedelta(days=options["peak_season_days"]), options["holiday_nights"], today
+            ) if options["peak_season_days"] > 0 else []),
+        ]
+        pages, hotels_shown, hotels = warmup.hotel_list_pages(options["max_hotel_pages"])
+        targets = warmup.targets(stay_groups, pages)
+
+        started = time.perf_counter()
+        results = warmup.warm(targets, options["workers"], options["host"])
+        elapsed = time.perf_counter() - started
+
+        groups = {}
+        for result in results:
+            groups.setdefault(result.target.group, []).append(result)
+        failures = [result for result in results if result.error]
+        self.stdout.write(
+            f"Warmed {len(results) - len(failures)}/{len(results)} pages in {elapsed:.1f}s "
+            f"with {options['workers']} worker(s) for {options['host'] or warmup.default_host()}."
+        )
+        self.stdout.write(f"{'group':<14}{'pages':>9}{'p50 ms':>9}{'max ms':>9}")
+        for group, group_results in groups.items():
+            latency = RollingSummary(window=len(group_results))
+            for result in group_results:
+                latency.add(result.ms)
+            ok = sum(1 for result in group_results if not result.error)
+            self.stdout.write(
+                f"{group:<14}{f'{ok}/{len(group_results)}':>9}{latency.quantile(0.5):>9.0f}"
+                f"{max(latency.samples):>9.0f}"
+            )
+        stays = sum(len(group_stays) for _, group_stays in stay_groups)
+        searches = len(targets) - 1 - pages  # all but the home and hotel list pages
+        self.stdout.write(
+            f"Coverage: hotel cards of {hotels_shown}/{hotels} active hotels; "
+            f"{searches} date searches over {stays} stays "
+            f"({', '.join(f'{len(group_stays)} {group}' for group, group_stays in stay_groups)})."
+        )
+        for result in failures[:MAX_ERRORS_SHOWN]:
+            self.stdout.write(self.style.ERROR(f"FAIL {result.target}: {result.error}"))
+        if len(failures) > MAX_ERRORS_SHOWN:
+            self.stdout.write(self.style.ERROR(f"... and {len(failures) - MAX_ERRORS_SHOWN} more"))
+        return len(failures)
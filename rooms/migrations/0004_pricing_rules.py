@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0003_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('season', 'Season (date range)'), ('weekend', 'Weekdays (e.g. weekend uplift)'), ('length_of_stay', 'Length of stay'), ('occupancy', 'Hotel occupancy')], max_length=20)),
+                ('adjustment', models.DecimalField(decimal_places=2, help_text='Percent change to the rate, e.g. 20 for +20% or -10 for a 10% discount.', max_digits=6)),
+                ('start_date', models.DateField(blank=True, help_text='First night the rule applies to.', null=True)),
+                ('end_date', models.DateField(blank=True, help_text='Last night the rule applies to.', null=True)),
+                ('weekdays', models.CharField(blank=True, help_text='Comma-separated nights of the week, 0 = Monday ... 6 = Sunday (e.g. 4,5 for Fri/Sat).', max_length=20)),
+                ('min_nights', models.PositiveIntegerField(blank=True, help_text='Length of stay: minimum nights.', null=True)),
+                ('min_occupancy', models.PositiveSmallIntegerField(blank=True, help_text='Occupancy: applies once this percent of the hotel is sold.', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='rooms.roomcategory')),
+                ('hotel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='rooms.hotel')),
+            ],
+            options={
+                'ordering': ['kind', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NightlyRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('factor', models.DecimalField(decimal_places=4, max_digits=8)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nightly_rates', to='rooms.roomcategory')),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nightly_rates', to='rooms.hotel')),
+            ],
+            options={
+                'ordering': ['hotel', 'category', 'date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='nightlyrate',
+            constraint=models.UniqueConstraint(fields=('hotel', 'category', 'date'), name='unique_nightly_rate'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:18
+
+from collections import Counter
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils.text import slugify
+
+MAX_BITS = 63
+
+
+def split(text):
+    names = {}
+    for name in (text or '').split(','):
+        name = name.strip()
+        if name:
+            names.setdefault(name[:50].lower(), name[:50])
+    return names
+
+
+def parse_amenities(apps, schema_editor):
+    """
+    Build the catalogue from the comma-separated text and set each room's mask;
+    one UPDATE per distinct text. The most common names get the lowest bits;
+    past the 63rd, names are dropped.
+    """
+    Amenity = apps.get_model('rooms', 'Amenity')
+    Room = apps.get_model('rooms', 'Room')
+    texts = dict(Room.objects.order_by().values('amenities').annotate(rooms=Count('id')).values_list(
+        'amenities', 'rooms'
+    ))
+    counts = Counter()
+    spelling = {}
+    for text, rooms in texts.items():
+        for key, name in split(text).items():
+            counts[key] += rooms
+            spelling.setdefault(key, name)
+    bits = {}
+    slugs = set()
+    for bit, (key, _) in enumerate(sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:MAX_BITS]):
+        slug = slugify(spelling[key])[:40] or 'amenity'
+        if slug in slugs:
+            slug = f'{slug}-{bit}'
+        slugs.add(slug)
+        Amenity.objects.create(name=spelling[key], slug=slug, bit=bit)
+        bits[key] = bit
+    for text in texts:
+        mask = sum(1 << bits[key] for key in split(text) if key in bits)
+        if mask:
+            Room.objects.filter(amenities=text).update(amenity_mask=mask)
+
+
+def unparse_amenities(apps, schema_editor):
+    Amenity = apps.get_model('rooms', 'Amenity')
+    Room = apps.get_model('rooms', 'Room')
+    catalogue = list(Amenity.objects.order_by('bit'))
+    for mask in Room.objects.order_by().values_list('amenity_mask', flat=True).distinct():
+        text = ', '.join(amenity.name for amenity in catalogue if mask >> amenity.bit & 1)
+        Room.objects.filter(amenity_mask=mask).update(amenities=text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0004_pricing_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Amenity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('slug', models.SlugField(unique=True)),
+                ('bit', models.PositiveSmallIntegerField(editable=False, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Amenities',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='room',
+            name='room_available_listing_idx',
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='amenity_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(parse_amenities, unparse_amenities),
+        # A default lets the column be re-added (then refilled) when migrating backwards
+        migrations.AlterField(
+            model_name='room',
+            name='amenities',
+            field=models.TextField(default='', help_text='Comma-separated: WiFi, TV, AC, Mini Bar, etc.'),
+        ),
+        migrations.RemoveField(
+            model_name='room',
+            name='amenities',
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['hotel', 'category', 'id', 'amenity_mask'], name='room_available_listing_idx'),
+        ),
+    ]
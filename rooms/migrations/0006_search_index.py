@@ -0,0 +1,77 @@
+# Full-text search index tables (see rooms.fulltext), created per database backend.
+
+from django.db import migrations
+
+SQLITE = [
+    "CREATE VIRTUAL TABLE rooms_hotel_search USING fts5("
+    "name, address, description, tokenize = 'porter unicode61')",
+    "CREATE VIRTUAL TABLE rooms_room_search USING fts5("
+    "name, amenities, description, hotel_name, hotel_address, hotel_description, tokenize = 'porter unicode61')",
+]
+POSTGRES = [
+    "CREATE TABLE rooms_hotel_search (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+    "CREATE INDEX rooms_hotel_search_document_idx ON rooms_hotel_search USING GIN (document)",
+    "CREATE TABLE rooms_room_search (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+    "CREATE INDEX rooms_room_search_document_idx ON rooms_room_search USING GIN (document)",
+]
+
+
+def _document(weights):
+    return ' || '.join(f"setweight(to_tsvector('english', %s), '{weight}')" for weight in weights)
+
+
+INSERT = {
+    'sqlite': (
+        "INSERT INTO rooms_hotel_search (rowid, name, address, description) VALUES (%s, %s, %s, %s)",
+        "INSERT INTO rooms_room_search (rowid, name, amenities, description, hotel_name, hotel_address, "
+        "hotel_description) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+    ),
+    'postgresql': (
+        f"INSERT INTO rooms_hotel_search (id, document) VALUES (%s, {_document('ABC')})",
+        f"INSERT INTO rooms_room_search (id, document) VALUES (%s, {_document('ABCABC')})",
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in INSERT:
+        return
+    for statement in SQLITE if vendor == 'sqlite' else POSTGRES:
+        schema_editor.execute(statement)
+
+    Amenity = apps.get_model('rooms', 'Amenity')
+    Hotel = apps.get_model('rooms', 'Hotel')
+    Room = apps.get_model('rooms', 'Room')
+    catalogue = list(Amenity.objects.order_by('name'))
+    hotel_sql, room_sql = INSERT[vendor]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(hotel_sql, Hotel.objects.order_by('id').values_list('id', 'name', 'address', 'description'))
+        rooms = Room.objects.order_by('id').values_list(
+            'id', 'name', 'amenity_mask', 'description', 'hotel__name', 'hotel__address', 'hotel__description'
+        )
+        batch = []
+        for room_id, name, mask, description, *hotel in rooms.iterator():
+            amenities = ' '.join(amenity.name for amenity in catalogue if mask >> amenity.bit & 1)
+            batch.append((room_id, name, amenities, description, *hotel))
+            if len(batch) >= 5000:
+                cursor.executemany(room_sql, batch)
+                batch = []
+        cursor.executemany(room_sql, batch)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in INSERT:
+        schema_editor.execute('DROP TABLE rooms_room_search')
+        schema_editor.execute('DROP TABLE rooms_hotel_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_amenities'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,6 +1,8 @@
 """
 Room and Hotel models for the booking system.
 """
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 
@@ -17,6 +19,35 @@ class RoomCategory(models.Model):
         return self.name
 
 
+class Amenity(models.Model):
+    """
+    Something a room offers (WiFi, Mini Bar, ...). Each amenity owns one bit of
+    Room.amenity_mask, so multi-amenity filters are a single bitwise test.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    slug = models.SlugField(unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True, editable=False)
+
+    # Bits 0..62: amenity_mask is a signed 64-bit column
+    MAX_BITS = 63
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'Amenities'
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used = set(Amenity.objects.values_list('bit', flat=True))
+            free = [bit for bit in range(self.MAX_BITS) if bit not in used]
+            if not free:
+                raise ValidationError(f'No more than {self.MAX_BITS} amenities can be defined.')
+            self.bit = free[0]
+        super().save(*args, **kwargs)
+
+
 class Hotel(models.Model):
     """Hotel property - can have multiple rooms."""
     name = models.CharField(max_length=200)
@@ -25,12 +56,38 @@ class Hotel(models.Model):
     email = models.EmailField(blank=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='hotels/', blank=True, null=True)
+    # Resized JPEG/WebP derivatives of image, filled in by rooms.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    # Grid cell of (latitude, longitude) for proximity search, set on save (see rooms.geo)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Proximity search: one covering range scan per run of grid cells. Not
+            # partial, as SQLite only unions OR'd ranges over unconditional indexes
+            models.Index(fields=['geo_cell', 'latitude', 'longitude', 'is_active'], name='hotel_geo_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValidationError('Give both latitude and longitude, or neither.')
+
+    def save(self, *args, **kwargs):
+        from .geo import cell
+        self.geo_cell = cell(self.latitude, self.longitude)
+        super().save(*args, **kwargs)
+
 
 class Room(models.Model):
     """Individual room belonging to a hotel and a category."""
@@ -40,30 +97,48 @@ class Room(models.Model):
     description = models.TextField()
     price_per_night = models.DecimalField(max_digits=10, decimal_places=2)
     max_guests = models.PositiveIntegerField(default=2)
-    amenities = models.TextField(
-        help_text='Comma-separated: WiFi, TV, AC, Mini Bar, etc.'
-    )
+    # Bitwise OR of 1 << Amenity.bit for the room's amenities (see rooms.amenities)
+    amenity_mask = models.BigIntegerField(default=0, editable=False)
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['hotel', 'name']
+        indexes = [
+            # Search listing: only available rooms, in (hotel, category, id) order;
+            # amenity_mask rides along so amenity filters are answered from the index
+            models.Index(
+                fields=['hotel', 'category', 'id', 'amenity_mask'],
+                condition=models.Q(is_available=True),
+                name='room_available_listing_idx',
+            ),
+            # Admin changelist / default ordering
+            models.Index(fields=['hotel', 'name'], name='room_hotel_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.hotel.name} - {self.name} ({self.category.name})"
 
     def get_amenities_list(self):
-        """Return amenities as a list for display."""
-        if not self.amenities:
-            return []
-        return [a.strip() for a in self.amenities.split(',') if a.strip()]
+        """Return amenity names as a list for display."""
+        from .amenities import names
+        return names(self.amenity_mask)
+
+    def get_primary_image(self):
+        """
+        Primary image, or the first image if none is marked primary.
+        Served from prefetched images when the queryset used prefetch_related('images').
+        """
+        return self.images.first()
 
 
 class RoomImage(models.Model):
     """Multiple images per room for gallery on detail page."""
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='rooms/')
+    # Resized JPEG/WebP derivatives of image, filled in by rooms.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
 
@@ -72,3 +147,105 @@ class RoomImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.room.name}"
+
+
+class PricingRule(models.Model):
+    """
+    A percentage adjustment to room rates. Nightly rules (season, weekend,
+    occupancy) are compiled into NightlyRate by rooms.pricing; length-of-stay
+    rules discount the whole stay when it is priced.
+    """
+    SEASON = 'season'
+    WEEKEND = 'weekend'
+    LENGTH_OF_STAY = 'length_of_stay'
+    OCCUPANCY = 'occupancy'
+    KIND_CHOICES = [
+        (SEASON, 'Season (date range)'),
+        (WEEKEND, 'Weekdays (e.g. weekend uplift)'),
+        (LENGTH_OF_STAY, 'Length of stay'),
+        (OCCUPANCY, 'Hotel occupancy'),
+    ]
+    NIGHTLY_KINDS = (SEASON, WEEKEND, OCCUPANCY)
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Scope: empty means every hotel / every category
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='pricing_rules', null=True, blank=True)
+    category = models.ForeignKey(
+        RoomCategory, on_delete=models.CASCADE, related_name='pricing_rules', null=True, blank=True
+    )
+    adjustment = models.DecimalField(
+        max_digits=6, decimal_places=2,
+        help_text='Percent change to the rate, e.g. 20 for +20% or -10 for a 10% discount.'
+    )
+    start_date = models.DateField(null=True, blank=True, help_text='First night the rule applies to.')
+    end_date = models.DateField(null=True, blank=True, help_text='Last night the rule applies to.')
+    weekdays = models.CharField(
+        max_length=20, blank=True,
+        help_text='Comma-separated nights of the week, 0 = Monday ... 6 = Sunday (e.g. 4,5 for Fri/Sat).'
+    )
+    min_nights = models.PositiveIntegerField(null=True, blank=True, help_text='Length of stay: minimum nights.')
+    min_occupancy = models.PositiveSmallIntegerField(
+        null=True, blank=True, help_text='Occupancy: applies once this percent of the hotel is sold.'
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', 'name']
+
+    def __str__(self):
+        return f"{self.name} ({self.adjustment:+}%)"
+
+    def clean(self):
+        errors = {}
+        if self.kind == self.SEASON and not (self.start_date and self.end_date):
+            errors['start_date'] = 'A season needs a start and an end date.'
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            errors['end_date'] = 'End date must not be before start date.'
+        if self.kind == self.WEEKEND and not self.weekdays:
+            errors['weekdays'] = 'Choose the nights of the week the rule applies to.'
+        if self.weekdays:
+            try:
+                self.get_weekdays()
+            except ValueError:
+                errors['weekdays'] = 'Use numbers 0 (Monday) to 6 (Sunday), separated by commas.'
+        if self.kind == self.LENGTH_OF_STAY and not self.min_nights:
+            errors['min_nights'] = 'A length-of-stay rule needs a minimum number of nights.'
+        if self.kind == self.OCCUPANCY and self.min_occupancy is None:
+            errors['min_occupancy'] = 'An occupancy rule needs an occupancy threshold.'
+        if self.min_occupancy is not None and self.min_occupancy > 100:
+            errors['min_occupancy'] = 'Occupancy is a percentage between 0 and 100.'
+        if self.adjustment is not None and self.adjustment <= -100:
+            errors['adjustment'] = 'A discount must be less than 100%.'
+        if errors:
+            raise ValidationError(errors)
+
+    def get_weekdays(self):
+        """Set of weekday numbers (Monday = 0); raises ValueError if malformed."""
+        days = {int(day) for day in self.weekdays.split(',') if day.strip()}
+        if not days <= set(range(7)):
+            raise ValueError(self.weekdays)
+        return days
+
+
+class NightlyRate(models.Model):
+    """
+    Compiled rate factor of one night for the rooms of a category in a hotel.
+    Only nights whose factor differs from 1 are stored; the nightly price of a
+    room is its price_per_night times the factor (see rooms.pricing).
+    """
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='nightly_rates')
+    category = models.ForeignKey(RoomCategory, on_delete=models.CASCADE, related_name='nightly_rates')
+    date = models.DateField()
+    factor = models.DecimalField(max_digits=8, decimal_places=4)
+
+    class Meta:
+        ordering = ['hotel', 'category', 'date']
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'category', 'date'], name='unique_nightly_rate'),
+        ]
+
+    def __str__(self):
+        return f"{self.hotel_id}/{self.category_id} @ {self.date}: x{self.factor}"
@@ -0,0 +1,307 @@
+"""
+Dynamic pricing: PricingRule rows compiled into NightlyRate factor tables.
+
+Nightly rules (season, weekend, occupancy) are evaluated once per
+(hotel, category, night) over a rolling horizon of PRICING_HORIZON_DAYS, and
+the product of the matching adjustments is stored for the nights where it is
+not 1. They are recompiled for just the hotels, categories and nights they
+cover when a rule, a room's hotel, category or availability, or (for
+occupancy rules) a hotel's sold nights change; occupancy recompiles wait for
+the sale's transaction to commit.
+Pricing a stay then needs no rule evaluation: the stay's stored nights
+are sliced out of the room's (hotel, category) table, every other night costs
+price_per_night, and the best matching length-of-stay rule discounts the
+total. Nights past the horizon cost the base rate until ``compile_rates``
+(run daily) moves it forward.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from bookings import inventory
+from bookings.models import RoomNight
+from config.bulk import insert_rows
+from .models import NightlyRate, PricingRule, Room
+from . import cache as listing_cache
+
+CENT = Decimal('0.01')
+FACTOR_PLACES = Decimal('0.0001')
+BATCH_SIZE = 5000
+RATE_COLUMNS = ('hotel_id', 'category_id', 'date', 'factor')
+
+# Version tokens (see bookings.inventory): rules change the cached rule list,
+# compiled rates change per hotel, and the "all" token covers any price change.
+RULES_VERSION_KEY = 'pricing:rules'
+PRICES_VERSION_KEY = 'pricing:all'
+
+
+def _hotel_version_key(hotel_id):
+    return f'pricing:hotel:{hotel_id}'
+
+
+def version(hotel_ids=None):
+    """Digest of the tokens cached prices depend on: some hotels' rates, or any price."""
+    if hotel_ids is None:
+        return inventory.token_digest([PRICES_VERSION_KEY])
+    return inventory.token_digest([_hotel_version_key(hotel_id) for hotel_id in sorted(hotel_ids)])
+
+
+def active_rules():
+    """Active pricing rules, cached until a rule changes."""
+    return listing_cache.get_or_set(
+        'pricing-rules',
+        (inventory.token_digest([RULES_VERSION_KEY]),),
+        lambda: list(PricingRule.objects.filter(is_active=True)),
+    )
+
+
+def horizon():
+    """[start, end) of the nights that have compiled rates."""
+    today = date.today()
+    return today, today + timedelta(days=settings.PRICING_HORIZON_DAYS)
+
+
+def _in_scope(rule, hotel_id, category_id):
+    return rule.hotel_id in (None, hotel_id) and rule.category_id in (None, category_id)
+
+
+class _NightlyTerm:
+    """A nightly rule with its date filters parsed once for compilation."""
+
+    def __init__(self, rule):
+        self.hotel_id = rule.hotel_id
+        self.category_id = rule.category_id
+        self.start_date = rule.start_date
+        self.end_date = rule.end_date
+        self.weekdays = rule.get_weekdays() if rule.weekdays else None
+        self.min_occupancy = rule.min_occupancy if rule.kind == PricingRule.OCCUPANCY else None
+        self.multiplier = 1 + rule.adjustment / 100
+
+    def covers(self, day, occupancy):
+        if self.start_date and day < self.start_date:
+            return False
+        if self.end_date and day > self.end_date:
+            return False
+        if self.weekdays is not None and day.weekday() not in self.weekdays:
+            return False
+        return self.min_occupancy is None or occupancy >= self.min_occupancy
+
+
+def occupancy(hotel_ids, start, end):
+    """{(hotel_id, night): percent of the hotel's bookable rooms sold} for nights with sales."""
+    rooms = dict(
+        Room.objects.filter(hotel_id__in=hotel_ids, is_available=True).order_by().values('hotel_id').annotate(
+            count=Count('id')
+        ).values_list('hotel_id', 'count')
+    )
+    sold = RoomNight.objects.filter(
+        room__hotel_id__in=hotel_ids, date__gte=start, date__lt=end
+    ).order_by().values('room__hotel_id', 'date').annotate(count=Count('id')).values_list(
+        'room__hotel_id', 'date', 'count'
+    )
+    return {(hotel_id, day): 100 * count / rooms[hotel_id] for hotel_id, day, count in sold if rooms.get(hotel_id)}
+
+
+def compile_rates(hotel_ids=None, category_ids=None, start=None, end=None):
+    """
+    Recompile the stored factors of the nights in [start, end) (clipped to the
+    horizon) for every (hotel, category) that has rooms, optionally limited to
+    some hotels and categories. Returns the number of nights stored.
+    """
+    first, last = horizon()
+    start, end = max(start or first, first), min(end or last, last)
+    if start >= end:
+        return 0
+    rooms = Room.objects.order_by()
+    stale = NightlyRate.objects.filter(date__gte=start, date__lt=end)
+    if hotel_ids is not None:
+        rooms, stale = rooms.filter(hotel_id__in=hotel_ids), stale.filter(hotel_id__in=hotel_ids)
+    if category_ids is not None:
+        rooms, stale = rooms.filter(category_id__in=category_ids), stale.filter(category_id__in=category_ids)
+    pairs = sorted(set(rooms.values_list('hotel_id', 'category_id')))
+    terms = [
+        _NightlyTerm(rule)
+        for rule in PricingRule.objects.filter(is_active=True, kind__in=PricingRule.NIGHTLY_KINDS)
+    ]
+    hotels = sorted({hotel_id for hotel_id, _ in pairs} | set(hotel_ids or ()))
+    sold = {}
+    if any(term.min_occupancy is not None for term in terms):
+        sold = occupancy(hotels, start, end)
+    days = list(inventory.stay_dates(start, end))
+
+    # Pairs matched by the same rules share one factor series (per hotel only
+    # when occupancy rules are among them)
+    series = {}
+    stored = 0
+    with transaction.atomic():
+        stale.delete()
+        rows = []
+        for hotel_id, category_id in pairs:
+            matching = tuple(term for term in terms if _in_scope(term, hotel_id, category_id))
+            if not matching:
+                continue
+            key = (matching, hotel_id if any(term.min_occupancy is not None for term in matching) else None)
+            if key not in series:
+                series[key] = _factor_series(matching, days, hotel_id, sold)
+            rows.extend((hotel_id, category_id, day, factor) for day, factor in series[key])
+            if len(rows) >= BATCH_SIZE:
+                stored += insert_rows(NightlyRate, RATE_COLUMNS, rows)
+                rows = []
+        stored += insert_rows(NightlyRate, RATE_COLUMNS, rows)
+        inventory.replace_tokens([PRICES_VERSION_KEY, *(_hotel_version_key(hotel_id) for hotel_id in hotels)])
+    return stored
+
+
+def _factor_series(terms, days, hotel_id, sold):
+    """(night, factor) for the nights whose combined factor is not 1, adapted for insert_rows."""
+    ops = connection.ops
+    series = []
+    for day in days:
+        factor = Decimal(1)
+        for term in terms:
+            if term.covers(day, sold.get((hotel_id, day), 0)):
+                factor *= term.multiplier
+        factor = factor.quantize(FACTOR_PLACES)
+        if factor != 1:
+            series.append((ops.adapt_datefield_value(day), ops.adapt_decimalfield_value(factor, 8, 4)))
+    return series
+
+
+def rule_changed(rule, previous=None):
+    """Recompile what a saved or deleted rule covers, and what its previous version covered."""
+    inventory.replace_tokens([RULES_VERSION_KEY, PRICES_VERSION_KEY])
+    for snapshot in (previous, rule):
+        if snapshot is None or snapshot.kind not in PricingRule.NIGHTLY_KINDS:
+            continue
+        compile_rates(
+            hotel_ids=None if snapshot.hotel_id is None else [snapshot.hotel_id],
+            category_ids=None if snapshot.category_id is None else [snapshot.category_id],
+            start=snapshot.start_date,
+            end=snapshot.end_date + timedelta(days=1) if snapshot.end_date else None,
+        )
+
+
+def room_changed(before, after):
+    """
+    Recompile the rates a room change affects. ``before`` and ``after`` are the
+    room's (hotel_id, category_id, is_available), None before it was added or
+    after it was removed. A room joining or leaving a (hotel, category) adds or
+    drops that pair's rates; a change in a hotel's bookable rooms moves its
+    occupancy, so with occupancy rules every category of the hotel is
+    recompiled. Other edits (name, description, price, images) recompile nothing.
+    """
+    rules = active_rules()
+    if before == after or not any(rule.kind in PricingRule.NIGHTLY_KINDS for rule in rules):
+        return
+    pairs = set()
+    if before is None or after is None or before[:2] != after[:2]:
+        pairs = {placement[:2] for placement in (before, after) if placement is not None}
+    recount = set()
+    if any(rule.kind == PricingRule.OCCUPANCY for rule in rules):
+        recount = _bookable_hotel(before) ^ _bookable_hotel(after)
+    if recount:
+        compile_rates(hotel_ids=sorted(recount))
+    for hotel_id, category_id in sorted(pairs):
+        if hotel_id not in recount:
+            compile_rates(hotel_ids=[hotel_id], category_ids=[category_id])
+
+
+def _bookable_hotel(placement):
+    return {placement[0]} if placement is not None and placement[2] else set()
+
+
+def _recompile_on_commit(hotel_ids, start, end):
+    """
+    Recompile [start, end) for some hotels once the current transaction
+    commits (at once outside one), so the rewrite of a hotel's rates never
+    runs under a booking's room lock and serializes the hotel's bookings.
+    """
+    def recompile():
+        try:
+            compile_rates(hotel_ids=hotel_ids, start=start, end=end)
+        except IntegrityError:  # a concurrent recompile of the same nights committed first
+            compile_rates(hotel_ids=hotel_ids, start=start, end=end)
+
+    transaction.on_commit(recompile, robust=True)
+
+
+def occupancy_changed(room_id, check_in, check_out):
+    """Recompile, after commit, the nights of a stay whose sale or release moved the hotel's occupancy."""
+    if not any(rule.kind == PricingRule.OCCUPANCY for rule in active_rules()):
+        return
+    hotel_id = Room.objects.filter(pk=room_id).values_list('hotel_id', flat=True).first()
+    if hotel_id is not None:
+        _recompile_on_commit([hotel_id], check_in, check_out)
+
+
+def sales_changed(hotel_ids, start, end):
+    """Recompile, after commit, [start, end) for hotels whose occupancy moved with a bulk sale or release."""
+    if hotel_ids and any(rule.kind == PricingRule.OCCUPANCY for rule in active_rules()):
+        _recompile_on_commit(sorted(hotel_ids), start, end)
+
+
+def rate_rows(pairs, start, end):
+    """(hotel_id, category_id, date, factor) stored for some (hotel, category) pairs in [start, end)."""
+    return NightlyRate.objects.filter(
+        hotel_id__in={hotel_id for hotel_id, _ in pairs},
+        category_id__in={category_id for _, category_id in pairs},
+        date__gte=start,
+        date__lt=end,
+    ).order_by('hotel_id', 'category_id', 'date').values_list('hotel_id', 'category_id', 'date', 'factor')
+
+
+class RateTable:
+    """
+    The compiled rates of some rooms over [start, end), loaded with one query
+    (none while no nightly rule is active), for pricing any number of their
+    stays and nights inside that window.
+    """
+
+    def __init__(self, rooms, start, end):
+        rules = active_rules()
+        self.discounts = sorted(
+            (rule for rule in rules if rule.kind == PricingRule.LENGTH_OF_STAY),
+            key=lambda rule: (-rule.min_nights, rule.adjustment),
+        )
+        self.nights = defaultdict(list)
+        pairs = {(room.hotel_id, room.category_id) for room in rooms}
+        if pairs and start < end and any(rule.kind in PricingRule.NIGHTLY_KINDS for rule in rules):
+            for hotel_id, category_id, day, factor in rate_rows(pairs, start, end):
+                if (hotel_id, category_id) in pairs:
+                    self.nights[hotel_id, category_id].append((day, factor))
+
+    def _factors(self, room, start, end):
+        """Sorted (night, factor) of the room's stored nights in [start, end)."""
+        nights = self.nights.get((room.hotel_id, room.category_id), ())
+        return nights[bisect_left(nights, (start,)):bisect_left(nights, (end,))]
+
+    def nightly_prices(self, room, start, end):
+        """Price of each night of [start, end) for the room."""
+        factors = dict(self._factors(room, start, end))
+        base = room.price_per_night
+        return [
+            (base * factors[day]).quantize(CENT) if day in factors else base
+            for day in inventory.stay_dates(start, end)
+        ]
+
+    def stay_price(self, room, check_in, check_out):
+        """
+        Total price of a stay: the sum of its nightly prices, adjusted by the
+        length-of-stay rule with the highest minimum the stay reaches.
+        """
+        nights = (check_out - check_in).days
+        factors = self._factors(room, check_in, check_out)
+        base = room.price_per_night
+        total = base * (nights - len(factors)) + sum(((base * factor).quantize(CENT) for _, factor in factors), 0)
+        for rule in self.discounts:
+            if (
+                rule.min_nights <= nights and _in_scope(rule, room.hotel_id, room.category_id)
+                and (rule.start_date is None or check_in >= rule.start_date)
+                and (rule.end_date is None or check_in <= rule.end_date)
+            ):
+                total = (total * (1 + rule.adjustment / 100)).quantize(CENT)
+                break
+        return total
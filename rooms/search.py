@@ -0,0 +1,217 @@
+"""
+Room availability search shared by the HTML listing and other callers.
+"""
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_right
+from django.conf import settings
+from django.db.models import Q
+from bookings import inventory
+from bookings.inventory import booked_room_ids
+from .models import Hotel, Room
+from . import amenities
+from . import cache as listing_cache
+from . import fulltext, geo, pricing
+
+
+def available_rooms(check_in=None, check_out=None, category_slug=None, amenity_mask=0):
+    """
+    Available rooms ordered by (hotel, category, id), optionally restricted to a
+    category, to rooms with every amenity in ``amenity_mask`` and to rooms with
+    no sold night in [check_in, check_out).
+    """
+    rooms = Room.objects.filter(is_available=True).select_related('hotel', 'category').prefetch_related(
+        'images'
+    ).order_by('hotel', 'category', 'id')
+    if category_slug:
+        rooms = rooms.filter(category__slug=category_slug)
+    rooms = amenities.filter_rooms(rooms, amenity_mask)
+    if check_in and check_out:
+        rooms = rooms.exclude(id__in=booked_room_ids(check_in, check_out))
+    return rooms
+
+
+ROOMS_PER_PAGE = 24
+
+
+def encode_cursor(room):
+    """Opaque keyset cursor for the (hotel, category, id) position of a room."""
+    return _encode_position(room.hotel_id, room.category_id, room.pk)
+
+
+def _encode_position(*key):
+    raw = '.'.join(str(part) for part in key)
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, parts=3):
+    """
+    Inverse of encode_cursor: (hotel_id, category_id, room_id), or the
+    ``parts`` integers of a ranked search cursor. Raises ValueError for
+    malformed cursors.
+    """
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        key = tuple(int(part) for part in raw.split('.'))
+    except (TypeError, ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if len(key) != parts:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return key
+
+
+def paginate_rooms(rooms, cursor=None, page_size=ROOMS_PER_PAGE):
+    """
+    Keyset page of ``rooms`` (which must be ordered by hotel, category, id)
+    starting after ``cursor``. Returns (rooms_on_page, next_cursor_or_None);
+    every page costs one index range scan, however deep it is.
+    """
+    if cursor:
+        hotel_id, category_id, room_id = decode_cursor(cursor)
+        rooms = rooms.filter(
+            Q(hotel_id__gt=hotel_id)
+            | Q(hotel_id=hotel_id, category_id__gt=category_id)
+            | Q(hotel_id=hotel_id, category_id=category_id, id__gt=room_id)
+        )
+    page = list(rooms[:page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1])
+    return page, None
+
+
+def available_room_positions(check_in, check_out, category_slug=None, amenity_mask=0):
+    """
+    Sorted (hotel_id, category_id, id) of rooms available for the dates, cached
+    per normalized search. The key embeds availability_version(), so a booking
+    change on any covered night of a covered category makes it miss.
+    """
+    categories = listing_cache.categories()
+    if category_slug:
+        categories = [category for category in categories if category.slug == category_slug]
+        if not categories:
+            return []
+    version = inventory.availability_version(check_in, check_out, [category.pk for category in categories])
+    return listing_cache.get_or_set(
+        'availability',
+        (check_in.isoformat(), check_out.isoformat(), category_slug or '*', amenity_mask, version),
+        lambda: list(
+            available_rooms(check_in, check_out, category_slug, amenity_mask).prefetch_related(None).values_list(
+                'hotel_id', 'category_id', 'id'
+            )
+        ),
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+    )
+
+
+# Text matches narrowed per query: with an IN list covering much of the rooms
+# table, SQLite scans it instead of looking the matches up by primary key
+CANDIDATE_BATCH = 100
+
+
+def text_candidates(rooms, room_ids):
+    """``rooms`` restricted to ``room_ids``, as querysets of at most CANDIDATE_BATCH primary key lookups."""
+    return [
+        rooms.filter(id__in=room_ids[start:start + CANDIDATE_BATCH])
+        for start in range(0, len(room_ids), CANDIDATE_BATCH)
+    ]
+
+
+# Ranked positions: (hotel rank, text rank, hotel_id, category_id, id)
+RANKED_KEY_PARTS = 5
+
+
+def ranked_positions(check_in=None, check_out=None, category_slug=None, amenity_mask=0, query=None, area=None):
+    """
+    Sorted (hotel rank, text rank, hotel_id, category_id, id) of the available
+    rooms matching a text query and/or in a rooms.geo.Area, nearest hotel
+    first, then best text match; ranks are 0 without an area or a query.
+    Candidates (the ranked full-text matches, the hotels found in the area's
+    grid cells) are narrowed by the other filters in one query per
+    CANDIDATE_BATCH text matches, looked up by primary key. Cached per
+    normalized search under the search index version, which every hotel and
+    room save replaces, and, for dates, availability_version().
+    """
+    version = fulltext.version()
+    if check_in and check_out:
+        categories = listing_cache.categories()
+        if category_slug:
+            categories = [category for category in categories if category.slug == category_slug]
+        version += inventory.availability_version(check_in, check_out, [category.pk for category in categories])
+
+    def compute():
+        rooms = available_rooms(check_in, check_out, category_slug, amenity_mask).prefetch_related(None).order_by()
+        text_rank = {}
+        if query:
+            text_rank = {room_id: rank for rank, room_id in enumerate(fulltext.match_rooms(query))}
+        hotel_rank = {}
+        if area:
+            hotels = geo.nearby(Hotel.objects.only('id', 'latitude', 'longitude'), area)
+            hotel_rank = {hotel.pk: rank for rank, hotel in enumerate(hotels)}
+            rooms = rooms.filter(hotel_id__in=hotel_rank)
+        if (query and not text_rank) or (area and not hotel_rank):
+            return []
+        candidates = text_candidates(rooms, list(text_rank)) if query else [rooms]
+        return sorted(
+            (hotel_rank.get(hotel_id, 0), text_rank.get(room_id, 0), hotel_id, category_id, room_id)
+            for batch in candidates
+            for hotel_id, category_id, room_id in batch.values_list('hotel_id', 'category_id', 'id')
+        )
+
+    return listing_cache.get_or_set(
+        'ranked-positions',
+        (
+            fulltext.query_key(query) if query else '*', area.cache_key() if area else '*', check_in or '*',
+            check_out or '*', category_slug or '*', amenity_mask, version,
+        ),
+        compute,
+        timeout=settings.AVAILABILITY_CACHE_TIMEOUT,
+    )
+
+
+def search_rooms(check_in=None, check_out=None, category_slug=None, cursor=None, page_size=ROOMS_PER_PAGE,
+                 images=True, amenity_mask=0, query=None, area=None):
+    """
+    One page of search results as (rooms, next_cursor). Date, text and area
+    searches page through the cached result positions and load only the rooms
+    on the page (with ``stay_price`` set to each room's price when dates are
+    given); plain listings keyset-paginate the database directly. A text
+    ``query`` orders results by relevance instead of by hotel, and an ``area``
+    (rooms.geo.Area) by distance, setting each room's ``distance_km``. ``amenity_mask`` keeps
+    rooms with all of its amenities (see rooms.amenities). Pass images=False
+    when the caller does not render room images.
+    Raises ValueError for a malformed cursor.
+    """
+    if query or area:
+        positions = ranked_positions(check_in, check_out, category_slug, amenity_mask, query, area)
+        # Ranked cursors carry the sort key, so a page resumes after the cursor's
+        # room even when that room has since left the results
+        start = bisect_right(positions, decode_cursor(cursor, RANKED_KEY_PARTS)) if cursor else 0
+    elif check_in and check_out:
+        positions = available_room_positions(check_in, check_out, category_slug, amenity_mask)
+        start = bisect_right(positions, decode_cursor(cursor)) if cursor else 0
+    else:
+        rooms = available_rooms(category_slug=category_slug, amenity_mask=amenity_mask)
+        if not images:
+            rooms = rooms.prefetch_related(None)
+        return paginate_rooms(rooms, cursor, page_size)
+
+    page_positions = positions[start:start + page_size]
+    # Positions end with the room id
+    rooms = available_rooms().filter(id__in=[position[-1] for position in page_positions])
+    if not images:
+        rooms = rooms.prefetch_related(None)
+    rooms = {room.pk: room for room in rooms}
+    # A room made unavailable since caching drops out of its page
+    page = [rooms[position[-1]] for position in page_positions if position[-1] in rooms]
+    if check_in and check_out:
+        rates = pricing.RateTable(page, check_in, check_out)
+        for room in page:
+            room.stay_price = rates.stay_price(room, check_in, check_out)
+    if area:
+        for room in page:
+            room.distance_km = geo.distance_km(area.latitude, area.longitude, room.hotel.latitude, room.hotel.longitude)
+    next_cursor = None
+    if start + page_size < len(positions):
+        next_cursor = _encode_position(*page_positions[-1])
+    return page, next_cursor
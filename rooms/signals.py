@@ -0,0 +1,126 @@
+"""
+Signal handlers that drop cached listing data when hotels, rooms, room images,
+categories or amenities change, keep the full-text search index in step with
+them, and recompile nightly rates when pricing rules or rooms do.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Amenity, Hotel, PricingRule, Room, RoomCategory, RoomImage
+from . import cache as listing_cache
+from . import fulltext, images, pricing
+
+
+@receiver([post_save, post_delete], sender=RoomCategory)
+def category_changed(sender, instance, **kwargs):
+    listing_cache.invalidate_category(instance)
+
+
+@receiver(post_save, sender=Amenity)
+def amenity_saved(sender, instance, raw=False, **kwargs):
+    listing_cache.invalidate_amenities()
+    if not raw:
+        # A renamed amenity changes the search documents of the rooms that have it
+        bit = 1 << instance.bit
+        fulltext.index_rooms(
+            Room.objects.alias(has=F('amenity_mask').bitand(bit)).filter(has=bit).values_list('id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Amenity)
+def amenity_deleted(sender, instance, **kwargs):
+    """Clear the amenity's bit from every room, so a later amenity can reuse it."""
+    bit = 1 << instance.bit
+    rooms = Room.objects.alias(has=F('amenity_mask').bitand(bit)).filter(has=bit)
+    affected = list(rooms.values_list('id', 'hotel_id'))
+    rooms.update(amenity_mask=F('amenity_mask').bitand(~bit))
+    listing_cache.invalidate_amenities(affected)
+    fulltext.index_rooms([room_id for room_id, _ in affected])
+
+
+@receiver([post_save, post_delete], sender=Hotel)
+def hotel_changed(sender, instance, **kwargs):
+    listing_cache.invalidate_hotel(instance)
+
+
+# What a room's rates and cached listings depend on: (hotel_id, category_id, is_available)
+PLACEMENT_FIELDS = ('hotel_id', 'category_id', 'is_available')
+
+
+@receiver(pre_save, sender=Room)
+def remember_room_placement(sender, instance, **kwargs):
+    """Keep the room's hotel, category and availability before the save, in case they change."""
+    instance._previous_placement = None
+    if instance.pk:
+        instance._previous_placement = Room.objects.filter(pk=instance.pk).values_list(*PLACEMENT_FIELDS).first()
+
+
+@receiver([post_save, post_delete], sender=Room)
+def room_changed(sender, instance, signal, raw=False, **kwargs):
+    placement = tuple(getattr(instance, field) for field in PLACEMENT_FIELDS)
+    if signal is post_delete:
+        before, after = placement, None
+    else:
+        before, after = getattr(instance, '_previous_placement', None), placement
+    hotel_ids = {placement[0] for placement in (before, after) if placement is not None}
+    listing_cache.invalidate_room(instance.pk, hotel_ids)
+    if not raw:
+        pricing.room_changed(before, after)
+
+
+@receiver(pre_save, sender=PricingRule)
+def remember_pricing_rule(sender, instance, **kwargs):
+    """Keep the rule as it was before the save, so the nights it used to cover are recompiled."""
+    instance._previous = PricingRule.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+@receiver([post_save, post_delete], sender=PricingRule)
+def pricing_rule_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pricing.rule_changed(instance, getattr(instance, '_previous', None))
+
+
+@receiver([post_save, post_delete], sender=RoomImage)
+def room_image_changed(sender, instance, **kwargs):
+    hotel_id = Room.objects.filter(pk=instance.room_id).values_list('hotel_id', flat=True).first()
+    listing_cache.invalidate_room(instance.room_id, {hotel_id} - {None})
+
+
+@receiver(post_save, sender=Hotel)
+def index_hotel(sender, instance, raw=False, **kwargs):
+    """Rewrite the hotel's search document and its rooms' (which include the hotel's text)."""
+    if not raw:
+        fulltext.index_hotels([instance.pk])
+
+
+@receiver(post_delete, sender=Hotel)
+def unindex_hotel(sender, instance, **kwargs):
+    fulltext.remove_hotels([instance.pk])
+
+
+@receiver(post_save, sender=Room)
+def index_room(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fulltext.index_rooms([instance.pk])
+
+
+@receiver(post_delete, sender=Room)
+def unindex_room(sender, instance, **kwargs):
+    fulltext.remove_rooms([instance.pk])
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_save, sender=RoomImage)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    """Generate resized/WebP variants of a new or replaced image in the background."""
+    if not raw and images.needs_variants(instance):
+        images.schedule(instance)
+
+
+@receiver(post_delete, sender=Hotel)
+@receiver(post_delete, sender=RoomImage)
+def delete_image_variants(sender, instance, **kwargs):
+    variants = instance.image_variants
+    if variants:
+        transaction.on_commit(lambda: images.delete_variants(variants))
@@ -0,0 +1,306 @@
+"""
+Synthetic dataset generator for load, capacity and query-plan testing.
+
+Creates hotels, rooms, room images, users and bookings with batched bulk
+inserts. Bookings are laid out room by room on a timeline weighted by season
+and weekday, so confirmed stays never overlap and busy months are busier than
+quiet ones. Images reference a handful of shared placeholder files whose
+variants are generated once.
+
+The high-volume tables (bookings, their RoomNight rows, room images) are
+written with executemany on prepared tuples rather than bulk_create, which
+spends most of its time building and preparing model instances. Booking ids
+are allocated up front so room nights can reference them, so nothing else
+should write bookings while the generator runs. No signals fire: inventory
+rows, the outbox rows of confirmed bookings (their confirmation and
+reminder emails, see bookings.outbox) and the users' booking summaries are
+written here and cached searches are bumped at the end. Reminders still to
+come are written as skipped, so a send_notifications worker never mails the
+synthetic guests, unless ``queue_reminders`` asks for a realistic outbox.
+"""
+import json
+import random
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO
+from itertools import accumulate
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from bookings import inventory, outbox, summary
+from bookings.models import Booking, Notification, RoomNight
+from config.bulk import insert_rows
+from .management.commands.create_sample_data import CATEGORY_ROOM_CONFIG, ROOM_DESCRIPTION
+from .models import Hotel, Room, RoomImage
+from . import amenities, fulltext, geo
+from . import images as image_variants
+from . import pricing
+
+EMAIL_DOMAIN = 'synthetic.example'
+HOTEL_PREFIXES = ['Grand', 'Royal', 'Harbor', 'Park', 'Garden', 'Summit', 'Lakeside', 'Old Town', 'Central', 'Bay']
+HOTEL_SUFFIXES = ['Hotel', 'Inn', 'Suites', 'Lodge', 'Resort', 'House', 'Residence', 'Palace']
+# City centres (latitude, longitude); hotels are scattered within about 15 km
+CITIES = {
+    'Lisbon': (38.7223, -9.1393), 'Porto': (41.1579, -8.6291), 'Madrid': (40.4168, -3.7038),
+    'Seville': (37.3891, -5.9845), 'Rome': (41.9028, 12.4964), 'Florence': (43.7696, 11.2558),
+    'Vienna': (48.2082, 16.3738), 'Prague': (50.0755, 14.4378), 'Berlin': (52.5200, 13.4050),
+    'Paris': (48.8566, 2.3522),
+}
+CITY_SPREAD_DEGREES = 0.12
+DEFAULT_ROOM_CONFIG = (Decimal('60.00'), Decimal('300.00'), 4)
+
+# Relative demand by month (Jan..Dec) and by check-in weekday (Mon..Sun)
+MONTH_DEMAND = [0.55, 0.6, 0.75, 0.9, 1.0, 1.25, 1.5, 1.55, 1.1, 0.85, 0.65, 1.1]
+WEEKDAY_DEMAND = [0.8, 0.75, 0.8, 0.95, 1.4, 1.35, 0.95]
+# Stay length in nights and how often it occurs
+STAY_NIGHTS = [1, 2, 3, 4, 5, 6, 7, 10, 14]
+STAY_WEIGHTS = [24, 28, 18, 10, 7, 4, 5, 2, 2]
+# Share of rooms that have each amenity
+AMENITY_ODDS = {
+    'WiFi': 0.97, 'TV': 0.9, 'AC': 0.75, 'Safe': 0.5, 'Mini Bar': 0.4, 'Coffee Maker': 0.35,
+    'Bathtub': 0.25, 'Balcony': 0.2, 'Sea View': 0.1, 'Kitchenette': 0.08,
+}
+PAST_STATUSES = ['confirmed'] * 88 + ['cancelled'] * 12
+# Every booking was placed as a hold; 'expired' ones are abandoned checkouts
+# and 'pending' ones checkouts in progress (or abandoned, waiting to be swept)
+FUTURE_STATUSES = ['confirmed'] * 70 + ['pending'] * 2 + ['expired'] * 13 + ['cancelled'] * 15
+PLACEHOLDER_COLORS = ['#8fb8de', '#d9a679', '#9cc5a1', '#c9a3c9', '#e0c068', '#a3a8b5', '#d98b8b', '#7fb3b0']
+
+
+def scatter(rng, latitude, longitude):
+    """A random point within about CITY_SPREAD_DEGREES of a city centre."""
+    return (
+        round(latitude + rng.uniform(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES), 6),
+        round(longitude + rng.uniform(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES), 6),
+    )
+
+
+def demand_weights(start, end):
+    """Cumulative check-in weights for every day in [start, end)."""
+    days = (end - start).days
+    return list(accumulate(
+        MONTH_DEMAND[day.month - 1] * WEEKDAY_DEMAND[day.weekday()]
+        for day in (start + timedelta(days=offset) for offset in range(days))
+    ))
+
+
+def room_stays(rng, count, start, end, cum_weights):
+    """
+    Up to ``count`` non-overlapping (check_in, check_out) stays in [start, end).
+    Check-ins are sampled by demand; a sample that lands inside the previous
+    stay moves to its check-out day, and stays running past ``end`` are dropped.
+    """
+    if count <= 0:
+        return []
+    total = cum_weights[-1]
+    offsets = sorted(bisect_left(cum_weights, rng.random() * total) for _ in range(count))
+    stays = []
+    free_from = start
+    for offset in offsets:
+        check_in = max(start + timedelta(days=offset), free_from)
+        check_out = check_in + timedelta(days=rng.choices(STAY_NIGHTS, STAY_WEIGHTS)[0])
+        if check_out > end:
+            break
+        stays.append((check_in, check_out))
+        free_from = check_out
+    return stays
+
+
+def placeholder_images(count):
+    """Names of ``count`` shared placeholder photos (created with variants on first use)."""
+    from PIL import Image
+
+    placeholders = []
+    for index in range(count):
+        name = f'synthetic/placeholder-{index}.jpg'
+        if not default_storage.exists(name):
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 800), PLACEHOLDER_COLORS[index % len(PLACEHOLDER_COLORS)]).save(buffer, 'JPEG')
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        field_file = RoomImage(image=name).image
+        placeholders.append((name, image_variants.generate_variants(field_file)))
+    return placeholders
+
+
+def generate(categories, hotels=100, rooms_per_hotel=50, bookings=100000, images=2, users=1000, seed=0,
+             days_back=365, days_ahead=180, batch_size=5000, log=None, queue_reminders=False):
+    """
+    Insert a synthetic dataset and return a dict of row counts. ``images`` is
+    the number of photos per room (hotels get one when it is non-zero).
+    ``queue_reminders`` leaves upcoming reminders queued, for datasets no
+    email worker will see (e.g. rolled back after a plan check).
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    today = date.today()
+    start, end = today - timedelta(days=days_back), today + timedelta(days=days_ahead)
+    counts = {}
+
+    placeholders = placeholder_images(min(len(PLACEHOLDER_COLORS), max(images, 1))) if images else []
+
+    hotel_objs = Hotel.objects.bulk_create([
+        Hotel(
+            name=f'{rng.choice(HOTEL_PREFIXES)} {rng.choice(HOTEL_SUFFIXES)} {city} {n}',
+            address=f'{rng.randint(1, 999)} Synthetic Street, {city}',
+            email=f'hotel{n}@{EMAIL_DOMAIN}',
+            description=f'Synthetic hotel in {city}.',
+            image=placeholders[n % len(placeholders)][0] if placeholders else None,
+            image_variants=placeholders[n % len(placeholders)][1] if placeholders else {},
+            latitude=latitude,
+            longitude=longitude,
+            geo_cell=geo.cell(latitude, longitude),
+        )
+        for n, city in ((n, rng.choice(list(CITIES))) for n in range(hotels))
+        for latitude, longitude in [scatter(rng, *CITIES[city])]
+    ], batch_size=batch_size)
+    counts['hotels'] = len(hotel_objs)
+    log(f'{len(hotel_objs)} hotels')
+
+    amenity_bits = [(amenities.mask_for_names([name], create=True), odds) for name, odds in AMENITY_ODDS.items()]
+    room_objs = []
+    for hotel in hotel_objs:
+        for n in range(rooms_per_hotel):
+            category = rng.choice(categories)
+            low, high, max_guests = CATEGORY_ROOM_CONFIG.get(category.slug, DEFAULT_ROOM_CONFIG)
+            room_objs.append(Room(
+                hotel=hotel,
+                category=category,
+                name=f'{category.name} {100 * (n // 20 + 1) + n % 20}',
+                description=ROOM_DESCRIPTION,
+                price_per_night=(low + (high - low) * Decimal(rng.random())).quantize(Decimal('1')),
+                max_guests=max_guests,
+                amenity_mask=sum(bit for bit, odds in amenity_bits if rng.random() < odds),
+                is_available=rng.random() > 0.03,
+            ))
+    room_objs = Room.objects.bulk_create(room_objs, batch_size=batch_size)
+    counts['rooms'] = len(room_objs)
+    log(f'{len(room_objs)} rooms')
+
+    if placeholders:
+        columns = ('room_id', 'image', 'image_variants', 'caption', 'is_primary')
+        variants_json = [(name, json.dumps(variants)) for name, variants in placeholders]
+        counts['room_images'] = 0
+        batch = []
+        for room in room_objs:
+            for n in range(images):
+                name, variants = variants_json[rng.randrange(len(variants_json))]
+                batch.append((room.pk, name, variants, '', n == 0))
+            if len(batch) >= batch_size:
+                counts['room_images'] += insert_rows(RoomImage, columns, batch)
+                batch = []
+        counts['room_images'] += insert_rows(RoomImage, columns, batch)
+        log(f"{counts['room_images']} room images")
+
+    password = make_password(None)
+    run = hotel_objs[0].pk if hotel_objs else 0  # keeps usernames unique across runs
+    user_objs = User.objects.bulk_create([
+        User(username=f'synthetic-{run}-{n}', email=f'guest{n}@{EMAIL_DOMAIN}', password=password)
+        for n in range(users)
+    ], batch_size=batch_size)
+    counts['users'] = len(user_objs)
+
+    # Bulk inserts skip the signals that compile nightly rates and index new hotels for search
+    pricing.compile_rates(hotel_ids=[hotel.pk for hotel in hotel_objs])
+    fulltext.index_hotels([hotel.pk for hotel in hotel_objs])
+    rates = pricing.RateTable(room_objs, start, end)
+    counts['bookings'] = counts['room_nights'] = 0
+    cum_weights = demand_weights(start, end)
+    per_room, extra = divmod(bookings, len(room_objs)) if room_objs else (0, 0)
+    user_ids = [user.pk for user in user_objs]
+    next_id = (Booking.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    now = datetime.now(timezone.utc)
+    hold = timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+    ops = connection.ops
+    counts['notifications'] = 0
+    batch, nights, notes = [], [], []
+    for index, room in enumerate(room_objs):
+        for check_in, check_out in room_stays(rng, per_room + (index < extra), start, end, cum_weights):
+            status = rng.choice(PAST_STATUSES if check_in < today else FUTURE_STATUSES)
+            # Booked 0-120 days ahead of arrival, never in the future
+            created_at = min(now, datetime.combine(
+                check_in - timedelta(days=int(rng.expovariate(1 / 30)) % 120), time(rng.randrange(24)), timezone.utc
+            ))
+            if status == 'pending':
+                created_at = now - hold * rng.uniform(0, 1.5)
+            batch.append((
+                next_id,
+                rng.choice(user_ids) if user_ids and rng.random() < 0.7 else None,
+                room.pk,
+                ops.adapt_datefield_value(check_in),
+                ops.adapt_datefield_value(check_out),
+                rng.randint(1, room.max_guests),
+                ops.adapt_decimalfield_value(rates.stay_price(room, check_in, check_out), 10, 2),
+                status,
+                f'Guest {rng.randrange(10 ** 6)}',
+                f'guest{rng.randrange(10 ** 6)}@{EMAIL_DOMAIN}',
+                '',
+                '',
+                ops.adapt_datetimefield_value(created_at),
+                ops.adapt_datetimefield_value(created_at),
+                ops.adapt_datetimefield_value(created_at + hold),
+            ))
+            if status in Booking.BLOCKING_STATUSES:
+                nights.extend(
+                    (room.pk, ops.adapt_datefield_value(day), next_id)
+                    for day in inventory.stay_dates(check_in, check_out)
+                )
+            if status == 'confirmed':
+                notes.extend(_notifications(next_id, batch[-1][9], check_in, created_at, now, queue_reminders))
+            next_id += 1
+            if len(batch) >= batch_size:
+                _write_bookings(batch, nights, notes, counts)
+                batch, nights, notes = [], [], []
+                log(f"{counts['bookings']} bookings")
+    _write_bookings(batch, nights, notes, counts)
+    with connection.cursor() as cursor:
+        for sql in ops.sequence_reset_sql(no_style(), [Booking, RoomNight, RoomImage]):
+            cursor.execute(sql)
+    inventory.bump_rooms()
+    log(f"{counts['bookings']} bookings, {counts['room_nights']} room nights, {counts['notifications']} notifications")
+    counts['summaries'] = len(summary.rebuild(user_ids))
+    return counts
+
+
+BOOKING_COLUMNS = (
+    'id', 'user_id', 'room_id', 'check_in', 'check_out', 'num_guests', 'total_price', 'status',
+    'guest_name', 'guest_email', 'guest_phone', 'special_requests', 'created_at', 'updated_at',
+    'hold_expires_at',
+)
+ROOM_NIGHT_COLUMNS = ('room_id', 'date', 'booking_id')
+NOTIFICATION_COLUMNS = (
+    'booking_id', 'kind', 'recipient', 'key', 'status', 'attempts', 'next_attempt_at', 'last_error',
+    'created_at', 'sent_at',
+)
+
+
+def _notifications(booking_id, recipient, check_in, created_at, now, queue_reminders):
+    """Outbox rows of a confirmed booking: its sent confirmation and its reminder, sent, skipped or queued."""
+    ops = connection.ops
+    sent_at = ops.adapt_datetimefield_value(created_at)
+    rows = [(
+        booking_id, Notification.CONFIRMATION, recipient, f'{Notification.CONFIRMATION}:{booking_id}', 'sent', 1,
+        sent_at, '', sent_at, sent_at,
+    )]
+    remind_at = outbox.reminder_time(check_in)
+    if remind_at > created_at:
+        sent = remind_at <= now
+        status = 'sent' if sent else 'queued' if queue_reminders else 'skipped'
+        rows.append((
+            booking_id, Notification.REMINDER, recipient, outbox.reminder_key(booking_id, check_in),
+            status, int(sent), ops.adapt_datetimefield_value(remind_at), '', sent_at,
+            ops.adapt_datetimefield_value(remind_at) if sent else None,
+        ))
+    return rows
+
+
+def _write_bookings(batch, nights, notes, counts):
+    with transaction.atomic():
+        counts['bookings'] += insert_rows(Booking, BOOKING_COLUMNS, batch)
+        counts['room_nights'] += insert_rows(RoomNight, ROOM_NIGHT_COLUMNS, nights)
+        counts['notifications'] += insert_rows(Notification, NOTIFICATION_COLUMNS, notes)
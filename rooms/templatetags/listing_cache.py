@@ -0,0 +1,43 @@
+"""
+{% cachedfragment 'room-card' room %}...{% endcachedfragment %}
+
+Caches the enclosed markup per object under a name registered in
+rooms.cache.FRAGMENTS, so signal handlers can invalidate it precisely.
+The enclosed block must depend only on that object, not on the request.
+"""
+from django import template
+from rooms import cache as listing_cache
+
+register = template.Library()
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, nodelist, name, obj):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+
+    def render(self, context):
+        pk = self.obj.resolve(context).pk
+        content = listing_cache.get_fragment(self.name, pk)
+        if content is None:
+            content = self.nodelist.render(context)
+            listing_cache.set_fragment(self.name, pk, content)
+        return content
+
+
+@register.tag
+def cachedfragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 3 or bits[1][0] not in '"\'' or bits[1][0] != bits[1][-1]:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes a quoted fragment name and an object, e.g. {{% {bits[0]} 'room-card' room %}}"
+        )
+    name = bits[1][1:-1]
+    if listing_cache.fragment_model(name) is None:
+        raise template.TemplateSyntaxError(
+            f"Unknown fragment '{name}'; register it in rooms.cache.FRAGMENTS."
+        )
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(nodelist, name, parser.compile_filter(bits[2]))
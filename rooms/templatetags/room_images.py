@@ -0,0 +1,28 @@
+"""
+{% responsive_image hotel 'card-img-top' alt=hotel.name sizes='(min-width: 768px) 33vw, 100vw' %}
+
+Renders a <picture> with a WebP srcset and a JPEG srcset fallback built from
+the object's ``image_variants`` (see rooms.images). Until the variants exist,
+or for browsers without srcset support, the original upload is used.
+"""
+from django import template
+from django.utils.html import format_html
+from rooms import images
+
+register = template.Library()
+
+DEFAULT_SIZES = '100vw'
+
+
+@register.simple_tag
+def responsive_image(obj, css_class='', alt='', sizes=DEFAULT_SIZES):
+    """``obj`` is anything with ``image`` and ``image_variants`` (Hotel, RoomImage)."""
+    variants = obj.image_variants if obj.image_variants.get('source') == obj.image.name else {}
+    webp, jpeg = images.srcset(variants, 'webp'), images.srcset(variants, 'jpeg')
+    if not webp:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', obj.image.url, css_class, alt)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        webp, sizes, obj.image.url, jpeg, sizes, css_class, alt,
+    )
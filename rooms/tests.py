@@ -0,0 +1,407 @@
+import random
+from math import asin, atan2, cos, degrees, radians, sin
+from base64 import urlsafe_b64encode
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import combinations
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from bookings.models import Booking
+from rooms import allocation, checks, fulltext, geo, pricing, search, synthetic
+from rooms.management.commands.check_query_plans import Command as CheckQueryPlans
+from rooms.models import Hotel, NightlyRate, PricingRule, Room, RoomCategory, RoomImage
+
+# Templates render without a collectstatic manifest
+STATIC_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+def make_categories():
+    return RoomCategory.objects.bulk_create(
+        [RoomCategory(name=f'Category {n}', slug=f'category-{n}') for n in range(3)]
+    )
+
+
+@override_settings(STATICFILES_STORAGE=STATIC_STORAGE)
+class RoomCardQueryTests(TestCase):
+    """Room and hotel cards load in a fixed number of queries, however many are shown."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = make_categories()[0]
+        cls.hotel = Hotel.objects.create(name='Card Hotel', address='1 Card Street')
+        cls.add_rooms(3)
+
+    @classmethod
+    def add_rooms(cls, count):
+        start = Room.objects.count()
+        rooms = [
+            Room.objects.create(
+                hotel=cls.hotel, category=cls.category, name=f'Room {start + n}', description='A room',
+                price_per_night=Decimal('90.00'),
+            )
+            for n in range(count)
+        ]
+        RoomImage.objects.bulk_create(
+            [RoomImage(room=room, image=f'rooms/card-{room.pk}-{n}.jpg', is_primary=n == 0)
+             for room in rooms for n in range(2)]
+        )
+
+    def queries(self, url, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def assert_fixed_queries(self, url, params=None):
+        few = self.queries(url, params)
+        self.add_rooms(20)
+        self.assertEqual(self.queries(url, params), few)
+
+    def test_room_list(self):
+        self.assert_fixed_queries(reverse('rooms:room_list'))
+
+    def test_dated_room_list(self):
+        check_in = date.today() + timedelta(days=14)
+        self.assert_fixed_queries(reverse('rooms:room_list'), {
+            'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=2)).isoformat(),
+        })
+
+    def test_hotel_detail(self):
+        self.assert_fixed_queries(reverse('rooms:hotel_detail', args=[self.hotel.pk]))
+
+    def test_room_list_api(self):
+        self.assert_fixed_queries(reverse('rooms:room_list_api'))
+
+
+class SearchCursorTests(TestCase):
+    """Search cursors page through every room once, and malformed ones are rejected."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = make_categories()
+        hotels = [Hotel.objects.create(name=f'Hotel {n}', address=f'{n} Main Street') for n in range(2)]
+        cls.rooms = [
+            Room.objects.create(
+                hotel=hotels[n % 2], category=categories[n % 3], name=f'Room {n}', description='A room',
+                price_per_night=Decimal('90.00'),
+            )
+            for n in range(8)
+        ]
+        check_in = date.today() + timedelta(days=14)
+        cls.dates = {'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=2)).isoformat()}
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, params):
+        """Room ids of every API page, following next_cursor."""
+        ids, params = [], {'page_size': 3, **params}
+        while True:
+            data = self.client.get(reverse('rooms:room_list_api'), params).json()
+            ids += [room['id'] for room in data['results']]
+            if not data['next_cursor']:
+                return ids
+            params['cursor'] = data['next_cursor']
+
+    def test_pages_cover_every_room_once(self):
+        ordered = [room.pk for room in sorted(self.rooms, key=lambda room: (room.hotel_id, room.category_id, room.pk))]
+        self.assertEqual(self.pages({}), ordered)
+        self.assertEqual(self.pages(self.dates), ordered)
+        ranked = self.pages({'q': 'room', **self.dates})
+        self.assertCountEqual(ranked, ordered)
+
+    def test_cursor_round_trip(self):
+        room = self.rooms[3]
+        self.assertEqual(search.decode_cursor(search.encode_cursor(room)), (room.hotel_id, room.category_id, room.pk))
+
+    def test_malformed_cursors_are_rejected(self):
+        listing_cursor = search.encode_cursor(self.rooms[0])
+        malformed = ['', 'not a cursor', '\u00e9', *(urlsafe_b64encode(raw).decode() for raw in (b'1.x.3', b'1.2'))]
+        for cursor in malformed:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                search.decode_cursor(cursor)
+        with self.assertRaises(ValueError):
+            search.decode_cursor(listing_cursor, search.RANKED_KEY_PARTS)
+        for params in ({'cursor': 'not a cursor'}, {'cursor': 'not a cursor', **self.dates},
+                       {'q': 'room', 'cursor': listing_cursor}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('rooms:room_list_api'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json()['errors'])
+
+
+class AllocationTests(SimpleTestCase):
+    """cheapest_cover finds the cheapest set of rooms that sleeps a party."""
+
+    def brute_force(self, rooms, guests):
+        """(cost, room count) of the cheapest covering subset, trying them all; None if none covers."""
+        covers = [
+            (sum(room[2] for room in subset), size)
+            for size in range(1, len(rooms) + 1)
+            for subset in combinations(rooms, size)
+            if sum(room[1] for room in subset) >= guests
+        ]
+        return min(covers, default=None)
+
+    def test_matches_brute_force(self):
+        rng = random.Random(15)
+        for case in range(300):
+            rooms = [(key, rng.randint(0, 5), rng.randint(1, 20) * 10) for key in range(rng.randint(1, 9))]
+            guests = rng.randint(1, 14)
+            with self.subTest(case=case, rooms=rooms, guests=guests):
+                expected = self.brute_force(rooms, guests)
+                cover = allocation.cheapest_cover(rooms, guests)
+                if expected is None:
+                    self.assertIsNone(cover)
+                    continue
+                cost, keys = cover
+                chosen = [rooms[key] for key in keys]
+                self.assertEqual(len(set(keys)), len(keys))
+                self.assertGreaterEqual(sum(room[1] for room in chosen), guests)
+                self.assertEqual(sum(room[2] for room in chosen), cost)
+                self.assertEqual((cost, len(keys)), expected)
+
+    def test_prefers_fewer_rooms_on_equal_cost(self):
+        rooms = [('single-1', 1, Decimal('50')), ('single-2', 1, Decimal('50')), ('double', 2, Decimal('100'))]
+        self.assertEqual(allocation.cheapest_cover(rooms, 2), (Decimal('100'), ['double']))
+
+    def test_prune_keeps_the_cheapest_rooms_each_capacity_can_use(self):
+        rooms = [(key, 2, cost) for key, cost in enumerate([90, 30, 60, 10])] + [(4, 5, 200), (5, 6, 100), (6, 0, 1)]
+        kept = allocation.prune(rooms, 5)
+        # ceil(5 / 2) = 3 doubles, one room of capacity 5 or 6, none that sleeps nobody
+        self.assertCountEqual([room[0] for room in kept], [3, 1, 2, 4, 5])
+
+    def test_no_cover_when_the_rooms_are_too_small(self):
+        self.assertIsNone(allocation.cheapest_cover([('a', 2, 100), ('b', 1, 50)], 4))
+
+
+class GeoTests(TestCase):
+    """Grid cell ranges cover a whole search circle, and nearby() sorts what is inside it."""
+
+    def destination(self, latitude, longitude, bearing, km):
+        """The point ``km`` from a start point along an initial ``bearing`` (degrees)."""
+        lat, lng, bearing, angle = radians(latitude), radians(longitude), radians(bearing), km / geo.EARTH_RADIUS_KM
+        end_lat = asin(sin(lat) * cos(angle) + cos(lat) * sin(angle) * cos(bearing))
+        end_lng = lng + atan2(sin(bearing) * sin(angle) * cos(lat), cos(angle) - sin(lat) * sin(end_lat))
+        return degrees(end_lat), (degrees(end_lng) + 180) % 360 - 180
+
+    def covered(self, ranges, latitude, longitude):
+        cell = geo.cell(latitude, longitude)
+        return any(first <= cell <= last for first, last in ranges)
+
+    def test_ranges_cover_every_point_of_the_circle(self):
+        rng = random.Random(19)
+        centres = [(48.85, 2.35), (-33.9, 151.2), (10, 179.95), (-10, -179.95), (89.9, 40), (-89.95, -120), (0, 0)]
+        for latitude, longitude in centres:
+            for radius in (0.5, 10, 75, geo.MAX_RADIUS_KM):
+                area = geo.Area(latitude, longitude, radius)
+                ranges = geo.cell_ranges(area)
+                for _ in range(200):
+                    point = self.destination(latitude, longitude, rng.uniform(0, 360), rng.uniform(0, radius))
+                    with self.subTest(area=area, point=point):
+                        self.assertTrue(self.covered(ranges, *point))
+
+    def test_run_wraps_at_the_antimeridian(self):
+        area = geo.Area(10, 179.95, 20)
+        ranges = geo.cell_ranges(area)
+        row = (10 + 90) * 10
+        # Each row gets two runs: the last columns of the row and the first ones
+        self.assertIn((row * geo.COLUMNS + geo.COLUMNS - 3, (row + 1) * geo.COLUMNS - 1), ranges)
+        self.assertIn((row * geo.COLUMNS, row * geo.COLUMNS + 1), ranges)
+        self.assertTrue(self.covered(ranges, 10, -179.9))
+        self.assertFalse(self.covered(ranges, 10, 0))
+        self.assertFalse(self.covered(ranges, 10, 179.5))
+
+    def test_rows_are_covered_whole_at_the_poles(self):
+        # 20 km is 0.18 degrees of latitude: the top three rows, as one range
+        north = geo.cell_ranges(geo.Area(89.95, 0, 20))
+        self.assertEqual(north, [((geo.ROWS - 3) * geo.COLUMNS, geo.ROWS * geo.COLUMNS - 1)])
+        south = geo.cell_ranges(geo.Area(-90, 45, 5))
+        self.assertEqual(south, [(0, geo.COLUMNS - 1)])
+
+    def test_nearby_sorts_by_distance_within_the_radius(self):
+        hotels = {}
+        for name, km, bearing in [('far', 9, 0), ('near', 1, 90), ('middle', 5, 200), ('outside', 12, 45)]:
+            latitude, longitude = self.destination(51.5, -0.12, bearing, km)
+            hotels[name] = Hotel.objects.create(
+                name=name, address='1 Test Street', latitude=latitude, longitude=longitude
+            )
+        Hotel.objects.create(name='closed', address='1 Test Street', latitude=51.5, longitude=-0.12, is_active=False)
+        found = geo.nearby(Hotel.objects.all(), geo.Area(51.5, -0.12, 10))
+        self.assertEqual([hotel.name for hotel in found], ['near', 'middle', 'far'])
+        for hotel, km in zip(found, (1, 5, 9)):
+            self.assertAlmostEqual(hotel.distance_km, km, places=3)
+
+    def test_nearby_finds_hotels_across_the_antimeridian(self):
+        Hotel.objects.create(name='west', address='1 Test Street', latitude=-17, longitude=179.98)
+        Hotel.objects.create(name='east', address='1 Test Street', latitude=-17, longitude=-179.97)
+        found = geo.nearby(Hotel.objects.all(), geo.Area(-17, -179.99, 10))
+        # 0.02 degrees east of the centre, then 0.03 degrees west of it over the antimeridian
+        self.assertEqual([hotel.name for hotel in found], ['east', 'west'])
+
+
+class PricingTests(TestCase):
+    """Rules are compiled into nightly rates for just what they cover, and stays are priced from them."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.double, cls.suite, cls.spare = make_categories()
+        cls.hotel = Hotel.objects.create(name='Rate Hotel', address='1 Rate Street')
+        cls.rooms = [
+            Room.objects.create(
+                hotel=cls.hotel, category=category, name=f'Room {n}', description='A room',
+                price_per_night=Decimal('100.00'),
+            )
+            for n, category in enumerate([cls.double, cls.double, cls.suite])
+        ]
+        cls.day = date.today() + timedelta(days=20)
+
+    def setUp(self):
+        cache.clear()
+
+    def rule(self, **fields):
+        # Rule changes replace the cached rule list once they commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return PricingRule.objects.create(**fields)
+
+    def season(self, first, last, **scope):
+        return self.rule(
+            name='Season', kind=PricingRule.SEASON, adjustment=Decimal('50'),
+            start_date=self.day + timedelta(days=first), end_date=self.day + timedelta(days=last), **scope,
+        )
+
+    def rated(self):
+        """{(category_id, days after self.day): factor} of the stored rates."""
+        return {
+            (category_id, (day - self.day).days): factor
+            for category_id, day, factor in NightlyRate.objects.values_list('category_id', 'date', 'factor')
+        }
+
+    def test_stay_price(self):
+        self.season(1, 2)
+        self.rule(name='Week', kind=PricingRule.LENGTH_OF_STAY, adjustment=Decimal('-10'), min_nights=4)
+        room = self.rooms[0]
+        table = pricing.RateTable([room], self.day, self.day + timedelta(days=5))
+        self.assertEqual(
+            table.nightly_prices(room, self.day, self.day + timedelta(days=4)),
+            [Decimal('100.00'), Decimal('150.00'), Decimal('150.00'), Decimal('100.00')],
+        )
+        # 100 + 150 + 150 + 100, less 10% for four nights
+        self.assertEqual(table.stay_price(room, self.day, self.day + timedelta(days=4)), Decimal('450.00'))
+        short_stay = table.stay_price(room, self.day + timedelta(days=2), self.day + timedelta(days=4))
+        self.assertEqual(short_stay, Decimal('250.00'))
+        self.assertEqual(Booking.price_for(room, self.day, self.day + timedelta(days=4)), Decimal('450.00'))
+
+    def test_rule_recompiles_its_range(self):
+        rule = self.season(10, 12, category=self.double)
+        self.assertEqual(self.rated(), {(self.double.pk, day): Decimal('1.5000') for day in (10, 11, 12)})
+        rule.start_date, rule.end_date = self.day + timedelta(days=30), self.day + timedelta(days=31)
+        rule.category = None
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(self.rated(), {
+            (category.pk, day): Decimal('1.5000') for category in (self.double, self.suite) for day in (30, 31)
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.delete()
+        self.assertEqual(self.rated(), {})
+
+    def test_room_edit_recompiles_nothing(self):
+        self.season(1, 2)
+        room = self.rooms[0]
+        room.description = 'A renovated room'
+        room.price_per_night = Decimal('120.00')
+        with CaptureQueriesContext(connection) as ctx:
+            room.save()
+        self.assertFalse([query for query in ctx.captured_queries if 'nightlyrate' in query['sql'].lower()])
+
+    def test_recategorized_room_moves_its_rates(self):
+        self.season(1, 1)
+        suite = self.rooms[2]
+        suite.category = self.spare
+        with CaptureQueriesContext(connection) as ctx:
+            suite.save()
+        self.assertEqual(self.rated(), {(category.pk, 1): Decimal('1.5000') for category in (self.double, self.spare)})
+        # Only the suite's old and new (hotel, category) were recompiled
+        deletes = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len([sql for sql in deletes if 'nightlyrate' in sql.lower()]), 2)
+
+    def test_closed_room_recompiles_hotel_occupancy(self):
+        self.rule(name='Busy', kind=PricingRule.OCCUPANCY, adjustment=Decimal('20'), min_occupancy=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                room=self.rooms[2], check_in=self.day, check_out=self.day + timedelta(days=1), status='confirmed',
+            )
+        self.assertEqual(self.rated(), {})  # one of three rooms sold
+        self.rooms[1].is_available = False
+        self.rooms[1].save()
+        self.assertEqual(self.rated(), {(category.pk, 0): Decimal('1.2000') for category in (self.double, self.suite)})
+
+
+class FulltextTests(TestCase):
+    """Text search is ranked on SQLite and PostgreSQL, and falls back to substring filters elsewhere."""
+
+    def add_rooms(self):
+        category = make_categories()[0]
+        hotel = Hotel.objects.create(name='Harbour Hotel', address='1 Quay Street', description='By the sea')
+        return [
+            Room.objects.create(
+                hotel=hotel, category=category, name=name, description=description, price_per_night=Decimal('90.00'),
+            )
+            for name, description in [('Garden Room', 'Quiet, with a sea glimpse'), ('Sea View Suite', 'Balcony')]
+        ]
+
+    def test_ranked_match(self):
+        garden, suite = self.add_rooms()
+        self.assertEqual(fulltext.match_rooms('sea view suite'), [suite.pk])
+        self.assertEqual(fulltext.match_rooms('sea'), [suite.pk, garden.pk])
+
+    def test_other_databases_fall_back_to_substring_filters(self):
+        with mock.patch.dict(fulltext.BACKENDS, clear=True):
+            garden, suite = self.add_rooms()  # the save signals skip the missing index
+            self.assertEqual(fulltext.match_rooms('sea view'), [suite.pk])
+            self.assertEqual(fulltext.match_rooms('quay sea'), [garden.pk, suite.pk])
+            self.assertEqual(fulltext.match_hotels('harbour'), [garden.hotel_id])
+            self.assertEqual(fulltext.rebuild(), (1, 2))
+            self.assertEqual([warning.id for warning in checks.fulltext_index_check(None)], ['rooms.W001'])
+        self.assertEqual(checks.fulltext_index_check(None), [])
+
+
+class QueryBudgetTests(TestCase):
+    """Every public view stays within its budget in settings.QUERY_BUDGETS."""
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.generate(make_categories(), hotels=4, rooms_per_hotel=10, bookings=300, images=0, users=5)
+
+    def test_views_within_budgets(self):
+        out = StringIO()
+        call_command('check_query_budgets', stdout=out)
+        self.assertIn('All views within their query budgets.', out.getvalue())
+
+
+class QueryPlanTests(TestCase):
+    """The hot queries of check_query_plans use indexes over a realistic dataset."""
+
+    @classmethod
+    def setUpTestData(cls):
+        synthetic.generate(
+            make_categories(), hotels=60, rooms_per_hotel=25, bookings=5000, images=0, users=100,
+            queue_reminders=True,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_hot_queries_use_indexes(self):
+        check = CheckQueryPlans()
+        for label, queryset in check.plans():
+            with self.subTest(label):
+                plan = queryset.explain()
+                self.assertEqual(check.scanned_tables(plan), set(), f'{label}:\n{plan}')
@@ -1,15 +1,26 @@
 """
 URL configuration for rooms app.
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 app_name = 'rooms'
 
 urlpatterns = [
-    path('', views.home, name='home'),
+    path('', read_views.home, name='home'),
     path('hotels/', views.HotelListView.as_view(), name='hotel_list'),
     path('hotels/<int:pk>/', views.HotelDetailView.as_view(), name='hotel_detail'),
-    path('rooms/', views.room_list, name='room_list'),
-    path('rooms/<int:pk>/', views.room_detail, name='room_detail'),
+    path('rooms/', read_views.room_list, name='room_list'),
+    path('rooms/<int:pk>/', read_views.room_detail, name='room_detail'),
+    path('rooms/group/', views.group_search, name='group_search'),
+    path('api/rooms/', views.room_list_api, name='room_list_api'),
+    path('api/rooms/<int:pk>/calendar/', views.room_calendar, name='room_calendar'),
+    path('api/rooms/<int:pk>/quote/', views.room_quote, name='room_quote'),
+    path('api/hotels/<int:pk>/calendar/', views.hotel_calendar, name='hotel_calendar'),
 ]
@@ -2,19 +2,24 @@
 Views for rooms: home, hotel list, room list, room detail, search.
 """
 from datetime import date
-from django.shortcuts import render, get_object_or_404
+from django.http import JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
 from django.views.generic import ListView, DetailView
-from django.db.models import Q
-from .models import Hotel, Room, RoomCategory
-from .forms import RoomSearchForm
-from bookings.models import Booking
+from .models import Hotel
+from .forms import GroupSearchForm, RoomSearchForm
+from .search import ROOMS_PER_PAGE, search_rooms
+from . import allocation, amenities, availability, fulltext, geo, pricing
+from . import cache as listing_cache
+
+MAX_API_PAGE_SIZE = 100
 
 
 def home(request):
     """Landing page with search form."""
     form = RoomSearchForm(request.GET or None)
-    categories = RoomCategory.objects.all()
-    hotels = Hotel.objects.filter(is_active=True)[:6]
+    categories = listing_cache.categories()
+    hotels = listing_cache.featured_hotels()
     context = {
         'form': form,
         'categories': categories,
@@ -24,14 +29,33 @@ def home(request):
 
 
 class HotelListView(ListView):
-    """List all active hotels."""
+    """
+    List all active hotels; ?q= ranks them by a text search, and ?lat=&lng=
+    [&radius=km] keeps those within the radius, nearest first.
+    """
     model = Hotel
     template_name = 'rooms/hotel_list.html'
     context_object_name = 'hotels'
     paginate_by = 9
 
     def get_queryset(self):
-        return Hotel.objects.filter(is_active=True).order_by('name')
+        hotels = Hotel.objects.filter(is_active=True)
+        self.query = self.request.GET.get('q', '').strip()
+        self.area, self.area_error = search_area(self.request)
+        if not (self.query or self.area):
+            return hotels.order_by('name')
+        ranked = fulltext.match_hotels(self.query) if self.query else None
+        if ranked is not None:
+            hotels = hotels.filter(id__in=ranked)
+        if self.area:
+            return geo.nearby(hotels, self.area)
+        found = hotels.in_bulk()
+        return [found[hotel_id] for hotel_id in ranked if hotel_id in found]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(query=self.query, area=self.area, area_error=self.area_error, **filter_links(self.request))
+        return context
 
 
 class HotelDetailView(DetailView):
@@ -40,51 +64,254 @@ class HotelDetailView(DetailView):
     template_name = 'rooms/hotel_detail.html'
     context_object_name = 'hotel'
 
+    def get_object(self, queryset=None):
+        return listing_cache.hotel(self.kwargs['pk'])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['rooms'] = listing_cache.hotel_rooms(self.object.pk)
+        return context
+
 
 def room_list(request):
     """
-    List rooms with optional search by check-in/check-out and category.
+    List rooms with optional search by check-in/check-out, category, amenities,
+    text (?q=, ranked by relevance) and area (?lat=&lng=&radius=, nearest first).
     Shows only available rooms for the given dates if dates provided.
     """
-    form = RoomSearchForm(request.GET or None)
-    rooms = Room.objects.filter(is_available=True).select_related('hotel', 'category').order_by('hotel', 'category')
-
-    # Filter by category if provided
+    form = listing_form(request)
     category_slug = request.GET.get('category')
-    if category_slug:
-        rooms = rooms.filter(category__slug=category_slug)
+    query = request.GET.get('q', '').strip()
+    area, area_error = search_area(request)
+    amenity_mask, selected_amenities = amenities.mask_for_slugs(request.GET.getlist('amenity'))
 
     check_in = None
     check_out = None
     if form.is_valid():
         check_in = form.cleaned_data['check_in']
         check_out = form.cleaned_data['check_out']
-        # Exclude rooms that have overlapping bookings
-        overlapping = Booking.objects.filter(
-            status='confirmed',
-        ).filter(
-            Q(check_in__lt=check_out) & Q(check_out__gt=check_in)
-        ).values_list('room_id', flat=True)
-        rooms = rooms.exclude(id__in=overlapping)
-
-    categories = RoomCategory.objects.all()
+    cursor = request.GET.get('cursor')
+    try:
+        rooms, next_cursor = search_rooms(
+            check_in, check_out, category_slug, cursor, amenity_mask=amenity_mask, query=query, area=area
+        )
+    except ValueError:
+        cursor = None
+        rooms, next_cursor = search_rooms(
+            check_in, check_out, category_slug, amenity_mask=amenity_mask, query=query, area=area
+        )
+
+    categories = listing_cache.categories()
     context = {
         'rooms': rooms,
         'form': form,
         'categories': categories,
+        'amenities': amenities.catalogue(),
+        'selected_amenities': selected_amenities,
+        'query': query,
+        'area': area,
+        'area_error': area_error,
         'check_in': check_in,
         'check_out': check_out,
+        **filter_links(request),
+        **page_links(request, cursor, next_cursor),
     }
     return render(request, 'rooms/room_list.html', context)
 
 
+def group_search(request):
+    """
+    Group search: the cheapest set of rooms per hotel that sleeps the whole
+    party for the dates, cheapest hotels first, each bookable in one go.
+    """
+    form = GroupSearchForm(request.GET or None)
+    category_slug = request.GET.get('category') or None
+    offers = []
+    if form.is_valid():
+        offers = allocation.load_offers(allocation.group_offers(
+            form.cleaned_data['check_in'], form.cleaned_data['check_out'], form.cleaned_data['guests'], category_slug
+        ))
+    context = {
+        'form': form,
+        'offers': offers,
+        'categories': listing_cache.categories(),
+        'category_slug': category_slug,
+    }
+    return render(request, 'rooms/group_search.html', context)
+
+
+def search_area(request):
+    """(rooms.geo.Area or None, error message or None) from ?lat=&lng=&radius=."""
+    try:
+        return geo.parse_area(request.GET), None
+    except ValueError as exc:
+        return None, str(exc)
+
+
+def listing_form(request):
+    """The listing's date form, bound only when dates were given (other filters work without them)."""
+    if request.GET.get('check_in') or request.GET.get('check_out'):
+        return RoomSearchForm(request.GET)
+    return RoomSearchForm()
+
+
+def filter_links(request):
+    """Query string of the current filters except category and page, for filter and page links."""
+    params = request.GET.copy()
+    for name in ('category', 'cursor', 'page'):
+        params.pop(name, None)
+    return {'filter_query': params.urlencode()}
+
+
+def page_links(request, cursor, next_cursor):
+    """Query strings for the next page and, past the first page, the first one."""
+    next_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_query = params.urlencode()
+    first_query = None
+    if cursor:
+        params = request.GET.copy()
+        del params['cursor']
+        first_query = params.urlencode()
+    return {'next_query': next_query, 'first_query': first_query}
+
+
+def _room_payload(room):
+    """JSON-serializable summary of a room for the search API."""
+    return {
+        'id': room.pk,
+        'name': room.name,
+        'url': reverse('rooms:room_detail', args=[room.pk]),
+        'hotel': {'id': room.hotel_id, 'name': room.hotel.name},
+        'category': {'slug': room.category.slug, 'name': room.category.name},
+        'price_per_night': str(room.price_per_night),
+        'max_guests': room.max_guests,
+        'amenities': room.get_amenities_list(),
+        'stay_price': str(room.stay_price) if hasattr(room, 'stay_price') else None,
+        'distance_km': round(room.distance_km, 2) if hasattr(room, 'distance_km') else None,
+    }
+
+
+def room_list_api(request):
+    """
+    JSON variant of room_list for the mobile app and partners.
+    Same filters as the HTML listing (?amenity= may repeat; rooms must have
+    them all; ?q= ranks by relevance; ?lat=&lng=&radius= sorts by distance),
+    paginated via ?cursor=.
+    """
+    check_in = None
+    check_out = None
+    if 'check_in' in request.GET or 'check_out' in request.GET:
+        form = RoomSearchForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        check_in = form.cleaned_data['check_in']
+        check_out = form.cleaned_data['check_out']
+
+    try:
+        page_size = min(int(request.GET.get('page_size', ROOMS_PER_PAGE)), MAX_API_PAGE_SIZE)
+    except ValueError:
+        page_size = 0
+    if page_size < 1:
+        return JsonResponse({'errors': {'page_size': ['Must be a positive integer.']}}, status=400)
+
+    area, area_error = search_area(request)
+    if area_error:
+        return JsonResponse({'errors': {'lat': [area_error]}}, status=400)
+
+    amenity_mask, _ = amenities.mask_for_slugs(request.GET.getlist('amenity'))
+    try:
+        rooms, next_cursor = search_rooms(
+            check_in, check_out, request.GET.get('category'), request.GET.get('cursor'), page_size, images=False,
+            amenity_mask=amenity_mask, query=request.GET.get('q', '').strip(), area=area,
+        )
+    except ValueError as exc:
+        return JsonResponse({'errors': {'cursor': [str(exc)]}}, status=400)
+
+    next_url = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_url = f"{reverse('rooms:room_list_api')}?{params.urlencode()}"
+    return JsonResponse({
+        'check_in': check_in,
+        'check_out': check_out,
+        'results': [_room_payload(room) for room in rooms],
+        'next_cursor': next_cursor,
+        'next': next_url,
+    })
+
+
 def room_detail(request, pk):
     """Room detail page with images, amenities, and booking form link."""
-    room = get_object_or_404(Room.objects.select_related('hotel', 'category').prefetch_related('images'), pk=pk)
-    # Primary image or first image
-    primary_image = room.images.filter(is_primary=True).first() or room.images.first()
+    room = listing_cache.room(pk)
+    # Primary image or first image (from the prefetched images)
+    primary_image = room.get_primary_image()
     context = {
         'room': room,
         'primary_image': primary_image,
     }
     return render(request, 'rooms/room_detail.html', context)
+
+
+def _calendar_window(request):
+    """(start, days) from ?start=YYYY-MM-DD&days=N, or a dict of errors."""
+    errors = {}
+    start = date.today()
+    if request.GET.get('start'):
+        try:
+            start = date.fromisoformat(request.GET['start'])
+        except ValueError:
+            errors['start'] = ['Enter a date as YYYY-MM-DD.']
+    try:
+        days = int(request.GET.get('days', availability.DEFAULT_DAYS))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= availability.MAX_DAYS:
+        errors['days'] = [f'Must be between 1 and {availability.MAX_DAYS}.']
+    return (None, errors) if errors else ((start, days), None)
+
+
+def room_calendar(request, pk):
+    """JSON nightly availability and price of one room for ?start=&days=."""
+    window, errors = _calendar_window(request)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    room = listing_cache.room(pk)
+    start, days = window
+    return JsonResponse({
+        'room': room.pk,
+        'start': start,
+        'days': days,
+        'nights': availability.room_calendar(room, start, days),
+    })
+
+
+def hotel_calendar(request, pk):
+    """JSON nightly availability of a hotel's rooms (with a per-night summary) for ?start=&days=."""
+    window, errors = _calendar_window(request)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+    hotel = listing_cache.hotel(pk)
+    start, days = window
+    calendar = availability.hotel_calendar(hotel, listing_cache.hotel_rooms(hotel.pk), start, days)
+    return JsonResponse({'hotel': hotel.pk, 'start': start, 'days': days, **calendar})
+
+
+def room_quote(request, pk):
+    """JSON total price of a stay in one room for ?check_in=&check_out=, as the booking will store it."""
+    form = RoomSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    room = listing_cache.room(pk)
+    check_in, check_out = form.cleaned_data['check_in'], form.cleaned_data['check_out']
+    rates = pricing.RateTable([room], check_in, check_out)
+    return JsonResponse({
+        'room': room.pk,
+        'check_in': check_in,
+        'check_out': check_out,
+        'nights': [str(price) for price in rates.nightly_prices(room, check_in, check_out)],
+        'total_price': str(rates.stay_price(room, check_in, check_out)),
+    })
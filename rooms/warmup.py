@@ -0,0 +1,150 @@
+"""
+Cache warm-up: requests the pages the first wave of traffic after a deploy or
+cache flush would hit, so that it finds them cached.
+
+Pages are requested in-process through the full middleware and view stack
+(django.test.Client), so every cache they use is primed exactly as real
+traffic would prime it: categories and featured hotels, hotel cards on the
+home page and every hotel list page, and, for each upcoming weekend, holiday
+and peak season start, the availability positions, prices and room cards of
+a dated room search, for all categories and for each one.
+
+Requests are sent for the site's host (the first ALLOWED_HOSTS entry, or
+--host) and over HTTPS when SECURE_SSL_REDIRECT is on, so they pass the host
+validation and redirect the web workers apply. Only a cache shared with the
+web workers (CACHE_URL) benefits from a warm-up run in another process.
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from .models import Hotel, PricingRule
+from .views import HotelListView
+from . import cache as listing_cache
+
+FRIDAY = 4
+WEEKEND_NIGHTS = 2
+
+
+@dataclass(frozen=True)
+class Target:
+    """One page to request: its report group, URL path and query parameters."""
+    group: str
+    path: str
+    params: tuple = ()
+
+    def __str__(self):
+        query = '&'.join(f'{name}={value}' for name, value in self.params)
+        return f'{self.path}?{query}' if query else self.path
+
+
+@dataclass
+class Result:
+    target: Target
+    ms: float
+    error: str = ''
+
+
+def weekend_stays(count, today=None):
+    """(check_in, check_out) for the next ``count`` Friday-to-Sunday weekends."""
+    today = today or date.today()
+    friday = today + timedelta(days=(FRIDAY - today.weekday()) % 7)
+    return [(friday + timedelta(weeks=n), friday + timedelta(weeks=n, days=WEEKEND_NIGHTS)) for n in range(count)]
+
+
+def holiday_stays(holidays, nights, today=None):
+    """(check_in, check_out) from each upcoming holiday, for ``nights`` nights."""
+    today = today or date.today()
+    return [(day, day + timedelta(days=nights)) for day in sorted(set(holidays)) if day >= today]
+
+
+def peak_season_stays(until, nights, today=None):
+    """(check_in, check_out) from the start of each active price-raising season starting before ``until``."""
+    today = today or date.today()
+    starts = PricingRule.objects.filter(
+        kind=PricingRule.SEASON, is_active=True, adjustment__gt=0, start_date__gte=today, start_date__lt=until,
+    ).order_by('start_date').values_list('start_date', flat=True).distinct()
+    return [(day, day + timedelta(days=nights)) for day in starts]
+
+
+def parse_holidays(values):
+    """Dates from YYYY-MM-DD strings (settings.WARMUP_HOLIDAYS, --holiday). Raises ValueError."""
+    return [date.fromisoformat(value.strip()) for value in values if value.strip()]
+
+
+def hotel_list_pages(max_pages=None):
+    """(hotel list pages to warm, active hotels on them, active hotels)."""
+    hotels = Hotel.objects.filter(is_active=True).count()
+    pages = max(1, math.ceil(hotels / HotelListView.paginate_by))
+    if max_pages is not None:
+        pages = min(pages, max_pages)
+    return pages, min(hotels, pages * HotelListView.paginate_by), hotels
+
+
+def targets(stay_groups, hotel_pages):
+    """
+    Every page to warm, most visited first: the home page, ``hotel_pages``
+    hotel list pages, then a room search for each (group, stays) pair's stays
+    in all categories and in each one.
+    """
+    pages = [Target('home', reverse('rooms:home'))]
+    hotel_list = reverse('rooms:hotel_list')
+    pages += [
+        Target('hotel list', hotel_list, (('page', page),) if page > 1 else ())
+        for page in range(1, hotel_pages + 1)
+    ]
+    room_list = reverse('rooms:room_list')
+    categories = [None] + [category.slug for category in listing_cache.categories()]
+    seen = set()
+    for group, stays in stay_groups:
+        for check_in, check_out in stays:
+            for slug in categories:
+                params = (('check_in', check_in.isoformat()), ('check_out', check_out.isoformat()))
+                if slug:
+                    params += (('category', slug),)
+                if params not in seen:
+                    seen.add(params)
+                    pages.append(Target(group, room_list, params))
+    return pages
+
+
+def default_host():
+    """The host to request pages for: the first ALLOWED_HOSTS entry that names one."""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')  # '.example.com' also allows example.com
+        if host and host != '*':
+            return host
+    return 'testserver'
+
+
+def warm(pages, workers=4, host=None):
+    """
+    Request every page for ``host`` (default: default_host()) with at most
+    ``workers`` requests in flight; returns a Result per page, in the order
+    given.
+    """
+    local = threading.local()
+    host = host or default_host()
+
+    def fetch(target):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client(raise_request_exception=False, HTTP_HOST=host)
+        started = time.perf_counter()
+        try:
+            response = client.get(target.path, dict(target.params), secure=settings.SECURE_SSL_REDIRECT)
+            error = '' if response.status_code == 200 else f'HTTP {response.status_code}'
+        except Exception as exc:  # a page that fails must not stop the warm-up
+            error = f'{type(exc).__name__}: {exc}'
+        finally:
+            connections.close_all()  # this thread's connections
+        return Result(target, (time.perf_counter() - started) * 1000, error)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='warmup') as executor:
+        return list(executor.map(fetch, pages))